@@ -0,0 +1,103 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpRequest, HttpResponse
+from django.urls import URLPattern
+from django.views.decorators.csrf import csrf_exempt
+from typing import Any, Callable, List, Optional
+
+# методы, обслуживаемые асинхронными обработчиками (остальные - синхронным представлением DRF)
+ASYNC_METHODS = ('get', 'head')
+
+
+def async_handler_name(view: Callable, method: str) -> Optional[str]:
+    """
+    Функция имени асинхронного обработчика представления DRF для метода запроса.
+    Асинхронный обработчик называется как синхронный с префиксом 'a':
+    alist / aretrieve для ViewSet, aget для APIView.
+
+    :param view: функция представления DRF (as_view()).
+    :param method: метод запроса в нижнем регистре.
+    :return: имя обработчика или None, если асинхронного обработчика нет.
+    """
+    actions = getattr(view, 'actions', None)
+    if actions is not None:
+        action = actions.get(method) or (actions.get('get') if method == 'head' else None)
+    else:
+        action = 'get' if method == 'head' else method
+    if action is None or not hasattr(view.cls, f'a{action}'):
+        return None
+    return f'a{action}'
+
+
+async def dispatch(view: Callable, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+    """
+    Функция асинхронной обработки запроса представлением DRF (аналог APIView.dispatch).
+    Аутентификация, права доступа и выбор формата (initial) выполняются в потоке,
+    данные читаются асинхронным ORM; ответ JSON отрисовывается сразу, без перехода в поток.
+
+    :param view: функция представления DRF (as_view()).
+    :param request:
+    :return: ответ.
+    """
+    self = view.cls(**view.initkwargs)
+    if getattr(view, 'actions', None) is not None:
+        self.action_map = dict(view.actions)
+        self.action_map.setdefault('head', self.action_map.get('get'))
+    self.args = args
+    self.kwargs = kwargs
+    request = self.initialize_request(request, *args, **kwargs)
+    self.request = request
+    self.headers = self.default_response_headers
+
+    try:
+        await sync_to_async(self.initial)(request, *args, **kwargs)
+        handler = getattr(self, async_handler_name(view, request.method.lower()))
+        response = await handler(request, *args, **kwargs)
+    except Exception as exc:
+        response = self.handle_exception(exc)
+
+    response = self.finalize_response(request, response, *args, **kwargs)
+    # отрисовка JSON не обращается к БД; остальные форматы (Browsable API) отрисовывает Django в потоке
+    if getattr(response, 'accepted_renderer', None) is not None and response.accepted_renderer.format == 'json':
+        response.render()
+    return response
+
+
+def async_read_view(view: Callable) -> Callable:
+    """
+    Функция асинхронной версии представления DRF: GET / HEAD обслуживаются асинхронными
+    обработчиками, остальные методы - прежним синхронным представлением в потоке.
+
+    :param view: функция представления DRF (as_view()).
+    :return: асинхронная функция представления.
+    """
+    sync_view = sync_to_async(view)
+
+    async def async_view(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        method = request.method.lower()
+        if method in ASYNC_METHODS and async_handler_name(view, method):
+            return await dispatch(view, request, *args, **kwargs)
+        return await sync_view(request, *args, **kwargs)
+
+    for attribute in ('cls', 'initkwargs', 'actions'):
+        if hasattr(view, attribute):
+            setattr(async_view, attribute, getattr(view, attribute))
+    async_view.__name__ = view.__name__
+    async_view.__doc__ = view.__doc__
+    return csrf_exempt(async_view)
+
+
+def with_async_reads(urlpatterns: List[Any]) -> List[Any]:
+    """
+    Функция замены представлений DRF с асинхронными обработчиками чтения на асинхронные версии.
+    Адреса, имена маршрутов, фильтры, права доступа и формат ответов не меняются.
+
+    :param urlpatterns: маршруты API.
+    :return: новый список маршрутов.
+    """
+    patterns: List[Any] = []
+    for pattern in urlpatterns:
+        view = getattr(pattern, 'callback', None)
+        if isinstance(pattern, URLPattern) and hasattr(view, 'cls') and async_handler_name(view, 'get'):
+            pattern = URLPattern(pattern.pattern, async_read_view(view), pattern.default_args, pattern.name)
+        patterns.append(pattern)
+    return patterns
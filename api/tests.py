@@ -1,3 +1,672 @@
-from django.test import TestCase
+import json
+import tempfile
+import time
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import AsyncClient, Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, resolve, reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from app import events
+from app.jobs import claim_job, run_job
+from app.metrics import registry as metrics_registry
+from app.models import Job, Order, MenuItem, OrderItem, RevenueRollup
+from app.serializers import OrderListSerializer
+
+from .urls import async_urlpatterns, sync_urlpatterns
+
+# задержка ответной части промежуточного слоя теста времени отрисовки (сек.)
+SLOW_RESPONSE: float = 0.05
+
+
+def slow_response_middleware(get_response):
+    def middleware(request):
+        response = get_response(request)
+        time.sleep(SLOW_RESPONSE)
+        return response
+
+    return middleware
+
+
+# маршруты тестов асинхронных обработчиков: асинхронные и синхронные версии API рядом
+urlpatterns = [
+    path('api/', include(async_urlpatterns)),
+    path('sync/api/', include(sync_urlpatterns)),
+]
+
+
+class OrderCreateApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='waiter'))
+        self.menu_item_1 = MenuItem.objects.create(name="Кофе", price=60.00)
+        self.menu_item_2 = MenuItem.objects.create(name="Чай", price=10.00)
+
+    def test_create_order_with_items(self):
+        """Тест создания заказа с позициями и расчетом итоговой суммы"""
+
+        response = self.client.post('/api/orders/', {
+            'table_number': 5,
+            'status': 'pending',
+            'items': [
+                {'menu_item': self.menu_item_1.pk, 'quantity': 2},
+                {'menu_item': self.menu_item_2.pk, 'quantity': 3},
+            ],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['items'][0]['menu_item'], self.menu_item_1.pk)
+        order = Order.objects.get(pk=response.data['id'])
+        self.assertEqual(order.total_price, 150.00)
+        self.assertEqual(order.order_items.count(), 2)
+
+    def test_create_order_query_count_does_not_depend_on_lines(self):
+        """Тест постоянного числа запросов при создании заказа с разным количеством позиций"""
+
+        def create(lines):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post('/api/orders/', {
+                    'table_number': 1,
+                    'items': [{'menu_item': self.menu_item_1.pk, 'quantity': 1}] * lines,
+                }, format='json')
+            return len(queries)
+
+        # первый запрос загружает меню в кэш
+        create(1)
+        self.assertEqual(create(1), create(10))
+
+    def test_create_order_unknown_menu_item(self):
+        """Тест отказа в создании заказа с несуществующим блюдом"""
+
+        response = self.client.post('/api/orders/', {
+            'table_number': 1,
+            'items': [{'menu_item': 999999, 'quantity': 1}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('items', response.data)
+        self.assertFalse(Order.objects.exists())
+
+    def tearDown(self):
+        Order.objects.all().delete()
+        MenuItem.objects.all().delete()
+
+
+class IdempotencyApiTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='pos')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.menu_item = MenuItem.objects.create(name="Кофе", price=60.00)
+        self.payload = {'table_number': 5, 'items': [{'menu_item': self.menu_item.pk, 'quantity': 2}]}
+
+    def create(self, key, payload=None, client=None):
+        return (client or self.client).post('/api/orders/', payload or self.payload, format='json',
+                                            HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_returns_original_response(self):
+        """Тест повтора создания заказа с тем же ключом: исходный ответ без повторного создания"""
+
+        first = self.create('pos-1')
+        with CaptureQueriesContext(connection) as queries:
+            second = self.create('pos-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((second.status_code, second.json()), (201, first.json()))
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertFalse([query for query in queries if 'app_order' in query['sql']])
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_keys_scoped_by_user_and_request(self):
+        """Тест ключей разных пользователей и отказа (422) для другого запроса с тем же ключом"""
+
+        self.create('pos-1')
+        self.assertEqual(self.create('pos-1', {**self.payload, 'table_number': 6}).status_code, 422)
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='pos-2'))
+        self.assertEqual(self.create('pos-1', client=other).status_code, 201)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_failed_request_not_stored(self):
+        """Тест повтора с тем же ключом после ошибки проверки данных"""
+
+        invalid = self.create('pos-1', {'table_number': 5, 'items': [{'menu_item': 999999, 'quantity': 1}]})
+        self.assertEqual(invalid.status_code, 400)
+        self.assertEqual(self.create('pos-1').status_code, 201)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def tearDown(self):
+        Order.objects.all().delete()
+        MenuItem.objects.all().delete()
+
+
+class OrderBulkCreateApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='pos'))
+        self.menu_item = MenuItem.objects.create(name="Суп", price=20.00)
+
+    def test_bulk_create_orders(self):
+        """Тест пакетного создания заказов"""
+
+        payload = [
+            {'table_number': number, 'items': [{'menu_item': self.menu_item.pk, 'quantity': number}]}
+            for number in range(1, 51)
+        ]
+
+        response = self.client.post('/api/orders/bulk/', payload, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 50)
+        self.assertEqual(Order.objects.count(), 50)
+        self.assertEqual(OrderItem.objects.count(), 50)
+        self.assertEqual(Order.objects.get(table_number=7).total_price, 140.00)
+
+    def test_bulk_create_is_atomic(self):
+        """Тест отказа всего пакета при ошибке в одном из заказов"""
+
+        payload = [
+            {'table_number': 1, 'items': [{'menu_item': self.menu_item.pk, 'quantity': 1}]},
+            {'table_number': 2, 'items': [{'menu_item': 999999, 'quantity': 1}]},
+        ]
+
+        response = self.client.post('/api/orders/bulk/', payload, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def tearDown(self):
+        Order.objects.all().delete()
+        MenuItem.objects.all().delete()
+
+
+class OrderStatusApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='cashier'))
+        menu_item = MenuItem.objects.create(name="Суп", price=Decimal('20.00'))
+        self.orders = Order.objects.create_with_items([
+            {'table_number': table, 'status': status, 'order_items': [{'menu_item': menu_item, 'quantity': 2}]}
+            for table, status in ((5, 'ready'), (5, 'ready'), (5, 'pending'), (6, 'ready'), (6, 'paid'))
+        ])
+
+    def test_status_transition_single_update(self):
+        """Тест смены статуса заказа одним UPDATE и отказа в недопустимом переходе"""
+
+        order = self.orders[2]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(f'/api/orders/{order.pk}/status/', {'status': 'ready'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'id': order.pk, 'status': 'ready', 'previous_status': 'pending'})
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'ready')
+        self.assertGreater(order.updated_at, self.orders[0].updated_at)
+
+        response = self.client.post(f'/api/orders/{order.pk}/status/', {'status': 'pending'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['conflicts'], [{'id': order.pk, 'status': 'ready'}])
+        self.assertEqual(self.client.post('/api/orders/999999/status/', {'status': 'ready'},
+                                          format='json').status_code, 404)
+        self.assertEqual(self.client.post(f'/api/orders/{order.pk}/status/', {'status': 'closed'},
+                                          format='json').status_code, 400)
+
+    def test_bulk_by_ids_all_or_nothing(self):
+        """Тест пакетной смены статуса списка заказов: при недопустимом переходе не меняется ни один"""
+
+        ids = [self.orders[0].pk, self.orders[4].pk, 999999]
+        response = self.client.post('/api/orders/status/bulk/', {'ids': ids, 'status': 'paid'}, format='json')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['conflicts'], [{'id': self.orders[4].pk, 'status': 'paid'},
+                                                      {'id': 999999, 'status': None}])
+        self.assertEqual(Order.objects.filter(status='paid').count(), 1)
+
+        ids = [self.orders[0].pk, self.orders[3].pk]
+        response = self.client.post('/api/orders/status/bulk/', {'ids': ids, 'status': 'paid'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['ids'], ids)
+        self.assertEqual(RevenueRollup.objects.get(table_number=5).revenue, Decimal('40.00'))
+        self.assertEqual(RevenueRollup.objects.get(table_number=6).orders_count, 2)
+
+    def test_bulk_by_table(self):
+        """Тест расчета стола: оплачиваются все готовые заказы стола, события публикуются после фиксации"""
+
+        marker = events.hub.publish('marker', {}).id
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/orders/status/bulk/', {'table': 5, 'status': 'paid'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(list(Order.objects.filter(table_number=5).order_by('id').values_list('status', flat=True)),
+                         ['paid', 'paid', 'pending'])
+        rollup = RevenueRollup.objects.get(table_number=5)
+        self.assertEqual((rollup.revenue, rollup.orders_count), (Decimal('80.00'), 2))
+        published = [event for event in events.hub._buffer if event.id > marker]
+        self.assertEqual([(event.type, event.data['previous_status']) for event in published],
+                         [(events.ORDER_STATUS_CHANGED, 'ready')] * 2)
+
+        response = self.client.post('/api/orders/status/bulk/', {'ids': [1], 'table': 5, 'status': 'paid'},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def tearDown(self):
+        Order.objects.all().delete()
+        MenuItem.objects.all().delete()
+
+
+class TableApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='host'))
+        menu_item = MenuItem.objects.create(name="Суп", price=Decimal('20.00'))
+        Order.objects.create_with_items([
+            {'table_number': 2, 'status': status, 'order_items': [{'menu_item': menu_item, 'quantity': 3}]}
+            for status in ('pending', 'ready')
+        ])
+
+    def test_floor_bill_and_close(self):
+        """Тест обзора зала, счета стола и его расчета по API"""
+
+        response = self.client.get('/api/tables/')
+        self.assertEqual(response.data[0]['total'], '120.00')
+
+        response = self.client.get('/api/tables/2/')
+        self.assertEqual(response.data['lines'], [{'menu_item': response.data['lines'][0]['menu_item'],
+                                                   'name': 'Суп', 'quantity': 6, 'amount': '120.00'}])
+
+        response = self.client.post('/api/tables/2/close/', {'total': '100.00'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['total'], '120.00')
+
+        response = self.client.post('/api/tables/2/close/', {'total': '120.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['closed'], 2)
+        self.assertEqual(self.client.get('/api/tables/').data, [])
+
+    def tearDown(self):
+        Order.objects.all().delete()
+        MenuItem.objects.all().delete()
+
+
+class OrderCursorPaginationApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='manager'))
+        self.orders = [Order.objects.create(table_number=number) for number in range(1, 8)]
+
+    def test_cursor_pages(self):
+        """Тест выдачи заказов по курсору без повторов и пропусков"""
+
+        seen = []
+        url = '/api/orders/?page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            seen.extend(order['id'] for order in response.json()['results'])
+            url = response.data['next']
+
+        self.assertEqual(seen, [order.pk for order in reversed(self.orders)])
+
+    def test_count_on_request(self):
+        """Тест выдачи общего количества заказов только по запросу"""
+
+        response = self.client.get('/api/orders/', {'count': 'true', 'page_size': 2})
+
+        self.assertEqual(response.data['count'], 7)
+        self.assertEqual(len(response.data['results']), 2)
+
+    @override_settings(ORDERS_API_MAX_PAGE_SIZE=5)
+    def test_page_size_limit(self):
+        """Тест ограничения размера страницы сверху"""
+
+        response = self.client.get('/api/orders/', {'page_size': 1000})
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_invalid_cursor(self):
+        """Тест ответа на поврежденный курсор"""
+
+        response = self.client.get('/api/orders/', {'cursor': '!!!'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_deep_page_query_count(self):
+        """Тест одинакового числа запросов для первой и последующих страниц (без COUNT)"""
+
+        with CaptureQueriesContext(connection) as first_page:
+            response = self.client.get('/api/orders/', {'page_size': 2})
+        with CaptureQueriesContext(connection) as next_page:
+            self.client.get(response.data['next'])
+
+        self.assertEqual(len(first_page), len(next_page))
+        self.assertFalse(any('"__count"' in query['sql'] for query in first_page.captured_queries))
+
+    def tearDown(self):
+        Order.objects.all().delete()
+
+
+class ConditionalGetApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='kitchen'))
+        self.menu_item = MenuItem.objects.create(name="Суп", price=20.00)
+        self.order = Order.objects.create(table_number=1)
+
+    def test_orders_not_modified(self):
+        """Тест ответа 304 на повторный запрос неизменившегося списка заказов без сериализации"""
+
+        response = self.client.get('/api/orders/', {'status': 'pending'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(1):
+            not_modified = self.client.get('/api/orders/', {'status': 'pending'},
+                                           HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_orders_modified_after_changes(self):
+        """Тест смены ETag после добавления позиции, нового заказа и удаления заказа"""
+
+        etag = self.client.get('/api/orders/')['ETag']
+        OrderItem.objects.create(order=self.order, menu_item=self.menu_item, quantity=1)
+        response = self.client.get('/api/orders/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        other = Order.objects.create(table_number=2)
+        response = self.client.get('/api/orders/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        other.delete()
+        self.assertEqual(self.client.get('/api/orders/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_order_detail_not_modified(self):
+        """Тест ответа 304 для неизменившегося заказа"""
+
+        response = self.client.get(f'/api/orders/{self.order.pk}/')
+        not_modified = self.client.get(f'/api/orders/{self.order.pk}/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_menu_not_modified_until_changed(self):
+        """Тест ETag / Last-Modified меню по версии кэша меню"""
+
+        response = self.client.get('/api/menu-items/')
+        not_modified = self.client.get('/api/menu-items/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+        MenuItem.objects.create(name="Чай", price=10.00)
+        changed = self.client.get('/api/menu-items/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(len(changed.data['results']), 2)
+
+    def tearDown(self):
+        Order.objects.all().delete()
+        MenuItem.objects.all().delete()
+
+
+class OrderFastReadApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='cashier'))
+        menu = [MenuItem.objects.create(name="Суп", price=20.00), MenuItem.objects.create(name="Чай", price=9.50)]
+        for number in range(1, 6):
+            order = Order.objects.create(table_number=number, status='paid' if number % 2 else 'pending')
+            for quantity in range(1, number + 1):
+                OrderItem.objects.create(order=order, menu_item=menu[quantity % 2], quantity=quantity)
+        Order.objects.create(table_number=9)
+
+    def test_list_same_as_list_serializer(self):
+        """Тест совпадения JSON быстрого сериализатора с OrderListSerializer"""
+
+        response = self.client.get('/api/orders/', {'page_size': 100})
+        expected = OrderListSerializer(Order.objects.order_by('-created_at', '-id'), many=True).data
+
+        self.assertEqual(response.json()['results'], json.loads(JSONRenderer().render(expected)))
+
+    def test_detail_same_as_list_serializer(self):
+        """Тест совпадения JSON заказа и ответа 404 для несуществующего заказа"""
+
+        order = Order.objects.get(table_number=4)
+        response = self.client.get(f'/api/orders/{order.pk}/')
+
+        self.assertEqual(response.json(), json.loads(JSONRenderer().render(OrderListSerializer(order).data)))
+        self.assertEqual(self.client.get('/api/orders/999999/').status_code, 404)
+
+    def test_list_query_count_does_not_depend_on_orders(self):
+        """Тест постоянного числа запросов списка заказов (заказы и позиции - по одному запросу)"""
+
+        with CaptureQueriesContext(connection) as small_page:
+            self.client.get('/api/orders/', {'page_size': 1})
+        with CaptureQueriesContext(connection) as large_page:
+            self.client.get('/api/orders/', {'page_size': 6})
+
+        self.assertEqual(len(small_page), len(large_page))
+
+    def tearDown(self):
+        Order.objects.all().delete()
+        MenuItem.objects.all().delete()
+
+
+class OrderJsonCacheApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='cashier'))
+        self.menu_item = MenuItem.objects.create(name="Суп", price=Decimal('20.00'))
+        self.orders = Order.objects.create_with_items([
+            {'table_number': table, 'order_items': [{'menu_item': self.menu_item, 'quantity': table}]}
+            for table in (1, 2, 3)
+        ])
+        metrics_registry.reset()
+
+    def detail(self, order):
+        return self.client.get(f'/api/orders/{order.pk}/').json()
+
+    def test_cached_responses(self):
+        """Тест выдачи заказа и списка из кэша JSON без запроса позиций и со счетчиками попаданий"""
+
+        first = self.client.get('/api/orders/')
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get('/api/orders/')
+        self.assertEqual(first.content, second.content)
+        self.assertFalse([query for query in queries if 'app_orderitem' in query['sql']])
+
+        order = self.orders[1]
+        self.assertEqual(self.detail(order), json.loads(JSONRenderer().render(OrderListSerializer(order).data)))
+        self.assertEqual(metrics_registry.counters, {'cafe_order_json_cache_hits_total': 4,
+                                                     'cafe_order_json_cache_misses_total': 3})
+        self.assertIn('cafe_order_json_cache_hits_total 4', Client().get('/metrics').content.decode())
+
+    def test_writes_refresh_cached_orders(self):
+        """Тест обновления JSON заказа после изменений через страницы, API и пакетные операции"""
+
+        order = self.orders[0]
+        self.detail(order)
+        Client().post(reverse('order_item_add', args=[order.pk]), {'menu_item': self.menu_item.pk, 'quantity': 1})
+        self.assertEqual(self.detail(order)['total_price'], '40.00')
+
+        self.client.post(f'/api/orders/{order.pk}/status/', {'status': 'ready'})
+        self.assertEqual(self.detail(order)['status'], 'ready')
+
+        self.client.post('/api/orders/status/bulk/', {'table': 1, 'status': 'paid'})
+        self.assertEqual(self.detail(order)['status'], 'paid')
+
+        Client().post(reverse('order_item_delete', args=[order.order_items.first().pk]))
+        self.assertEqual(len(self.detail(order)['items']), 1)
+
+    def tearDown(self):
+        Order.objects.all().delete()
+        MenuItem.objects.all().delete()
+
+
+class MetricsApiTest(TestCase):
+    def test_api_view_name_and_render_time(self):
+        """Тест замера запросов API по имени маршрута DRF с временем отрисовки ответа"""
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='admin'))
+        metrics_registry.reset()
+
+        response = client.get('/api/orders/')
+
+        self.assertIn('Server-Timing', response)
+        self.assertGreater(metrics_registry.histograms['cafe_request_render_duration_seconds', 'order-list'].total, 0)
+
+    def test_render_time_excludes_inner_middleware(self):
+        """Тест времени отрисовки ответа DRF без ответной части внутренних промежуточных слоев"""
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='admin'))
+        metrics_registry.reset()
+
+        with self.settings(MIDDLEWARE=settings.MIDDLEWARE + ['api.tests.slow_response_middleware']):
+            client.get('/api/orders/')
+
+        histograms = metrics_registry.histograms
+        self.assertGreaterEqual(histograms['cafe_request_duration_seconds', 'order-list'].total, SLOW_RESPONSE)
+        self.assertLess(histograms['cafe_request_render_duration_seconds', 'order-list'].total, SLOW_RESPONSE)
+
+
+@override_settings(ROOT_URLCONF='api.tests')
+class AsyncReadApiTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='async')
+        self.async_client = AsyncClient()
+        self.async_client.force_login(self.user)
+        self.sync_client = Client()
+        self.sync_client.force_login(self.user)
+        self.menu_item = MenuItem.objects.create(name="Кофе", price=Decimal('60.00'))
+        self.orders = Order.objects.create_with_items([
+            {'table_number': table, 'status': status, 'order_items': [{'menu_item': self.menu_item, 'quantity': table}]}
+            for table, status in ((1, 'paid'), (2, 'pending'), (3, 'paid'))
+        ])
+
+    def get_both(self, url: str, **params):
+        return (async_to_sync(self.async_client.get)(url, params),
+                self.sync_client.get(f'/sync{url}', params))
+
+    def test_same_json_as_sync_views(self):
+        """Тест совпадения ответов асинхронных и синхронных обработчиков чтения"""
+
+        self.assertTrue(iscoroutinefunction(resolve('/api/orders/').func))
+        for url, params in (
+            ('/api/orders/', {'status': 'paid'}),
+            (f'/api/orders/{self.orders[0].pk}/', {}),
+            ('/api/menu-items/', {}),
+            (f'/api/menu-items/{self.menu_item.pk}/', {}),
+            ('/api/revenue/', {'granularity': 'table'}),
+        ):
+            async_response, sync_response = self.get_both(url, **params)
+            self.assertEqual(async_response.status_code, 200, url)
+            self.assertEqual(async_response.json(), sync_response.json(), url)
+
+        async_response, sync_response = self.get_both('/api/orders/', page_size=2)
+        self.assertEqual(async_response.json()['results'], sync_response.json()['results'])
+        self.assertEqual(async_response.json()['next'].split('?')[1], sync_response.json()['next'].split('?')[1])
+        for url in ('/api/orders/999999/', '/api/orders/abc/', '/api/menu-items/999999/'):
+            self.assertEqual(self.get_both(url)[0].status_code, 404, url)
+
+    def test_revenue_report(self):
+        """Тест отчета о выручке API: только оплаченные заказы, строки по столам и итог"""
+
+        data = async_to_sync(self.async_client.get)('/api/revenue/', {'granularity': 'table'}).json()
+        self.assertEqual(data['granularity'], 'table')
+        self.assertEqual([row['table_number'] for row in data['rows']], [1, 3])
+        self.assertEqual(data['totals'], {'orders_count': 2, 'revenue': '240.00', 'average_check': '120.00'})
+
+    def test_permissions_and_not_modified(self):
+        """Тест прав доступа, ответа 304 и записи через асинхронные маршруты"""
+
+        anonymous = AsyncClient()
+        for url in ('/api/orders/', '/api/revenue/'):
+            self.assertEqual(async_to_sync(anonymous.get)(url).status_code, Client().get(f'/sync{url}').status_code)
+        self.assertEqual(async_to_sync(anonymous.get)('/api/menu-items/').status_code, 200)
+
+        response = async_to_sync(self.async_client.get)('/api/orders/')
+        not_modified = async_to_sync(self.async_client.get)('/api/orders/', headers={'if-none-match': response['ETag']})
+        self.assertEqual(not_modified.status_code, 304)
+
+        created = async_to_sync(self.async_client.post)('/api/orders/', {
+            'table_number': 4, 'items': [{'menu_item': self.menu_item.pk, 'quantity': 1}],
+        }, content_type='application/json')
+        self.assertEqual(created.status_code, 201)
+        changed = async_to_sync(self.async_client.get)('/api/orders/', headers={'if-none-match': response['ETag']})
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(len(changed.json()['results']), 4)
+
+
+@override_settings(REVENUE_REPORT_SYNC_MAX_DAYS=31)
+class JobApiTest(TestCase):
+    def setUp(self):
+        results_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(results_dir.cleanup)
+        override = override_settings(JOB_RESULTS_DIR=results_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user(username='cashier')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_submit_status_and_result(self):
+        """Тест постановки задачи (202), состояния и результата после выполнения"""
+
+        response = self.client.post('/api/jobs/', {'kind': 'export', 'params': {'kind': 'orders', 'format': 'jsonl'}},
+                                    format='json')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['id']
+        self.assertTrue(response['Location'].endswith(f'/api/jobs/{job_id}/'))
+        self.assertEqual(response.json()['status'], 'queued')
+        self.assertEqual(self.client.get(f'/api/jobs/{job_id}/result/').status_code, 409)
+
+        run_job(claim_job('test'), 'test')
+        data = self.client.get(f'/api/jobs/{job_id}/').json()
+        self.assertEqual(data['status'], 'done')
+        self.assertTrue(data['result_url'].endswith(f'/api/jobs/{job_id}/result/'))
+        response = self.client.get(f'/api/jobs/{job_id}/result/')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertEqual(self.client.get('/api/jobs/').json()['count'], 1)
+
+    def test_validation_and_permissions(self):
+        """Тест проверки параметров, задач пересчета только для персонала и видимости чужих задач"""
+
+        response = self.client.post('/api/jobs/', {'kind': 'export', 'params': {'format': 'xml'}}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('format', response.json()['params'][0])
+        response = self.client.post('/api/jobs/', {'kind': 'rebuild-revenue'}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+        staff = APIClient()
+        staff.force_authenticate(User.objects.create_user(username='manager', is_staff=True))
+        response = staff.post('/api/jobs/', {'kind': 'rebuild-revenue'}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.client.get(f"/api/jobs/{response.json()['id']}/").status_code, 404)
+        self.assertEqual(staff.get('/api/jobs/').json()['count'], 1)
+
+    def test_long_revenue_report_accepted(self):
+        """Тест отчета о выручке за явно заданный период длиннее REVENUE_REPORT_SYNC_MAX_DAYS: ответ 202 с задачей"""
+
+        for prefix in ('/api', '/sync/api'):
+            with self.settings(ROOT_URLCONF='api.tests'):
+                response = self.client.get(f'{prefix}/revenue/', {'date_from': '2024-01-01', 'date_to': '2024-06-30'})
+            self.assertEqual(response.status_code, 202, prefix)
+        job = Job.objects.get()
+        self.assertEqual(job.params, {'date_from': '2024-01-01', 'date_to': '2024-06-30', 'granularity': 'day'})
+        self.assertEqual(response.json()['id'], job.pk)
+
+        # отчет без дат строится в запросе при любой длине истории, в фоне - только по запросу
+        RevenueRollup.objects.create(date='2023-01-01', hour=12, table_number=1, revenue=10, orders_count=1)
+        RevenueRollup.objects.create(date='2024-06-01', hour=12, table_number=1, revenue=10, orders_count=1)
+        self.assertEqual(self.client.get('/api/revenue/').status_code, 200)
+        self.assertEqual(self.client.get('/api/revenue/', {'date_from': '2023-01-01'}).status_code, 200)
+        self.assertEqual(self.client.get('/api/revenue/', {'background': '1'}).status_code, 202)
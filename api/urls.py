@@ -1,8 +1,19 @@
+from django.conf import settings
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import OrderViewSet, MenuItemViewSet
+from .async_views import with_async_reads
+from .views import JobViewSet, OrderViewSet, MenuItemViewSet, RevenueReportView, TableViewSet
 
 router = DefaultRouter()
 router.register(r'orders', OrderViewSet, basename='order')
 router.register(r'menu-items', MenuItemViewSet, basename='menuitem')
+router.register(r'tables', TableViewSet, basename='table')
+router.register(r'jobs', JobViewSet, basename='job')
 
-urlpatterns = router.urls
+sync_urlpatterns = router.urls + [
+    path('revenue/', RevenueReportView.as_view(), name='revenue-report'),
+]
+# асинхронные GET-обработчики списка и деталей заказов, списка меню и отчета о выручке (под ASGI)
+async_urlpatterns = with_async_reads(sync_urlpatterns)
+
+urlpatterns = async_urlpatterns if settings.ASYNC_API_VIEWS else sync_urlpatterns
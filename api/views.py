@@ -1,18 +1,44 @@
-from rest_framework import viewsets, permissions
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from rest_framework.request import Request
+from rest_framework.response import Response
 from rest_framework.permissions import BasePermission
 from rest_framework.serializers import ModelSerializer
+from rest_framework.views import APIView
 from django.db.models.query import QuerySet
-from typing import List
-from app.models import Order, MenuItem
-from app.serializers import MenuItemSerializer, OrderCreateSerializer, OrderListSerializer
+from typing import Any, Dict, List
+from app.conditional import MenuConditionalGetMixin, OrderConditionalGetMixin
+from app.filters import filter_orders, parse_day
+from app.idempotency import idempotent
+from app.jobs import JOB_KINDS, job_result_response, submit_job
+from app.menu_cache import CachedMenuListMixin
+from app.menu_search import search_menu
+from app.models import Job, Order, MenuItem
+from app.pagination import OrderCursorPagination
+from app.reports import REVENUE_GRANULARITIES, arevenue_report, is_heavy_report, revenue_report
+from app.routers import reporting_view
+from app.serializers import (FloorTableSerializer, JobCreateSerializer, JobSerializer, MenuItemSerializer,
+                             OrderBulkStatusSerializer, OrderCreateSerializer, OrderFastReadMixin, OrderListSerializer,
+                             OrderStatusSerializer, RevenueReportSerializer, TableBillSerializer, TableCloseSerializer)
+from app.tables import close_table, floor_overview, table_bill
+from app.transactions import write_transaction
 
 
-class MenuItemViewSet(viewsets.ModelViewSet):
+@method_decorator(write_transaction, name='dispatch')
+class MenuItemViewSet(MenuConditionalGetMixin, CachedMenuListMixin, viewsets.ModelViewSet):
     """
     Функция управления (CRUD-операции) блюдами меню по API.
+    Список меню выдается из кэша меню (см. app.menu_cache),
+    GET-запросы поддерживают ETag / Last-Modified по версии меню.
     Требует авторизации для любых действий, кроме GET-запросов.
     Позволяет:
     - Просматривать меню (GET)
+    - Искать блюда по названию (GET /search/?q=...)
     - Добавлять новые блюда (POST)
     - Редактировать существующие (PUT/PATCH)
     - Удалять блюда (DELETE)
@@ -21,16 +47,303 @@ class MenuItemViewSet(viewsets.ModelViewSet):
     serializer_class: ModelSerializer = MenuItemSerializer
     permission_classes: List[BasePermission] = [permissions.AllowAny]
 
+    @action(detail=False, methods=['get'])
+    def search(self, request: Request) -> Response:
+        """
+        Функция поиска блюд по названию (для автодополнения): сначала по началу названия, затем по подстроке,
+        без учета регистра и различия е/ё. Ответ поддерживает ETag по версии меню.
 
-class OrderViewSet(viewsets.ModelViewSet):
+        :param request: строка поиска 'q', количество блюд 'limit' (до MENU_SEARCH_MAX_LIMIT).
+        :return: список блюд.
+        """
+        def found(request: Request) -> Response:
+            limit: str = request.query_params.get('limit', '')
+            items = search_menu(request.query_params.get('q', ''), int(limit) if limit.isdigit() else None)
+            return Response(self.get_serializer(items, many=True).data)
+
+        # поиск выполняется, только если меню изменилось с прошлого ответа клиенту
+        return self.conditional_response(found, request)
+
+
+@method_decorator(write_transaction, name='dispatch')
+@method_decorator(idempotent, name='create')
+@method_decorator(idempotent, name='bulk')
+@method_decorator(reporting_view, name='list')
+@method_decorator(reporting_view, name='alist')
+class OrderViewSet(OrderConditionalGetMixin, OrderFastReadMixin, viewsets.ModelViewSet):
     """
     Функция управления заказами по API.
     Требует авторизации для любых действий.
+    Список фильтруется параметрами 'table', 'status', 'date_from', 'date_to';
+    GET-запросы поддерживают ETag / Last-Modified (ответ 304 без сериализации),
+    список и заказ выдаются быстрым сериализатором (два запроса на страницу).
+    Статус заказа (заказов) меняется отдельными действиями status / status/bulk одним UPDATE.
+    Создание заказа (заказов) с заголовком Idempotency-Key при повторе выдает сохраненный ответ.
     """
-    queryset = Order.objects.all().order_by('-created_at')
+    queryset = Order.objects.all().order_by('-created_at', '-id')
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OrderCursorPagination
+
+    def get_queryset(self) -> QuerySet:
+        return filter_orders(super().get_queryset(), self.request.query_params)
 
     def get_serializer_class(self):
-        if self.action == 'create':
+        if self.action in ('create', 'bulk'):
             return OrderCreateSerializer
+        if self.action == 'set_status':
+            return OrderStatusSerializer
+        if self.action == 'bulk_status':
+            return OrderBulkStatusSerializer
         return OrderListSerializer
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request: Request) -> Response:
+        """
+        Функция пакетного создания заказов (например, при восстановлении связи POS-терминала).
+        Все заказы пакета проверяются и создаются в одной транзакции.
+
+        :param request: список заказов в формате создания заказа.
+        :return: количество и id созданных заказов.
+        """
+        serializer = self.get_serializer(
+            data=request.data, many=True, allow_empty=False, max_length=settings.ORDERS_BULK_MAX_SIZE
+        )
+        serializer.is_valid(raise_exception=True)
+        orders = serializer.save()
+        return Response({'created': len(orders), 'ids': [order.pk for order in orders]},
+                        status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'], url_path='status', url_name='status')
+    def set_status(self, request: Request, pk: str = None) -> Response:
+        """
+        Функция смены статуса заказа (pending -> ready -> paid) одним UPDATE, без загрузки заказа.
+
+        :param request: новый статус ('status').
+        :param pk: id заказа.
+        :return: id, новый и прежний статус заказа; 409 при недопустимом переходе.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        target: str = serializer.validated_data['status']
+        try:
+            order_id = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound()
+        changed, rejected = Order.objects.set_status(target, ids=[order_id])
+        if rejected and rejected[0]['status'] is None:
+            raise NotFound()
+        if rejected:
+            return self.conflict_response(target, rejected)
+        return Response({'id': order_id, 'status': target, 'previous_status': changed[0]['status']})
+
+    @action(detail=False, methods=['post'], url_path='status/bulk', url_name='status-bulk')
+    def bulk_status(self, request: Request) -> Response:
+        """
+        Функция пакетной смены статуса одним UPDATE: списка заказов ('ids' - у всех или ни у одного)
+        или заказов стола ('table' - у всех, для которых переход допустим, например, при расчете стола).
+
+        :param request: 'ids' или 'table' и новый статус ('status').
+        :return: новый статус, количество и id измененных заказов; 409 при недопустимом переходе.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        target: str = serializer.validated_data['status']
+        if 'ids' in serializer.validated_data:
+            changed, rejected = Order.objects.set_status(target, ids=serializer.validated_data['ids'])
+            if rejected:
+                return self.conflict_response(target, rejected)
+        else:
+            changed, _ = Order.objects.filter(table_number=serializer.validated_data['table']).set_status(target)
+        return Response({'status': target, 'updated': len(changed), 'ids': [row['id'] for row in changed]})
+
+    @staticmethod
+    def conflict_response(target: str, rejected: List[Dict[str, Any]]) -> Response:
+        """
+        Функция ответа на недопустимый переход статуса (статус не изменен ни у одного заказа).
+
+        :param target: новый статус.
+        :param rejected: заказы с недопустимым переходом (id и текущий статус, None - заказа нет).
+        :return: ответ 409.
+        """
+        return Response({
+            'detail': f"Недопустимый переход статуса в '{target}' (допустим из: "
+                      f"{', '.join(Order.previous_statuses(target)) or '-'}).",
+            'conflicts': [{'id': row['id'], 'status': row['status']} for row in rejected],
+        }, status=status.HTTP_409_CONFLICT)
+
+
+@method_decorator(write_transaction, name='dispatch')
+class TableViewSet(viewsets.ViewSet):
+    """
+    Функция столов по API.
+    Требует авторизации.
+    Позволяет:
+    - Просматривать обзор зала: открытые столы с текущими суммами (GET /tables/)
+    - Просматривать счет стола: неоплаченные заказы и блюда с итогом (GET /tables/<номер>/)
+    - Закрывать стол: оплата всех неоплаченных заказов стола (POST /tables/<номер>/close/)
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    lookup_value_regex = '[0-9]+'
+
+    def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return TableBillSerializer
+        if self.action == 'close':
+            return TableCloseSerializer
+        return FloorTableSerializer
+
+    def list(self, request: Request) -> Response:
+        return Response(FloorTableSerializer(floor_overview(), many=True).data)
+
+    def retrieve(self, request: Request, pk: str = None) -> Response:
+        return Response(TableBillSerializer(table_bill(int(pk))).data)
+
+    @action(detail=True, methods=['post'])
+    def close(self, request: Request, pk: str = None) -> Response:
+        """
+        Функция расчета стола: все неоплаченные заказы стола оплачиваются в одной транзакции.
+
+        :param request: сумма счета 'total' (необязательно).
+        :param pk: номер стола.
+        :return: количество и id оплаченных заказов; 409, если сумма счета изменилась.
+        """
+        serializer = TableCloseSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        closed = close_table(int(pk), serializer.validated_data.get('total'))
+        if closed is None:
+            return Response({'detail': 'Счет стола изменился.', **TableBillSerializer(table_bill(int(pk))).data},
+                            status=status.HTTP_409_CONFLICT)
+        return Response({'table_number': int(pk), 'closed': len(closed), 'ids': [row['id'] for row in closed]})
+
+
+@method_decorator(reporting_view, name='get')
+@method_decorator(reporting_view, name='aget')
+class RevenueReportView(APIView):
+    """
+    Функция отчета о выручке по API (по агрегатам выручки, как и страница отчета).
+    Требует авторизации.
+    Параметры: 'date_from', 'date_to' - диапазон дат (ГГГГ-ММ-ДД),
+    'granularity' - детализация: day (по умолчанию), hour, table.
+    Отчет за явно заданный период длиннее REVENUE_REPORT_SYNC_MAX_DAYS (или с параметром 'background=1')
+    строится фоновой задачей: ответ 202 с задачей (см. /api/jobs/), повторный запрос возвращает ту же задачу.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = RevenueReportSerializer
+
+    def get(self, request: Request) -> Response:
+        params = self.report_params(request)
+        if self.in_background(request, params):
+            return self.job_response(request, params)
+        rows, totals = revenue_report(**params)
+        return self.report_response(params['granularity'], rows, totals)
+
+    async def aget(self, request: Request) -> Response:
+        params = self.report_params(request)
+        if self.in_background(request, params):
+            return await sync_to_async(self.job_response)(request, params)
+        rows, totals = await arevenue_report(**params)
+        return self.report_response(params['granularity'], rows, totals)
+
+    @staticmethod
+    def report_params(request: Request) -> Dict[str, Any]:
+        """
+        Функция разбора параметров отчета (неизвестная детализация заменяется на 'day').
+
+        :param request:
+        :return: параметры revenue_report.
+        """
+        granularity: str = request.query_params.get('granularity', 'day')
+        return {
+            'date_from': parse_day(request.query_params.get('date_from')),
+            'date_to': parse_day(request.query_params.get('date_to')),
+            'granularity': granularity if granularity in REVENUE_GRANULARITIES else 'day',
+        }
+
+    def report_response(self, granularity: str, rows: List[Dict[str, Any]], totals: Dict[str, Any]) -> Response:
+        return Response(self.serializer_class({'granularity': granularity, 'rows': rows, 'totals': totals}).data)
+
+    @staticmethod
+    def in_background(request: Request, params: Dict[str, Any]) -> bool:
+        return request.query_params.get('background') == '1' or is_heavy_report(params['date_from'], params['date_to'])
+
+    @staticmethod
+    def job_response(request: Request, params: Dict[str, Any]) -> Response:
+        """
+        Функция постановки тяжелого отчета в очередь фоновых задач.
+
+        :param request:
+        :param params: параметры revenue_report.
+        :return: ответ 202 с задачей (заголовок Location - состояние задачи).
+        """
+        job = submit_job('revenue-report', {
+            name: value.isoformat() if hasattr(value, 'isoformat') else value
+            for name, value in params.items() if value is not None
+        }, request.user)
+        return JobViewSet.accepted_response(request, job)
+
+
+@method_decorator(write_transaction, name='dispatch')
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Функция фоновых задач по API (тяжелые отчеты, выгрузки, пересчеты выполняются командой runjobs).
+    Требует авторизации; пользователь видит свои задачи, персонал - все.
+    Позволяет:
+    - Ставить задачу в очередь (POST /jobs/ {"kind": ..., "params": {...}}, ответ 202)
+    - Просматривать состояние задачи (GET /jobs/<id>/)
+    - Получать результат выполненной задачи (GET /jobs/<id>/result/: файл или краткий результат; 409 - не готова)
+    Виды задач пересчета данных (recalculate-totals, rebuild-revenue, archive-orders, purge-idempotency)
+    доступны только персоналу.
+    """
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self) -> QuerySet:
+        jobs = Job.objects.order_by('-created_at', '-id')
+        return jobs if self.request.user.is_staff else jobs.filter(owner=self.request.user)
+
+    def get_serializer_class(self):
+        if self.action == 'create':
+            return JobCreateSerializer
+        return JobSerializer
+
+    def create(self, request: Request) -> Response:
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        kind: str = serializer.validated_data['kind']
+        if kind in JOB_KINDS and JOB_KINDS[kind].staff_only and not request.user.is_staff:
+            raise PermissionDenied(f"Задача {kind} доступна только персоналу.")
+        try:
+            job = submit_job(kind, serializer.validated_data['params'], request.user)
+        except ValueError as exc:
+            raise ValidationError({'params': [str(exc)]})
+        return self.accepted_response(request, job)
+
+    @action(detail=True, methods=['get'])
+    def result(self, request: Request, pk: str = None) -> Response:
+        """
+        Функция результата выполненной задачи.
+
+        :param request:
+        :param pk: id задачи.
+        :return: файл результата или краткий результат; 409, если задача не выполнена.
+        """
+        job: Job = self.get_object()
+        if job.status != 'done':
+            return Response({'detail': 'Задача не выполнена.', **JobSerializer(job, context={'request': request}).data},
+                            status=status.HTTP_409_CONFLICT)
+        if job.result_file:
+            return job_result_response(job)
+        return Response(job.result)
+
+    @staticmethod
+    def accepted_response(request: Request, job: Job) -> Response:
+        """
+        Функция ответа на постановку задачи в очередь.
+
+        :param request:
+        :param job: задача.
+        :return: ответ 202 с задачей (заголовок Location - состояние задачи).
+        """
+        location: str = request.build_absolute_uri(reverse('job-detail', args=[job.pk]))
+        return Response(JobSerializer(job, context={'request': request}).data, status=status.HTTP_202_ACCEPTED,
+                        headers={'Location': location})
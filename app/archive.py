@@ -0,0 +1,123 @@
+import heapq
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db.models.query import QuerySet
+from django.utils import timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from . import conditional
+from .models import ArchivedOrder, Order, OrderItem
+from .transactions import retry_write
+
+
+def archive_cutoff(days: Optional[int] = None) -> datetime:
+    """
+    Функция границы архивирования: заказы, созданные раньше нее, переносятся в архив.
+
+    :param days: возраст заказа (дней), по умолчанию ARCHIVE_AFTER_DAYS.
+    :return: дата и время границы.
+    """
+    return timezone.now() - timedelta(days=settings.ARCHIVE_AFTER_DAYS if days is None else days)
+
+
+def archivable_orders(cutoff: datetime) -> QuerySet:
+    """
+    Функция отбора заказов для архивирования (по индексу статуса и даты создания).
+
+    :param cutoff: граница архивирования.
+    :return: набор оплаченных заказов, созданных до границы, от старых к новым.
+    """
+    return Order.objects.filter(status='paid', created_at__lt=cutoff).order_by('created_at', 'id')
+
+
+def archive_batch(cutoff: datetime, batch_size: int) -> int:
+    """
+    Функция переноса одной порции заказов с позициями в архив (одной короткой транзакцией записи).
+    Заказы и позиции удаляются из рабочих таблиц напрямую (без Order.delete),
+    поэтому агрегаты выручки не меняются и события удаления не публикуются.
+
+    :param cutoff: граница архивирования.
+    :param batch_size: количество заказов в порции.
+    :return: количество перенесенных заказов.
+    """
+    def move() -> int:
+        orders = list(archivable_orders(cutoff).values(
+            'id', 'table_number', 'status', 'total_price', 'created_at', 'updated_at')[:batch_size])
+        if not orders:
+            return 0
+        ids = [order['id'] for order in orders]
+        lines: Dict[int, List[list]] = defaultdict(list)
+        for line in (OrderItem.objects.filter(order_id__in=ids).order_by('id')
+                     .values_list('id', 'order_id', 'menu_item_id', 'menu_item__name', 'quantity', 'price')):
+            line_id, order_id, menu_item_id, name, quantity, price = line
+            lines[order_id].append([line_id, menu_item_id, name, quantity, str(price)])
+
+        archived_at = timezone.now()
+        ArchivedOrder.objects.bulk_create(
+            ArchivedOrder(**order, archived_at=archived_at, lines=lines[order['id']]) for order in orders
+        )
+        # позиции удаляются каскадом (одним DELETE по order_id)
+        Order.objects.filter(pk__in=ids).delete()
+        return len(ids)
+
+    return retry_write(move)
+
+
+def archive_orders(cutoff: datetime, batch_size: Optional[int] = None, pause: Optional[float] = None,
+                   max_batches: Optional[int] = None) -> Iterator[int]:
+    """
+    Функция архивирования заказов порциями: между порциями блокировка записи освобождается
+    и делается пауза, чтобы архивирование не мешало работе кафе.
+
+    :param cutoff: граница архивирования.
+    :param batch_size: количество заказов в порции (по умолчанию ARCHIVE_BATCH_SIZE).
+    :param pause: пауза между порциями, сек. (по умолчанию ARCHIVE_BATCH_PAUSE).
+    :param max_batches: максимальное количество порций (None - до конца).
+    :return: итератор количества перенесенных заказов по порциям.
+    """
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    pause = settings.ARCHIVE_BATCH_PAUSE if pause is None else pause
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = archive_batch(cutoff, batch_size)
+        if not moved:
+            break
+        batches += 1
+        # удаление заказов не меняет max(updated_at) оставшихся - ETag / Last-Modified списков
+        conditional.touch_orders_deleted()
+        yield moved
+        if moved < batch_size:
+            break
+        time.sleep(pause)
+
+
+def archived_line_rows(queryset: QuerySet) -> Iterator[tuple]:
+    """
+    Функция строк позиций архивных заказов в формате выгрузки позиций (EXPORT_COLUMNS['order-items']).
+
+    :param queryset: набор архивных заказов.
+    :return: итератор строк (id, order_id, table_number, status, created_at, menu_item_id, menu_item,
+             quantity, price).
+    """
+    orders = queryset.values_list('id', 'table_number', 'status', 'created_at', 'lines')
+    for order_id, table_number, status, created_at, lines in orders.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        for line_id, menu_item_id, name, quantity, price in lines:
+            yield line_id, order_id, table_number, status, created_at, menu_item_id, name, quantity, Decimal(price)
+
+
+def merge_by_created(hot: Iterable[tuple], archived: Iterable[tuple],
+                     key_fields: Tuple[int, ...]) -> Iterator[tuple]:
+    """
+    Функция слияния упорядоченных строк рабочих таблиц и архива (без накопления в памяти).
+
+    :param hot: строки рабочих таблиц.
+    :param archived: строки архива.
+    :param key_fields: номера полей ключа упорядочивания (дата создания заказа, id).
+    :return: итератор строк в общем порядке.
+    """
+    def key(row: tuple) -> Tuple[Any, ...]:
+        return tuple(row[index] for index in key_fields)
+
+    return heapq.merge(archived, hot, key=key)
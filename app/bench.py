@@ -0,0 +1,521 @@
+import asyncio
+import itertools
+import math
+import random
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from decimal import Decimal
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import URLPattern, URLResolver, reverse
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from . import menu_cache
+from .jobs import claim_job, run_job, submit_job
+from .models import MenuItem, Order, OrderItem
+
+# размер пакета заказов, создаваемых одной транзакцией при заполнении БД замеров
+SEED_BATCH_SIZE: int = 1000
+
+
+@contextmanager
+def bench_database(verbosity: int = 0) -> Iterator[None]:
+    """
+    Функция (контекстный менеджер) временной тестовой БД для замеров производительности.
+    Замеры не затрагивают рабочую БД: создается и после замеров удаляется БД тестов Django.
+
+    :param verbosity: подробность вывода создания БД.
+    :return:
+    """
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True)
+    # остальные БД (реплика отчетов) на время замеров указывают на временную БД
+    mirrors = {alias: connections[alias].settings_dict for alias in connections if alias != DEFAULT_DB_ALIAS}
+    for alias in mirrors:
+        connections[alias].close()
+        connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+    try:
+        yield
+    finally:
+        for alias, settings_dict in mirrors.items():
+            connections[alias].close()
+            connections[alias].settings_dict = settings_dict
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        teardown_test_environment()
+
+
+def seed_menu(size: int = 20) -> List[MenuItem]:
+    """
+    Функция заполнения меню для замеров.
+
+    :param size: количество блюд.
+    :return: список блюд.
+    """
+    return MenuItem.objects.bulk_create(
+        MenuItem(name=f"Блюдо {number}", price=Decimal(random.randint(50, 1500)))
+        for number in range(1, size + 1)
+    )
+
+
+def seed_orders(count: int, menu: List[MenuItem], lines: int = 3, tables: int = 30) -> None:
+    """
+    Функция заполнения БД заказами для замеров (пакетами по SEED_BATCH_SIZE).
+
+    :param count: количество заказов.
+    :param menu: блюда меню.
+    :param lines: количество позиций в заказе.
+    :param tables: количество столов.
+    :return:
+    """
+    statuses = [status for status, _ in Order.STATUS_CHOICES]
+    for start in range(0, count, SEED_BATCH_SIZE):
+        Order.objects.create_with_items([
+            {
+                'table_number': random.randint(1, tables),
+                'status': random.choice(statuses),
+                'order_items': [
+                    {'menu_item': random.choice(menu), 'quantity': random.randint(1, 3)} for _ in range(lines)
+                ],
+            }
+            for _ in range(min(SEED_BATCH_SIZE, count - start))
+        ])
+
+
+def measure(func: Callable[[], Any], repeat: int = 1) -> Dict[str, float]:
+    """
+    Функция замера времени выполнения и количества SQL-запросов (лучший из повторов).
+
+    :param func: замеряемая функция.
+    :param repeat: количество повторов.
+    :return: словарь с временем (с) и количеством запросов лучшего повтора.
+    """
+    best: Dict[str, float] = {}
+    for _ in range(max(repeat, 1)):
+        queries: List[int] = []
+
+        # запросы считаются оберткой выполнения, без журнала запросов (он ограничен 9000 записями)
+        def count_query(execute, sql, params, many, context):
+            queries.append(1)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            started = time.perf_counter()
+            func()
+            seconds = time.perf_counter() - started
+        if not best or seconds < best['seconds']:
+            best = {'seconds': seconds, 'queries': len(queries)}
+    return best
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """
+    Функция расчета перцентиля (по ближайшему рангу).
+
+    :param values: значения.
+    :param percent: перцентиль (0-100).
+    :return: значение перцентиля (0 для пустого списка).
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+class BenchContext:
+    """
+    Данные замеров: id блюд и заказов заполненной БД.
+    Сценарии изменения данных берут для каждого запроса новые заказы / позиции (создаются вне замера).
+    """
+
+    menu_ids: List[int]
+    order_ids: List[int]
+    tables: Iterator[int]
+    job_id: Optional[int]
+
+    def __init__(self) -> None:
+        self.menu_ids = list(MenuItem.objects.order_by('id').values_list('id', flat=True))
+        self.order_ids = list(Order.objects.order_by('id').values_list('id', flat=True))
+        # столы для сценариев расчета - вне номеров столов заполненной БД
+        self.tables = itertools.count(1000)
+        self.job_id = None
+
+    def order_id(self) -> int:
+        return random.choice(self.order_ids)
+
+    def menu_id(self) -> int:
+        return random.choice(self.menu_ids)
+
+    def fresh_order(self) -> int:
+        """
+        Функция создания заказа с позицией для сценариев изменения и удаления.
+
+        :return: id нового заказа.
+        """
+        order = Order.objects.create_with_items([{
+            'table_number': random.randint(1, 30),
+            'order_items': [{'menu_item': menu_cache.get_menu_item(self.menu_id()), 'quantity': 1}],
+        }])[0]
+        return order.pk
+
+    def fresh_table(self, orders: int = 3) -> int:
+        """
+        Функция создания стола с неоплаченными заказами для сценариев расчета стола.
+
+        :param orders: количество заказов.
+        :return: номер стола.
+        """
+        table_number = next(self.tables)
+        Order.objects.create_with_items([{
+            'table_number': table_number,
+            'order_items': [{'menu_item': menu_cache.get_menu_item(self.menu_id()), 'quantity': 2}],
+        } for _ in range(orders)])
+        return table_number
+
+    def fresh_line(self) -> int:
+        """
+        Функция создания позиции заказа для сценария удаления позиции.
+
+        :return: id новой позиции.
+        """
+        line = OrderItem.objects.create(order_id=self.order_id(), menu_item_id=self.menu_id(), quantity=1)
+        return line.pk
+
+    def done_job(self) -> int:
+        """
+        Функция создания выполненной фоновой задачи (выгрузка выручки, выполняется сразу, вне замера)
+        для сценариев состояния и результата задачи.
+
+        :return: id задачи.
+        """
+        if self.job_id is None:
+            job = submit_job('export', {'kind': 'revenue', 'format': 'csv'})
+            # задачи очереди выполняются по порядку постановки, в том числе эта
+            job_id = claim_job('bench')
+            while job_id is not None:
+                run_job(job_id, 'bench')
+                job_id = claim_job('bench')
+            self.job_id = job.pk
+        return self.job_id
+
+
+class BenchScenario:
+    """
+    Сценарий замера: один маршрут, метод и построитель запроса.
+    Построитель вызывается до замера и возвращает адрес и данные запроса.
+    """
+
+    name: str
+    route: str
+    method: str
+    build: Callable[[BenchContext], Tuple[str, Optional[Any]]]
+    content_type: Optional[str]
+    headers: Dict[str, str]
+
+    def __init__(self, name: str, route: str, method: str,
+                 build: Callable[[BenchContext], Tuple[str, Optional[Any]]], json: bool = False,
+                 headers: Optional[Dict[str, str]] = None) -> None:
+        self.name = name
+        self.route = route
+        self.method = method
+        self.build = build
+        self.content_type = 'application/json' if json else None
+        self.headers = headers or {}
+
+
+def _bulk_payload(context: BenchContext) -> List[Dict[str, Any]]:
+    return [
+        {'table_number': random.randint(1, 30), 'items': [{'menu_item': context.menu_id(), 'quantity': 2}]}
+        for _ in range(20)
+    ]
+
+
+# сценарии замеров: все маршруты app.urls и api.urls (route - имя маршрута)
+BENCH_SCENARIOS: List[BenchScenario] = [
+    BenchScenario('order_list', 'order_list', 'get', lambda c: (reverse('order_list'), None)),
+    BenchScenario('order_list?status=paid', 'order_list', 'get',
+                  lambda c: (reverse('order_list'), {'status': 'paid'})),
+    BenchScenario('order_create GET', 'order_create', 'get', lambda c: (reverse('order_create'), None)),
+    BenchScenario('order_create POST', 'order_create', 'post',
+                  lambda c: (reverse('order_create'), {'table_number': random.randint(1, 30), 'status': 'pending'})),
+    BenchScenario('order_detail', 'order_detail', 'get',
+                  lambda c: (reverse('order_detail', args=[c.order_id()]), None)),
+    BenchScenario('order_update GET', 'order_update', 'get',
+                  lambda c: (reverse('order_update', args=[c.order_id()]), None)),
+    BenchScenario('order_update POST', 'order_update', 'post',
+                  lambda c: (reverse('order_update', args=[c.fresh_order()]), {'table_number': 5, 'status': 'paid'})),
+    BenchScenario('order_delete', 'order_delete', 'post',
+                  lambda c: (reverse('order_delete', args=[c.fresh_order()]), None)),
+    BenchScenario('revenue_report', 'revenue_report', 'get', lambda c: (reverse('revenue_report'), None)),
+    BenchScenario('revenue_report?granularity=hour', 'revenue_report', 'get',
+                  lambda c: (reverse('revenue_report'), {'granularity': 'hour'})),
+    BenchScenario('floor', 'floor', 'get', lambda c: (reverse('floor'), None)),
+    BenchScenario('table_bill', 'table_bill', 'get',
+                  lambda c: (reverse('table_bill', args=[random.randint(1, 30)]), None)),
+    BenchScenario('table_close', 'table_close', 'post',
+                  lambda c: (reverse('table_close', args=[c.fresh_table()]), None)),
+    BenchScenario('order_item_add', 'order_item_add', 'post',
+                  lambda c: (reverse('order_item_add', args=[c.order_id()]),
+                             {'menu_item': c.menu_id(), 'quantity': 1})),
+    BenchScenario('order_item_delete', 'order_item_delete', 'post',
+                  lambda c: (reverse('order_item_delete', args=[c.fresh_line()]), None)),
+    BenchScenario('menu_item_create GET', 'menu_item_create', 'get', lambda c: (reverse('menu_item_create'), None)),
+    BenchScenario('menu_item_create POST', 'menu_item_create', 'post',
+                  lambda c: (reverse('menu_item_create'), {'name': 'Новое блюдо', 'price': '99.00'})),
+    BenchScenario('export orders csv', 'export', 'get',
+                  lambda c: (reverse('export', args=['orders']), {'format': 'csv', 'status': 'paid'})),
+    BenchScenario('export revenue jsonl', 'export', 'get',
+                  lambda c: (reverse('export', args=['revenue']), {'format': 'jsonl'})),
+    BenchScenario('job_detail', 'job_detail', 'get', lambda c: (reverse('job_detail', args=[c.done_job()]), None)),
+    BenchScenario('job_result', 'job_result', 'get', lambda c: (reverse('job_result', args=[c.done_job()]), None)),
+    BenchScenario('metrics', 'metrics', 'get', lambda c: (reverse('metrics'), None)),
+    BenchScenario('api-root', 'api-root', 'get', lambda c: ('/api/', None)),
+    BenchScenario('api order-list', 'order-list', 'get', lambda c: ('/api/orders/', None)),
+    BenchScenario('api order-list?status=paid', 'order-list', 'get',
+                  lambda c: ('/api/orders/', {'status': 'paid', 'page_size': 100})),
+    BenchScenario('api order-list POST', 'order-list', 'post',
+                  lambda c: ('/api/orders/', {'table_number': 3, 'items': [{'menu_item': c.menu_id(), 'quantity': 1}]}),
+                  json=True),
+    # повтор создания заказа с тем же ключом идемпотентности (после первого запроса - сохраненный ответ)
+    BenchScenario('api order-list POST Idempotency-Key replay', 'order-list', 'post',
+                  lambda c: ('/api/orders/', {'table_number': 3,
+                                              'items': [{'menu_item': c.menu_ids[0], 'quantity': 1}]}),
+                  json=True, headers={'Idempotency-Key': 'bench-replay'}),
+    BenchScenario('api order-bulk POST x20', 'order-bulk', 'post', lambda c: ('/api/orders/bulk/', _bulk_payload(c)),
+                  json=True),
+    BenchScenario('api order-detail', 'order-detail', 'get', lambda c: (f'/api/orders/{c.order_id()}/', None)),
+    BenchScenario('api order-detail PATCH', 'order-detail', 'patch',
+                  lambda c: (f'/api/orders/{c.fresh_order()}/', {'status': 'ready'}), json=True),
+    BenchScenario('api order-status POST', 'order-status', 'post',
+                  lambda c: (f'/api/orders/{c.fresh_order()}/status/', {'status': 'ready'}), json=True),
+    BenchScenario('api order-status-bulk POST x20', 'order-status-bulk', 'post',
+                  lambda c: ('/api/orders/status/bulk/', {'ids': [c.fresh_order() for _ in range(20)],
+                                                         'status': 'ready'}), json=True),
+    BenchScenario('api order-status-bulk POST table', 'order-status-bulk', 'post',
+                  lambda c: ('/api/orders/status/bulk/', {'table': random.randint(1, 30), 'status': 'ready'}),
+                  json=True),
+    BenchScenario('api order-detail DELETE', 'order-detail', 'delete',
+                  lambda c: (f'/api/orders/{c.fresh_order()}/', None)),
+    BenchScenario('api menuitem-list', 'menuitem-list', 'get', lambda c: ('/api/menu-items/', None)),
+    BenchScenario('api menuitem-search', 'menuitem-search', 'get',
+                  lambda c: ('/api/menu-items/search/', {'q': 'блюдо 1'})),
+    BenchScenario('api revenue-report', 'revenue-report', 'get', lambda c: ('/api/revenue/', None)),
+    BenchScenario('api revenue-report?granularity=hour', 'revenue-report', 'get',
+                  lambda c: ('/api/revenue/', {'granularity': 'hour'})),
+    BenchScenario('api table-list', 'table-list', 'get', lambda c: ('/api/tables/', None)),
+    BenchScenario('api table-detail', 'table-detail', 'get',
+                  lambda c: (f'/api/tables/{random.randint(1, 30)}/', None)),
+    BenchScenario('api table-close POST', 'table-close', 'post',
+                  lambda c: (f'/api/tables/{c.fresh_table()}/close/', {}), json=True),
+    BenchScenario('api menuitem-detail', 'menuitem-detail', 'get',
+                  lambda c: (f'/api/menu-items/{c.menu_id()}/', None)),
+    BenchScenario('api job-list', 'job-list', 'get', lambda c: ('/api/jobs/', None)),
+    # повторная постановка той же выгрузки возвращает еще не выполненную задачу
+    BenchScenario('api job-list POST', 'job-list', 'post',
+                  lambda c: ('/api/jobs/', {'kind': 'export', 'params': {'kind': 'orders', 'status': 'paid'}}),
+                  json=True),
+    BenchScenario('api job-detail', 'job-detail', 'get', lambda c: (f'/api/jobs/{c.done_job()}/', None)),
+    BenchScenario('api job-result', 'job-result', 'get', lambda c: (f'/api/jobs/{c.done_job()}/result/', None)),
+]
+
+
+# маршруты без сценариев замера (с причиной)
+BENCH_SKIPPED_ROUTES: Dict[str, str] = {
+    'order_events': 'бесконечный поток событий (server-sent events)',
+}
+
+
+def route_names(patterns: Iterable[Any]) -> Set[str]:
+    """
+    Функция получения имен маршрутов (включая вложенные).
+
+    :param patterns: список маршрутов (urlpatterns).
+    :return: множество имен маршрутов.
+    """
+    names: Set[str] = set()
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            names |= route_names(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+def run_scenario(client: Client, context: BenchContext, scenario: BenchScenario,
+                 requests: int) -> Dict[str, Any]:
+    """
+    Функция замера сценария: задержки (перцентили), число SQL-запросов, время SQL и пик памяти.
+    Пик памяти (tracemalloc) замеряется отдельным запросом, чтобы трассировка не искажала задержки.
+
+    :param client: тестовый клиент (с авторизованным пользователем).
+    :param context: данные замеров.
+    :param scenario: сценарий.
+    :param requests: количество запросов.
+    :return: словарь показателей сценария.
+    """
+    latencies: List[float] = []
+    sql_times: List[float] = []
+    query_counts: List[int] = []
+    statuses: Set[int] = set()
+
+    def send() -> Tuple[float, float, int, int]:
+        path, data = scenario.build(context)
+        sql: List[float] = []
+
+        def time_query(execute, sql_text, params, many, query_context):
+            started = time.perf_counter()
+            try:
+                return execute(sql_text, params, many, query_context)
+            finally:
+                sql.append(time.perf_counter() - started)
+
+        kwargs: Dict[str, Any] = {'content_type': scenario.content_type} if scenario.content_type else {}
+        if scenario.headers:
+            kwargs['headers'] = scenario.headers
+        with connection.execute_wrapper(time_query):
+            started = time.perf_counter()
+            response = getattr(client, scenario.method)(path, data, **kwargs)
+            # потоковые ответы (выгрузки) замеряются вместе с генерацией содержимого
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        return elapsed, sum(sql), len(sql), response.status_code
+
+    for _ in range(requests):
+        elapsed, sql_time, queries, status = send()
+        latencies.append(elapsed)
+        sql_times.append(sql_time)
+        query_counts.append(queries)
+        statuses.add(status)
+
+    tracemalloc.start()
+    try:
+        send()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'route': scenario.route,
+        'method': scenario.method.upper(),
+        'requests': requests,
+        'status': sorted(statuses),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'queries': max(query_counts),
+        'sql_ms': round(percentile(sql_times, 50) * 1000, 3),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def check_thresholds(results: Dict[str, Dict[str, Any]], thresholds: Dict[str, Dict[str, float]]) -> List[str]:
+    """
+    Функция проверки показателей по порогам.
+    Пороги задаются по названию сценария; ключ '*' - пороги для всех сценариев.
+
+    :param results: показатели сценариев {название: показатели}.
+    :param thresholds: пороги {название или '*': {показатель: максимум}}.
+    :return: список описаний превышений (пустой - регрессий нет).
+    """
+    regressions: List[str] = []
+    for name, metrics in results.items():
+        limits = {**thresholds.get('*', {}), **thresholds.get(name, {})}
+        for metric, limit in limits.items():
+            value = metrics.get(metric)
+            if value is not None and value > limit:
+                regressions.append(f"{name}: {metric} = {value} > {limit}")
+    return regressions
+
+
+async def asgi_get(application: Callable, path: str, headers: List[Tuple[bytes, bytes]]) -> int:
+    """
+    Функция GET-запроса к приложению ASGI в текущем процессе (без сетевого сервера).
+
+    :param application: приложение ASGI.
+    :param path: адрес с параметрами запроса.
+    :param headers: заголовки запроса.
+    :return: код ответа.
+    """
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+        'headers': [(b'host', b'testserver')] + headers,
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+    disconnected = asyncio.Event()
+    received = False
+    status = 0
+
+    async def receive() -> Dict[str, Any]:
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message: Dict[str, Any]) -> None:
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    try:
+        await application(scope, receive, send)
+    finally:
+        disconnected.set()
+    return status
+
+
+async def run_clients(application: Callable, paths: Callable[[], str], clients: int, requests: int,
+                      headers: List[Tuple[bytes, bytes]]) -> Dict[str, Any]:
+    """
+    Функция замера одновременной нагрузки: clients клиентов одновременно, каждый выполняет
+    requests последовательных запросов. Число потоков процесса отслеживается во время замера.
+
+    :param application: приложение ASGI.
+    :param paths: функция выбора адреса очередного запроса.
+    :param clients: количество одновременных клиентов.
+    :param requests: количество запросов одного клиента.
+    :param headers: заголовки запросов (например, cookie сессии).
+    :return: словарь показателей (пропускная способность, перцентили задержки, пик потоков, ошибки).
+    """
+    latencies: List[float] = []
+    errors = 0
+    peak_threads = threading.active_count()
+
+    async def client() -> None:
+        nonlocal errors
+        for _ in range(requests):
+            started = time.perf_counter()
+            status = await asgi_get(application, paths(), headers)
+            latencies.append(time.perf_counter() - started)
+            errors += status != 200
+
+    async def watch_threads() -> None:
+        nonlocal peak_threads
+        while True:
+            peak_threads = max(peak_threads, threading.active_count())
+            await asyncio.sleep(0.005)
+
+    watcher = asyncio.ensure_future(watch_threads())
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(client() for _ in range(clients)))
+    finally:
+        elapsed = time.perf_counter() - started
+        watcher.cancel()
+    return {
+        'clients': clients,
+        'requests': len(latencies),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'peak_threads': peak_threads,
+        'errors': errors,
+    }
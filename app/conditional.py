@@ -0,0 +1,178 @@
+import hashlib
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone as dt_timezone
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.db.models.query import QuerySet
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.response import Response
+from typing import Any, Callable, Dict, Optional, Tuple
+from . import menu_cache
+
+# время последнего удаления заказа: удаление не меняет max(updated_at) оставшихся заказов
+ORDERS_DELETED_KEY: str = 'orders:deleted_at'
+
+
+def touch_orders_deleted() -> None:
+    """
+    Функция отметки времени удаления заказов (для Last-Modified списков заказов).
+
+    :return:
+    """
+    cache.set(ORDERS_DELETED_KEY, timezone.now(), None)
+
+
+class ConditionalGetMixin(ABC):
+    """
+    Примесь ViewSet: строгий ETag и Last-Modified для list и retrieve.
+    На If-None-Match / If-Modified-Since с неизменившимися данными отвечает 304
+    до выборки и сериализации данных. Признаки изменения дают get_validators() / aget_validators(),
+    которые определяет наследник.
+    """
+
+    @abstractmethod
+    def get_validators(self, request: Request, *args, **kwargs) -> Tuple[str, Optional[datetime]]:
+        """
+        Функция получения признаков изменения данных ответа.
+
+        :param request:
+        :return: состояние данных (строка для ETag) и время последнего изменения.
+        """
+
+    @abstractmethod
+    async def aget_validators(self, request: Request, *args, **kwargs) -> Tuple[str, Optional[datetime]]:
+        """
+        Функция получения признаков изменения данных ответа (асинхронная, для представлений ASGI).
+
+        :param request:
+        :return: состояние данных (строка для ETag) и время последнего изменения.
+        """
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request: Request, *args, **kwargs) -> Response:
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+    async def alist(self, request: Request, *args, **kwargs) -> Response:
+        return await self.aconditional_response(super().alist, request, *args, **kwargs)
+
+    async def aretrieve(self, request: Request, *args, **kwargs) -> Response:
+        return await self.aconditional_response(super().aretrieve, request, *args, **kwargs)
+
+    def conditional_response(self, handler: Callable, request: Request, *args, **kwargs) -> Response:
+        """
+        Функция ответа на условный GET-запрос.
+
+        :param handler: обработчик запроса (list / retrieve) на случай изменившихся данных.
+        :param request:
+        :return: ответ 304 или ответ обработчика с заголовками ETag и Last-Modified.
+        """
+        etag, timestamp = self.make_validators(request, *self.get_validators(request, *args, **kwargs))
+        not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if not_modified is not None:
+            return not_modified
+        return self.set_validators(handler(request, *args, **kwargs), etag, timestamp)
+
+    async def aconditional_response(self, handler: Callable, request: Request, *args, **kwargs) -> Response:
+        """
+        Функция ответа на условный GET-запрос (асинхронная, для представлений ASGI).
+
+        :param handler: асинхронный обработчик запроса (alist / aretrieve) на случай изменившихся данных.
+        :param request:
+        :return: ответ 304 или ответ обработчика с заголовками ETag и Last-Modified.
+        """
+        etag, timestamp = self.make_validators(request, *await self.aget_validators(request, *args, **kwargs))
+        not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if not_modified is not None:
+            return not_modified
+        return self.set_validators(await handler(request, *args, **kwargs), etag, timestamp)
+
+    @staticmethod
+    def make_validators(request: Request, state: str, last_modified: Optional[datetime]) -> Tuple[str, Optional[int]]:
+        """
+        Функция расчета ETag и Last-Modified ответа.
+
+        :param request:
+        :param state: состояние данных.
+        :param last_modified: время последнего изменения.
+        :return: ETag и время последнего изменения (сек.).
+        """
+        # ETag зависит и от параметров запроса (фильтры, курсор) и формата ответа
+        variant = f"{state}|{request.get_full_path()}|{request.accepted_renderer.format}"
+        etag = quote_etag(hashlib.sha1(variant.encode()).hexdigest())
+        return etag, int(last_modified.timestamp()) if last_modified else None
+
+    @staticmethod
+    def set_validators(response: Response, etag: str, timestamp: Optional[int]) -> Response:
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+
+
+class OrderConditionalGetMixin(ConditionalGetMixin):
+    """
+    Признаки изменения заказов: max(updated_at) и количество заказов отфильтрованного набора
+    (одним агрегирующим запросом). Любое изменение заказа или его позиций обновляет updated_at,
+    удаление уменьшает количество и сдвигает время последнего удаления.
+    Last-Modified имеет точность до секунды, поэтому клиентам лучше использовать ETag.
+    """
+
+    def get_validators(self, request: Request, *args, **kwargs) -> Tuple[str, Optional[datetime]]:
+        state = self.validators_queryset(kwargs).aggregate(last_modified=Max('updated_at'), count=Count('id'))
+        return self.order_state(state, cache.get(ORDERS_DELETED_KEY))
+
+    async def aget_validators(self, request: Request, *args, **kwargs) -> Tuple[str, Optional[datetime]]:
+        state = await self.validators_queryset(kwargs).aaggregate(last_modified=Max('updated_at'), count=Count('id'))
+        return self.order_state(state, await cache.aget(ORDERS_DELETED_KEY))
+
+    def validators_queryset(self, kwargs: Dict[str, Any]) -> QuerySet:
+        """
+        Функция отбора заказов ответа (отфильтрованный список или один заказ).
+
+        :param kwargs: параметры адреса.
+        :return: набор заказов.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if lookup is not None:
+            try:
+                queryset = queryset.filter(**{self.lookup_field: lookup})
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound()
+        return queryset
+
+    @staticmethod
+    def order_state(state: Dict[str, Any], deleted_at: Optional[datetime]) -> Tuple[str, Optional[datetime]]:
+        """
+        Функция признаков изменения по агрегату заказов и времени последнего удаления.
+
+        :param state: max(updated_at) и количество заказов.
+        :param deleted_at: время последнего удаления заказа.
+        :return: состояние данных (строка для ETag) и время последнего изменения.
+        """
+        last_modified: Optional[datetime] = state['last_modified']
+        if deleted_at and (last_modified is None or deleted_at > last_modified):
+            last_modified = deleted_at
+        return f"{state['count']}|{last_modified.isoformat() if last_modified else ''}", last_modified
+
+
+class MenuConditionalGetMixin(ConditionalGetMixin):
+    """Признак изменения меню - версия кэша меню (меняется при каждом изменении блюд)."""
+
+    def get_validators(self, request: Request, *args, **kwargs) -> Tuple[str, Optional[datetime]]:
+        return self.menu_state(menu_cache.get_version())
+
+    async def aget_validators(self, request: Request, *args, **kwargs) -> Tuple[str, Optional[datetime]]:
+        return self.menu_state(await menu_cache.aget_version())
+
+    @staticmethod
+    def menu_state(version: int) -> Tuple[str, Optional[datetime]]:
+        return str(version), datetime.fromtimestamp(version / 1e9, tz=dt_timezone.utc)
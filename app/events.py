@@ -0,0 +1,332 @@
+import asyncio
+import itertools
+import json
+import threading
+import time
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from collections import deque
+from django.conf import settings
+from django.core import signals
+from django.core.exceptions import RequestAborted
+from django.core.handlers.asgi import ASGIHandler, get_script_prefix
+from django.db import transaction
+from django.http import HttpResponseBase
+from django.urls import reverse, set_script_prefix
+from typing import (Any, AsyncIterator, Callable, Deque, Dict, Iterator, List, Mapping, Optional, Set, Tuple,
+                    Union)
+
+# типы событий заказов
+ORDER_CREATED: str = 'order_created'
+ORDER_UPDATED: str = 'order_updated'
+ORDER_STATUS_CHANGED: str = 'order_status_changed'
+ORDER_DELETED: str = 'order_deleted'
+LINE_ADDED: str = 'line_added'
+LINE_DELETED: str = 'line_deleted'
+# служебное событие: пропущенные события уже вытеснены из буфера, клиенту нужно перечитать данные
+RESET: str = 'reset'
+
+
+class Event:
+    """Событие заказа: номер (для Last-Event-ID), тип и данные (id, стол и статус заказа и т.д.)."""
+
+    id: int
+    type: str
+    data: Dict[str, Any]
+
+    def __init__(self, event_id: int, event_type: str, data: Dict[str, Any]) -> None:
+        self.id = event_id
+        self.type = event_type
+        self.data = data
+
+    def matches(self, status: Optional[str], table: Optional[int]) -> bool:
+        """
+        Функция проверки события по фильтрам подписчика.
+
+        :param status: статус заказа (None - любой).
+        :param table: номер стола (None - любой).
+        :return: True, если событие подходит.
+        """
+        # смена статуса или стола интересна и подписчикам прежнего значения (заказ уходит с их экрана)
+        return ((status is None or status in (self.data.get('status'), self.data.get('previous_status')))
+                and (table is None or table in (self.data.get('table_number'), self.data.get('previous_table_number'))))
+
+    def encode(self) -> str:
+        """
+        Функция записи события в формате server-sent events.
+
+        :return: текст события.
+        """
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data, ensure_ascii=False)}\n\n"
+
+
+class Subscription:
+    """Подписка одного клиента: очередь событий в цикле событий (asyncio) подписчика и фильтры."""
+
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue
+    status: Optional[str]
+    table: Optional[int]
+    overflowed: bool
+
+    def __init__(self, status: Optional[str], table: Optional[int]) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+        self.status = status
+        self.table = table
+        self.overflowed = False
+
+    def deliver(self, event: Event) -> None:
+        # вызывается в цикле событий подписчика; медленный подписчик отключается
+        # и при переподключении дочитывает события из буфера по Last-Event-ID
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout: float) -> Optional[Event]:
+        """
+        Функция ожидания следующего события.
+
+        :param timeout: время ожидания (сек.).
+        :return: событие или None, если за время ожидания событий не было.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventHub:
+    """
+    Рассылка событий заказов подписчикам текущего процесса.
+    Последние события хранятся в буфере (EVENTS_BUFFER_SIZE) для продолжения
+    потока переподключившимся клиентом по Last-Event-ID.
+    Публикация потокобезопасна: события приходят из синхронных представлений,
+    а подписчики ждут их в цикле событий ASGI.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._buffer: Deque[Event] = deque(maxlen=settings.EVENTS_BUFFER_SIZE)
+        self._subscribers: Set[Subscription] = set()
+        # номера событий растут и между перезапусками процесса (начинаются с текущего времени в мкс)
+        self._ids = itertools.count(time.time_ns() // 1000)
+        self._last_id: int = next(self._ids)
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> Event:
+        """
+        Функция публикации события всем подписчикам.
+
+        :param event_type: тип события.
+        :param data: данные события.
+        :return: опубликованное событие.
+        """
+        with self._lock:
+            event = Event(next(self._ids), event_type, data)
+            self._buffer.append(event)
+            self._last_id = event.id
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            if event.matches(subscription.status, subscription.table):
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+                except RuntimeError:
+                    # цикл событий подписчика уже закрыт
+                    self.unsubscribe(subscription)
+        return event
+
+    def subscribe(self, status: Optional[str] = None, table: Optional[int] = None,
+                  last_event_id: Optional[int] = None) -> Tuple[Subscription, List[Event]]:
+        """
+        Функция подписки на события (вызывается в цикле событий подписчика).
+        Подписка и выборка пропущенных событий выполняются под одной блокировкой,
+        поэтому события не теряются и не повторяются.
+
+        :param status: фильтр по статусу заказа.
+        :param table: фильтр по номеру стола.
+        :param last_event_id: номер последнего полученного клиентом события.
+        :return: подписка и пропущенные события (или одно событие reset, если часть уже вытеснена).
+        """
+        subscription = Subscription(status, table)
+        with self._lock:
+            self._subscribers.add(subscription)
+            backlog: List[Event] = []
+            if last_event_id is not None and last_event_id != self._last_id:
+                if self._buffer and self._buffer[0].id - 1 <= last_event_id < self._last_id:
+                    backlog = [event for event in self._buffer
+                               if event.id > last_event_id and event.matches(status, table)]
+                else:
+                    backlog = [Event(self._last_id, RESET, {})]
+        return subscription, backlog
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+
+hub = EventHub()
+
+
+def publish_on_commit(event_type: str, data: Union[Dict[str, Any], Callable[[], Dict[str, Any]]]) -> None:
+    """
+    Функция публикации события после фиксации транзакции (при откате событие не публикуется).
+
+    :param event_type: тип события.
+    :param data: данные события или функция их получения (вызывается после фиксации, вне транзакции).
+    :return:
+    """
+    transaction.on_commit(lambda: hub.publish(event_type, data() if callable(data) else data))
+
+
+def order_data(order) -> Dict[str, Any]:
+    """
+    Функция данных события заказа.
+
+    :param order: объект заказа.
+    :return: словарь с id, номером стола и статусом заказа.
+    """
+    return {'order': order.pk, 'table_number': order.table_number, 'status': order.status}
+
+
+async def event_stream(status: Optional[str] = None, table: Optional[int] = None,
+                       last_event_id: Optional[int] = None) -> AsyncIterator[str]:
+    """
+    Функция потока событий заказов в формате server-sent events.
+    Ожидание событий не занимает поток: подписчик ждет в цикле событий ASGI.
+    При переполнении очереди подписчика поток завершается, клиент переподключается
+    с Last-Event-ID и дочитывает события из буфера.
+
+    :param status: фильтр по статусу заказа.
+    :param table: фильтр по номеру стола.
+    :param last_event_id: номер последнего полученного клиентом события.
+    :return: асинхронный итератор текста событий.
+    """
+    subscription, backlog = hub.subscribe(status, table, last_event_id)
+    try:
+        yield f"retry: {settings.EVENTS_RETRY_MS}\n\n"
+        for event in backlog:
+            yield event.encode()
+        while not subscription.overflowed:
+            event = await subscription.get(settings.EVENTS_KEEPALIVE)
+            # комментарий keep-alive не дает прокси закрыть простаивающее соединение
+            yield event.encode() if event else ": keep-alive\n\n"
+    finally:
+        hub.unsubscribe(subscription)
+
+
+def iterate_sync(stream: AsyncIterator[str]) -> Iterator[str]:
+    """
+    Функция синхронного чтения потока событий (запасной вариант для WSGI-сервера, например runserver).
+    Поток выполняется в собственном цикле событий и занимает поток сервера на все время подключения.
+
+    :param stream: асинхронный поток событий.
+    :return: итератор текста событий.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(stream.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(stream.aclose())
+        loop.close()
+
+
+def stream_params(params: Mapping[str, str],
+                  last_event_id: Optional[str]) -> Tuple[Optional[str], Optional[int], Optional[int]]:
+    """
+    Функция разбора параметров потока событий.
+
+    :param params: параметры запроса ('status' - статус заказа, 'table' - номер стола, 'last_event_id').
+    :param last_event_id: значение заголовка Last-Event-ID.
+    :return: фильтр по статусу, фильтр по столу и номер последнего полученного события.
+    """
+    table: str = params.get('table', '')
+    last_event_id = last_event_id or params.get('last_event_id', '')
+    return (
+        params.get('status') or None,
+        int(table) if table.isdigit() else None,
+        int(last_event_id) if last_event_id.isdigit() else None,
+    )
+
+
+class EventStreamHandler(ASGIHandler):
+    """
+    Обработчик ASGI потока событий (/events/).
+    Ответ готовит обычный стек Django (проверка Host, сессия и пользователь, промежуточные слои,
+    OrderEventsView) в собственном контексте потоков запроса, как в ASGIHandler. Но контекст закрывается
+    до передачи событий: поток синхронного кода запроса освобождается, и подписчик ждет события
+    только в цикле событий (сотни подключений не занимают потоков).
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            body_file = await self.read_body(receive)
+        except RequestAborted:
+            return
+        try:
+            async with ThreadSensitiveContext():
+                response = await self.prepare_response(scope, body_file)
+        finally:
+            body_file.close()
+        await self.stream_response(response, receive, send)
+
+    async def prepare_response(self, scope, body_file) -> HttpResponseBase:
+        """
+        Функция получения ответа представления (без передачи тела ответа).
+
+        :param scope: данные подключения ASGI.
+        :param body_file: тело запроса.
+        :return: ответ (поток событий или ответ с ошибкой).
+        """
+        set_script_prefix(get_script_prefix(scope))
+        await signals.request_started.asend(sender=self.__class__, scope=scope)
+        request, error_response = self.create_request(scope, body_file)
+        if request is None:
+            return error_response
+        return await self.run_get_response(request)
+
+    async def stream_response(self, response: HttpResponseBase, receive, send) -> None:
+        """
+        Функция передачи ответа до его окончания или до отключения клиента.
+
+        :param response: ответ.
+        :param receive: получение сообщений клиента.
+        :param send: отправка сообщений клиенту.
+        :return:
+        """
+        tasks = [asyncio.create_task(self.listen_for_disconnect(receive)),
+                 asyncio.create_task(self.send_response(response, send))]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # при отключении клиента отмена передачи закрывает поток событий (подписка снимается)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await sync_to_async(response.close)()
+
+
+def with_event_stream(application: Callable) -> Callable:
+    """
+    Функция подключения обработчика потока событий к приложению ASGI (coms/asgi.py).
+
+    :param application: приложение ASGI Django.
+    :return: приложение ASGI: /events/ обслуживает EventStreamHandler, остальные адреса - application.
+    """
+    handler = EventStreamHandler()
+    events_path = reverse('order_events')
+
+    async def events_application(scope, receive, send) -> None:
+        if scope['type'] == 'http' and scope['path'] == events_path:
+            await handler(scope, receive, send)
+        else:
+            await application(scope, receive, send)
+
+    return events_application
@@ -0,0 +1,163 @@
+import csv
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from django.conf import settings
+from django.db.models.query import QuerySet
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Tuple
+from .archive import archived_line_rows, merge_by_created
+from .filters import filter_orders, parse_day
+from .models import ArchivedOrder, Order, OrderItem
+from .reports import revenue_rollups
+
+# выгружаемые данные: название -> (столбцы, поля values_list)
+EXPORT_COLUMNS: Dict[str, List[Tuple[str, str]]] = {
+    'orders': [
+        ('id', 'id'),
+        ('table_number', 'table_number'),
+        ('status', 'status'),
+        ('total_price', 'total_price'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    ],
+    'order-items': [
+        ('id', 'id'),
+        ('order_id', 'order_id'),
+        ('table_number', 'order__table_number'),
+        ('status', 'order__status'),
+        ('created_at', 'order__created_at'),
+        ('menu_item_id', 'menu_item_id'),
+        ('menu_item', 'menu_item__name'),
+        ('quantity', 'quantity'),
+        ('price', 'price'),
+    ],
+    'revenue': [
+        ('date', 'date'),
+        ('hour', 'hour'),
+        ('table_number', 'table_number'),
+        ('orders_count', 'orders_count'),
+        ('revenue', 'revenue'),
+    ],
+}
+
+# выгрузки, дополняемые архивом заказов: название -> номера полей порядка строк (дата создания заказа, id)
+ARCHIVE_ORDER_KEYS: Dict[str, Tuple[int, ...]] = {
+    'orders': (4, 0),
+    'order-items': (4, 1, 0),
+}
+
+EXPORT_FORMATS: Dict[str, str] = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def export_queryset(kind: str, params: Mapping[str, str]) -> QuerySet:
+    """
+    Функция получения набора выгружаемых записей.
+    Заказы и позиции фильтруются по параметрам заказа ('status', 'table', 'date_from', 'date_to'),
+    агрегаты выручки - по диапазону дат.
+
+    :param kind: название выгрузки ('orders', 'order-items', 'revenue').
+    :param params: параметры фильтрации.
+    :return: упорядоченный набор записей (в порядке индексов по дате создания заказа).
+    """
+    if kind == 'orders':
+        return filter_orders(Order.objects.all(), params).order_by('created_at', 'id')
+    if kind == 'order-items':
+        return filter_orders(OrderItem.objects.all(), params, prefix='order__').order_by(
+            'order__created_at', 'order_id', 'id')
+    if kind == 'revenue':
+        return revenue_rollups(parse_day(params.get('date_from')), parse_day(params.get('date_to'))).order_by(
+            'date', 'hour', 'table_number')
+    raise ValueError(f"Unknown export: {kind}")
+
+
+def export_rows(kind: str, params: Mapping[str, str]) -> Tuple[List[str], Iterator[tuple]]:
+    """
+    Функция получения заголовка и строк выгрузки.
+    Строки читаются из БД порциями (iterator), поэтому расход памяти не зависит от объема выгрузки.
+    Заказы и позиции выгружаются вместе с архивом (ArchivedOrder) в общем порядке по дате создания.
+
+    :param kind: название выгрузки.
+    :param params: параметры фильтрации.
+    :return: названия столбцов и итератор строк.
+    """
+    columns = EXPORT_COLUMNS[kind]
+    queryset = export_queryset(kind, params).values_list(*(field for _, field in columns))
+    rows: Iterator[tuple] = queryset.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    if kind in ARCHIVE_ORDER_KEYS:
+        archived = filter_orders(ArchivedOrder.objects.all(), params).order_by('created_at', 'id')
+        if kind == 'orders':
+            archived_rows = archived.values_list(*(field for _, field in columns)).iterator(
+                chunk_size=settings.EXPORT_CHUNK_SIZE)
+        else:
+            archived_rows = archived_line_rows(archived)
+        rows = merge_by_created(rows, archived_rows, ARCHIVE_ORDER_KEYS[kind])
+    return [name for name, _ in columns], rows
+
+
+def export_value(value: Any) -> Any:
+    """
+    Функция приведения значения к виду, пригодному для CSV и JSON.
+
+    :param value: значение поля.
+    :return: строка для дат и денежных сумм, исходное значение для остальных.
+    """
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class Echo:
+    """Псевдо-файл, возвращающий записанную строку (для построчной генерации CSV)."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def render_csv(header: List[str], rows: Iterable[tuple]) -> Iterator[str]:
+    """
+    Функция построчной генерации CSV.
+
+    :param header: названия столбцов.
+    :param rows: строки выгрузки.
+    :return: итератор строк CSV.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([export_value(value) for value in row])
+
+
+def render_jsonl(header: List[str], rows: Iterable[tuple]) -> Iterator[str]:
+    """
+    Функция построчной генерации JSON Lines (один JSON-объект на строку).
+
+    :param header: названия полей.
+    :param rows: строки выгрузки.
+    :return: итератор строк JSON Lines.
+    """
+    for row in rows:
+        yield json.dumps(dict(zip(header, map(export_value, row))), ensure_ascii=False) + '\n'
+
+
+RENDERERS: Dict[str, Callable[[List[str], Iterable[tuple]], Iterator[str]]] = {
+    'csv': render_csv,
+    'jsonl': render_jsonl,
+}
+
+
+def export_stream(kind: str, export_format: str, params: Mapping[str, str]) -> Iterator[str]:
+    """
+    Функция потоковой выгрузки данных в заданном формате.
+
+    :param kind: название выгрузки ('orders', 'order-items', 'revenue').
+    :param export_format: формат ('csv' или 'jsonl').
+    :param params: параметры фильтрации.
+    :return: итератор строк выгрузки.
+    """
+    header, rows = export_rows(kind, params)
+    return RENDERERS[export_format](header, rows)
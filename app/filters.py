@@ -0,0 +1,73 @@
+from datetime import date, datetime, time, timedelta
+from typing import Mapping, Optional
+from django.db.models.query import QuerySet
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+def parse_day(value: Optional[str]) -> Optional[date]:
+    """
+    Функция разбора даты из параметра запроса (формат ГГГГ-ММ-ДД).
+
+    :param value: строковое значение параметра.
+    :return: объект даты или None, если параметр пуст или некорректен.
+    """
+    if not value:
+        return None
+    try:
+        return parse_date(value)
+    except ValueError:
+        return None
+
+
+def day_start(day: date) -> datetime:
+    """
+    Функция получения начала суток (в текущем часовом поясе).
+
+    :param day: дата.
+    :return: aware-объект даты и времени 00:00 указанного дня.
+    """
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def filter_by_created(queryset: QuerySet, date_from: Optional[date], date_to: Optional[date],
+                      prefix: str = '') -> QuerySet:
+    """
+    Функция фильтрации заказов по диапазону дат создания (включительно).
+    Сравнение ведется по границам суток, а не по created_at__date,
+    чтобы запрос мог использовать индекс по created_at.
+
+    :param queryset: исходный набор заказов.
+    :param date_from: первая дата диапазона.
+    :param date_to: последняя дата диапазона.
+    :param prefix: путь к заказу для связанных моделей (например, 'order__' для позиций).
+    :return: отфильтрованный набор заказов.
+    """
+    if date_from:
+        queryset = queryset.filter(**{f'{prefix}created_at__gte': day_start(date_from)})
+    if date_to:
+        queryset = queryset.filter(**{f'{prefix}created_at__lt': day_start(date_to + timedelta(days=1))})
+    return queryset
+
+
+def filter_orders(queryset: QuerySet, params: Mapping[str, str], prefix: str = '') -> QuerySet:
+    """
+    Функция фильтрации заказов по параметрам запроса:
+    'table' - номер стола, 'status' - статус заказа,
+    'date_from' и 'date_to' - диапазон дат создания.
+
+    :param queryset: исходный набор заказов.
+    :param params: параметры запроса (request.GET или request.query_params).
+    :param prefix: путь к заказу для связанных моделей (например, 'order__' для позиций).
+    :return: отфильтрованный набор заказов.
+    """
+    table_number: Optional[str] = params.get('table')
+    status: Optional[str] = params.get('status')
+
+    if table_number and table_number.isdigit():
+        queryset = queryset.filter(**{f'{prefix}table_number': table_number})
+    if status:
+        queryset = queryset.filter(**{f'{prefix}status': status})
+
+    return filter_by_created(queryset, parse_day(params.get('date_from')), parse_day(params.get('date_to')),
+                             prefix)
@@ -1,12 +1,18 @@
 from django import forms
 from django.db.models import Model
 from django.db.models.query import QuerySet
+from django.urls import reverse
 from rest_framework import viewsets, permissions
 from rest_framework.permissions import BasePermission
 from rest_framework.serializers import ModelSerializer
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
+from . import menu_cache
+from .conditional import MenuConditionalGetMixin, OrderConditionalGetMixin
+from .filters import filter_orders
+from .menu_cache import CachedMenuListMixin
 from .models import Order, OrderItem, MenuItem
-from .serializers import MenuItemSerializer, OrderListSerializer
+from .pagination import OrderCursorPagination
+from .serializers import MenuItemSerializer, OrderFastReadMixin, OrderListSerializer
 
 
 class OrderForm(forms.ModelForm):
@@ -31,20 +37,54 @@ class OrderForm(forms.ModelForm):
         }
 
 
+class MenuItemSearchWidget(forms.Widget):
+    """
+    Виджет выбора блюда поиском по названию (автодополнение через /api/menu-items/search/):
+    скрытое поле с id блюда и поле ввода названия, без вывода всего меню в странице.
+    """
+
+    template_name: str = 'cafe/widgets/menu_item_search.html'
+
+    def get_context(self, name: str, value: Any, attrs: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        context = super().get_context(name, value, attrs)
+        menu_item = menu_cache.get_menu_item(value) if value not in (None, '') else None
+        context['widget']['label'] = f"{menu_item.name} - {menu_item.price}₽" if menu_item else ''
+        context['widget']['search_url'] = reverse('menuitem-search')
+        return context
+
+
+class MenuItemChoiceField(forms.Field):
+    """
+    Поле выбора блюда поиском по названию; проверка блюда обслуживается кэшем меню (menu_cache),
+    без запроса всего меню из БД и без вывода всего меню в форме.
+    """
+
+    widget = MenuItemSearchWidget
+    default_error_messages: Dict[str, str] = {
+        'invalid_choice': 'Выберите корректный вариант. %(value)s нет среди допустимых значений.',
+    }
+
+    def to_python(self, value) -> Optional[MenuItem]:
+        if value in self.empty_values:
+            return None
+        menu_item: Optional[MenuItem] = menu_cache.get_menu_item(value)
+        if menu_item is None:
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value}
+            )
+        return menu_item
+
+
 class OrderItemForm(forms.ModelForm):
     """
     Класс добавления элемента (блюда) в заказ.
 
     Поля:
-        menu_item - выбор блюда из списка (выпадающий список);
+        menu_item - выбор блюда поиском по названию (поле с автодополнением);
         quantity - количество (минимум 1) (числовое поле).
     """
 
-    menu_item = forms.ModelChoiceField(
-        queryset=MenuItem.objects.all(),
-        label='Блюдо',
-        widget=forms.Select(attrs={'class': 'form-control'})
-    )
+    menu_item = MenuItemChoiceField(label='Блюдо')
     quantity = forms.IntegerField(
         label='Количество',
         min_value=1,
@@ -56,6 +96,10 @@ class OrderItemForm(forms.ModelForm):
         model: Model = OrderItem
         fields: List[str] = ['menu_item', 'quantity']
 
+    def _get_validation_exclusions(self) -> set:
+        # существование блюда проверено полем по кэшу меню, повторная проверка запросом к БД не нужна
+        return super()._get_validation_exclusions() | {'menu_item'}
+
     def save(self, commit=True, order=None):
         """
         Функция сохранения заказа.
@@ -74,9 +118,20 @@ class OrderItemForm(forms.ModelForm):
         return instance
 
 
-class MenuItemViewSet(viewsets.ModelViewSet):
+class TableCloseForm(forms.Form):
+    """
+    Класс расчета стола.
+
+    Поля:
+        total - сумма счета, показанная гостю (скрытое поле): при расхождении с текущей суммой стол не закрывается.
     """
-    Класс CRUD API для блюд Меню.
+
+    total = forms.DecimalField(max_digits=14, decimal_places=2, required=False, widget=forms.HiddenInput())
+
+
+class MenuItemViewSet(MenuConditionalGetMixin, CachedMenuListMixin, viewsets.ModelViewSet):
+    """
+    Класс CRUD API для блюд Меню (список - из кэша меню).
 
     Права доступа:
         Чтение - доступно всем
@@ -110,33 +165,26 @@ class MenuItemForm(forms.ModelForm):
         }
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(OrderConditionalGetMixin, OrderFastReadMixin, viewsets.ModelViewSet):
     """
-    Класс управление заказами через API.
+    Класс управление заказами через API (чтение - быстрым сериализатором OrderReadSerializer).
 
     Права доступа:
         Чтение и изменение - только авторизованным пользователям
     """
 
-    queryset: QuerySet[Order] = Order.objects.all().order_by('-created_at')
+    queryset: QuerySet[Order] = Order.objects.all().order_by('-created_at', '-id')
     serializer_class = OrderListSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OrderCursorPagination
 
     def get_queryset(self) -> QuerySet:
         """
         Функция получения списка заказов, согласно параметрам
-        фильтрации ('table' - номер стола, 'status' - статус заказа).
+        фильтрации ('table' - номер стола, 'status' - статус заказа,
+        'date_from' и 'date_to' - диапазон дат создания).
 
         :return: список объектов заказа
         """
 
-        queryset: QuerySet[Order] = super().get_queryset()
-        table_number: int = self.request.query_params.get('table')
-        status: str = self.request.query_params.get('status')
-
-        if table_number:
-            queryset = queryset.filter(table_number=table_number)
-        if status:
-            queryset = queryset.filter(status=status)
-
-        return queryset
+        return filter_orders(super().get_queryset(), self.request.query_params)
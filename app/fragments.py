@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils.safestring import SafeString, mark_safe
+from typing import Dict, List
+from . import menu_cache
+from .models import Order, order_items_prefetch
+
+# шаблоны кэшируемых фрагментов страниц заказов
+FRAGMENT_TEMPLATES: Dict[str, str] = {
+    'row': 'cafe/fragments/order_row.html',
+    'lines': 'cafe/fragments/order_lines.html',
+}
+
+
+def fragment_key(kind: str, order: Order, menu_version: int) -> str:
+    """
+    Функция ключа кэша фрагмента заказа. Любое изменение заказа или его позиций обновляет
+    updated_at (см. Order.add_to_total, OrderQuerySet.set_status), а изменение меню (названия блюд) -
+    версию меню, поэтому устаревший фрагмент не выдается и не требует явного сброса.
+
+    :param kind: вид фрагмента (FRAGMENT_TEMPLATES).
+    :param order: заказ.
+    :param menu_version: версия меню.
+    :return: ключ кэша.
+    """
+    return f"order-fragment:{kind}:{order.pk}:{order.updated_at.timestamp():.6f}:{menu_version}"
+
+
+def render_order_fragments(orders: List[Order], kind: str) -> List[SafeString]:
+    """
+    Функция отрисовки фрагментов заказов с кэшированием: фрагменты неизменившихся заказов
+    читаются из кэша одним запросом (get_many), позиции подгружаются и отрисовываются
+    только для заказов, которых нет в кэше.
+
+    :param orders: заказы (без подгруженных позиций).
+    :param kind: вид фрагмента (FRAGMENT_TEMPLATES).
+    :return: разметка фрагментов в порядке заказов.
+    """
+    version = menu_cache.get_version()
+    keys = [fragment_key(kind, order, version) for order in orders]
+    fragments: Dict[str, str] = cache.get_many(keys)
+    missing = [order for order, key in zip(orders, keys) if key not in fragments]
+    if missing:
+        prefetch_related_objects(missing, order_items_prefetch())
+        rendered = {
+            fragment_key(kind, order, version): render_to_string(FRAGMENT_TEMPLATES[kind], {'order': order})
+            for order in missing
+        }
+        cache.set_many(rendered, settings.ORDER_FRAGMENT_CACHE_TIMEOUT)
+        fragments.update(rendered)
+    return [mark_safe(fragments[key]) for key in keys]
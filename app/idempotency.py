@@ -0,0 +1,161 @@
+import hashlib
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from typing import Callable, Optional
+from .models import IdempotencyKey
+from .transactions import retry_write
+
+# заголовок ключа идемпотентности (API) и поле формы с ключом (страницы)
+IDEMPOTENCY_HEADER: str = 'Idempotency-Key'
+IDEMPOTENCY_FIELD: str = 'idempotency_key'
+# заголовок ответа, выданного повторно из сохраненного
+REPLAYED_HEADER: str = 'Idempotent-Replayed'
+
+
+def request_key(request: HttpRequest) -> Optional[str]:
+    """
+    Функция получения ключа идемпотентности запроса: заголовок Idempotency-Key или поле формы idempotency_key.
+
+    :param request: запрос (HttpRequest или Request DRF).
+    :return: ключ или None (запрос без ключа).
+    """
+    return request.headers.get(IDEMPOTENCY_HEADER) or request.POST.get(IDEMPOTENCY_FIELD) or None
+
+
+def request_hash(request: HttpRequest) -> str:
+    """
+    Функция хэша запроса (метод, адрес, тело): повтор с тем же ключом должен совпадать с исходным запросом.
+
+    :param request: запрос.
+    :return: хэш SHA-256 (hex).
+    """
+    digest = hashlib.sha256(f"{request.method} {request.get_full_path()}\n".encode())
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def request_owner(request: HttpRequest) -> str:
+    """
+    Функция владельца ключа: ключи разных пользователей не пересекаются.
+
+    :param request: запрос.
+    :return: id пользователя ('' - без авторизации).
+    """
+    user = getattr(request, 'user', None)
+    return str(user.pk) if user is not None and user.is_authenticated else ''
+
+
+def replay(record: IdempotencyKey) -> HttpResponse:
+    """
+    Функция повторной выдачи сохраненного ответа.
+
+    :param record: ключ идемпотентности с сохраненным ответом.
+    :return: ответ с заголовком Idempotent-Replayed.
+    """
+    response = HttpResponse(bytes(record.body), status=record.status_code, content_type=record.content_type or None)
+    if record.location:
+        response['Location'] = record.location
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def stored_response(record: IdempotencyKey, digest: str) -> HttpResponse:
+    """
+    Функция ответа на запрос с уже использованным ключом.
+
+    :param record: ключ идемпотентности.
+    :param digest: хэш текущего запроса.
+    :return: сохраненный ответ; 422 - ключ использован для другого запроса; 409 - исходный запрос еще обрабатывается.
+    """
+    if record.request_hash != digest:
+        return JsonResponse({'detail': 'Ключ идемпотентности уже использован для другого запроса.'}, status=422)
+    if record.status_code is None:
+        return JsonResponse({'detail': 'Запрос с этим ключом идемпотентности еще обрабатывается.'}, status=409)
+    return replay(record)
+
+
+def save_response(record: IdempotencyKey, response: HttpResponse) -> None:
+    """
+    Функция сохранения ответа для повторов (ответы DRF кодируются в JSON до отрисовки).
+
+    :param record: ключ идемпотентности.
+    :param response: ответ представления.
+    :return:
+    """
+    if isinstance(response, Response):
+        record.body, record.content_type = JSONRenderer().render(response.data), 'application/json'
+    else:
+        record.body, record.content_type = response.content, response.get('Content-Type', '')
+    record.status_code = response.status_code
+    record.location = response.get('Location', '')
+    record.save(update_fields=['status_code', 'content_type', 'location', 'body'])
+
+
+def idempotent(view: Callable[..., HttpResponse]) -> Callable[..., HttpResponse]:
+    """
+    Декоратор изменяющего представления с ключом идемпотентности (заголовок Idempotency-Key
+    или поле формы idempotency_key). Ключ записывается до обработки в той же транзакции,
+    что и изменения: одновременные повторы ждут фиксации исходного запроса на блокировке записи
+    (SQLite) или уникальном индексе и получают его ответ. Повтор читает только таблицу ключей,
+    не затрагивая таблицы заказов. Сохраняются только успешные ответы (коды 2xx, 3xx):
+    ошибку можно повторить с тем же ключом. Запросы без ключа обрабатываются как обычно.
+    Для представлений-классов: method_decorator(idempotent, name='post').
+
+    :param view: функция представления.
+    :return: функция представления.
+    """
+    @wraps(view)
+    def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        key = request_key(request)
+        if key is None:
+            return view(request, *args, **kwargs)
+        if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            return JsonResponse({'detail': 'Слишком длинный ключ идемпотентности.'}, status=400)
+        owner, digest = request_owner(request), request_hash(request)
+
+        def handle() -> HttpResponse:
+            record = IdempotencyKey.objects.filter(owner=owner, key=key, expires_at__gt=timezone.now()).first()
+            if record is not None:
+                return stored_response(record, digest)
+            try:
+                with transaction.atomic():
+                    # просроченный (еще не удаленный) ключ заменяется новым
+                    IdempotencyKey.objects.filter(owner=owner, key=key).delete()
+                    record = IdempotencyKey.objects.create(
+                        owner=owner, key=key, request_hash=digest,
+                        expires_at=timezone.now() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+                    )
+            except IntegrityError:
+                return stored_response(IdempotencyKey.objects.get(owner=owner, key=key), digest)
+
+            response = view(request, *args, **kwargs)
+            if response.status_code < 400:
+                save_response(record, response)
+            else:
+                record.delete()
+            return response
+
+        return retry_write(handle)
+
+    return wrapper
+
+
+def purge_expired(batch_size: int) -> int:
+    """
+    Функция удаления одной порции просроченных ключей идемпотентности (по индексу expires_at).
+
+    :param batch_size: количество ключей в порции.
+    :return: количество удаленных ключей.
+    """
+    def purge() -> int:
+        ids = list(IdempotencyKey.objects.filter(expires_at__lte=timezone.now())
+                   .order_by('expires_at').values_list('pk', flat=True)[:batch_size])
+        return IdempotencyKey.objects.filter(pk__in=ids).delete()[0] if ids else 0
+
+    return retry_write(purge)
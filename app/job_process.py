@@ -0,0 +1,21 @@
+import django
+from django.conf import settings
+from django.db import connections
+from typing import Any, Dict
+
+# модуль не импортирует модели: процесс пула (spawn) загружает его до настройки Django
+
+
+def init_process(databases: Dict[str, Any], results_dir: str) -> None:
+    """
+    Функция инициализации процесса пула фоновых задач: настройка Django, те же файлы БД
+    и каталог результатов, что у рабочего процесса (например, временные БД тестов и замеров).
+
+    :param databases: имена БД по псевдонимам.
+    :param results_dir: каталог файлов результатов.
+    :return:
+    """
+    django.setup()
+    for alias, name in databases.items():
+        connections[alias].settings_dict['NAME'] = name
+    settings.JOB_RESULTS_DIR = results_dir
@@ -0,0 +1,435 @@
+import io
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.core.management import call_command
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connection, connections
+from django.db.models import F
+from django.http import FileResponse
+from django.utils import timezone
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+from .exports import EXPORT_COLUMNS, EXPORT_FORMATS, export_stream
+from .filters import parse_day
+from .job_process import init_process
+from .models import Job, Order
+from .reports import REVENUE_GRANULARITIES, revenue_report
+from .routers import reporting_reads
+from .serializers import RevenueReportSerializer
+from .transactions import retry_write
+
+# типы содержимого файлов результатов по расширению
+RESULT_CONTENT_TYPES: Dict[str, str] = {'json': 'application/json', **EXPORT_FORMATS}
+
+
+class JobKind:
+    """Вид фоновой задачи: функция выполнения, допустимые параметры и доступ (только для персонала)."""
+
+    run: Callable[[Job], Tuple[Optional[Dict[str, Any]], str]]
+    params: Tuple[str, ...]
+    staff_only: bool
+
+    def __init__(self, run: Callable[[Job], Tuple[Optional[Dict[str, Any]], str]], params: Tuple[str, ...] = (),
+                 staff_only: bool = False) -> None:
+        self.run = run
+        self.params = params
+        self.staff_only = staff_only
+
+
+def result_path(job: Job, extension: str) -> Path:
+    """
+    Функция пути файла результата задачи (каталог JOB_RESULTS_DIR создается при необходимости).
+
+    :param job: задача.
+    :param extension: расширение файла.
+    :return: путь файла.
+    """
+    directory = Path(settings.JOB_RESULTS_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / f"job-{job.pk}-{job.kind}.{extension}"
+
+
+def write_result(path: Path, chunks: Iterable[str]) -> int:
+    """
+    Функция записи файла результата по частям: файл появляется под своим именем только целиком.
+
+    :param path: путь файла.
+    :param chunks: части содержимого.
+    :return: размер файла (байт).
+    """
+    partial = path.with_name(path.name + '.part')
+    with open(partial, 'w', encoding='utf-8', newline='') as file:
+        for chunk in chunks:
+            file.write(chunk)
+    os.replace(partial, path)
+    return path.stat().st_size
+
+
+def run_revenue_report(job: Job) -> Tuple[Dict[str, Any], str]:
+    """
+    Функция задачи отчета о выручке (из БД отчетов): файл JSON в формате ответа /api/revenue/.
+
+    :param job: задача ('date_from', 'date_to', 'granularity').
+    :return: краткий результат и имя файла.
+    """
+    granularity: str = job.params.get('granularity', 'day')
+    with reporting_reads():
+        rows, totals = revenue_report(parse_day(job.params.get('date_from')), parse_day(job.params.get('date_to')),
+                                      granularity)
+    data = RevenueReportSerializer({'granularity': granularity, 'rows': rows, 'totals': totals}).data
+    path = result_path(job, 'json')
+    write_result(path, [json.dumps(data, ensure_ascii=False, cls=DjangoJSONEncoder)])
+    return {'rows': len(rows), 'orders_count': totals['orders_count'], 'revenue': str(totals['revenue'])}, path.name
+
+
+def revenue_report_result(job: Job) -> Dict[str, Any]:
+    """
+    Функция чтения результата выполненной задачи отчета о выручке (для страницы задачи).
+
+    :param job: выполненная задача 'revenue-report'.
+    :return: детализация, строки (даты - объекты даты) и итог отчета.
+    """
+    with open(Path(settings.JOB_RESULTS_DIR) / job.result_file, encoding='utf-8') as file:
+        report: Dict[str, Any] = json.load(file)
+    for row in report['rows']:
+        if 'date' in row:
+            row['date'] = parse_day(row['date'])
+    return report
+
+
+def run_export(job: Job) -> Tuple[Dict[str, Any], str]:
+    """
+    Функция задачи выгрузки (из БД отчетов): файл CSV или JSON Lines, как у ExportView.
+
+    :param job: задача ('kind', 'format' и параметры фильтрации).
+    :return: краткий результат и имя файла.
+    """
+    export_format: str = job.params.get('format', 'csv')
+    path = result_path(job, export_format)
+    with reporting_reads():
+        size = write_result(path, export_stream(job.params.get('kind', 'orders'), export_format, job.params))
+    return {'bytes': size}, path.name
+
+
+def command_job(name: str) -> Callable[[Job], Tuple[Dict[str, Any], str]]:
+    """
+    Функция задачи выполнения команды управления (параметры задачи - параметры команды).
+
+    :param name: имя команды.
+    :return: функция выполнения задачи (результат - вывод команды).
+    """
+    def run(job: Job) -> Tuple[Dict[str, Any], str]:
+        output = io.StringIO()
+        call_command(name, stdout=output, **job.params)
+        return {'output': output.getvalue()}, ''
+
+    return run
+
+
+# виды фоновых задач
+JOB_KINDS: Dict[str, JobKind] = {
+    'revenue-report': JobKind(run_revenue_report, ('date_from', 'date_to', 'granularity')),
+    'export': JobKind(run_export, ('kind', 'format', 'status', 'table', 'date_from', 'date_to')),
+    'recalculate-totals': JobKind(command_job('recalculate_totals'), ('dry_run',), staff_only=True),
+    'rebuild-revenue': JobKind(command_job('rebuildrevenue'), ('date_from', 'date_to'), staff_only=True),
+    'archive-orders': JobKind(command_job('archiveorders'), ('days', 'dry_run'), staff_only=True),
+    'purge-idempotency': JobKind(command_job('purgeidempotency'), staff_only=True),
+}
+
+
+def _choice(choices: Iterable[str]) -> Callable[[Any], str]:
+    choices = tuple(choices)
+
+    def check(value: Any) -> str:
+        if value not in choices:
+            raise ValueError(f"допустимые значения: {', '.join(choices)}")
+        return value
+
+    return check
+
+
+def _day(value: Any) -> str:
+    if not isinstance(value, str) or parse_day(value) is None:
+        raise ValueError('ожидается дата ГГГГ-ММ-ДД')
+    return value
+
+
+def _positive_int(value: Any) -> int:
+    if isinstance(value, bool) or not str(value).isdigit() or int(value) < 1:
+        raise ValueError('ожидается целое положительное число')
+    return int(value)
+
+
+def _table(value: Any) -> str:
+    # номер стола передается фильтру заказов строкой, как параметр запроса
+    return str(_positive_int(value))
+
+
+def _flag(value: Any) -> bool:
+    if not isinstance(value, bool):
+        raise ValueError('ожидается true или false')
+    return value
+
+
+# проверка и приведение параметров задач
+PARAM_VALIDATORS: Dict[str, Callable[[Any], Any]] = {
+    'date_from': _day,
+    'date_to': _day,
+    'granularity': _choice(REVENUE_GRANULARITIES),
+    'kind': _choice(EXPORT_COLUMNS),
+    'format': _choice(EXPORT_FORMATS),
+    'status': _choice(status for status, _ in Order.STATUS_CHOICES),
+    'table': _table,
+    'days': _positive_int,
+    'dry_run': _flag,
+}
+
+
+def validate_params(kind: str, params: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Функция проверки вида и параметров задачи (пустые параметры отбрасываются).
+
+    :param kind: вид задачи (JOB_KINDS).
+    :param params: параметры задачи.
+    :return: проверенные параметры.
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Неизвестный вид задачи: {kind}")
+    unknown = set(params) - set(JOB_KINDS[kind].params)
+    if unknown:
+        raise ValueError(f"Недопустимые параметры задачи {kind}: {', '.join(sorted(unknown))}")
+    validated: Dict[str, Any] = {}
+    for name, value in params.items():
+        if value in (None, ''):
+            continue
+        try:
+            validated[name] = PARAM_VALIDATORS[name](value)
+        except ValueError as exc:
+            raise ValueError(f"{name}: {exc}")
+    return validated
+
+
+def submit_job(kind: str, params: Mapping[str, Any], owner: Optional[Any] = None) -> Job:
+    """
+    Функция постановки задачи в очередь. Такая же еще не выполненная задача пользователя
+    (вид и параметры) не дублируется: повторный запрос тяжелого отчета получает ту же задачу.
+
+    :param kind: вид задачи (JOB_KINDS).
+    :param params: параметры задачи.
+    :param owner: пользователь (None - без авторизации).
+    :return: задача.
+    """
+    params = validate_params(kind, params)
+    owner = owner if owner is not None and owner.is_authenticated else None
+
+    def submit() -> Job:
+        for job in Job.objects.filter(owner=owner, kind=kind, status__in=('queued', 'running')):
+            if job.params == params:
+                return job
+        return Job.objects.create(kind=kind, params=params, owner=owner)
+
+    return retry_write(submit)
+
+
+def claim_job(worker: str) -> Optional[int]:
+    """
+    Функция захвата следующей задачи очереди рабочим процессом (условным UPDATE: задачу получает один процесс).
+    Пустая очередь проверяется чтением, без блокировки записи.
+
+    :param worker: имя рабочего процесса.
+    :return: id задачи или None (очередь пуста).
+    """
+    if not Job.objects.filter(status='queued').exists():
+        return None
+
+    def claim() -> Optional[int]:
+        job_id = Job.objects.filter(status='queued').order_by('created_at', 'id').values_list('pk', flat=True).first()
+        if job_id is None:
+            return None
+        now = timezone.now()
+        claimed = Job.objects.filter(pk=job_id, status='queued').update(
+            status='running', worker=worker, started_at=now, heartbeat_at=now, attempts=F('attempts') + 1)
+        return job_id if claimed else None
+
+    return retry_write(claim)
+
+
+def run_job(job_id: int, worker: str) -> str:
+    """
+    Функция выполнения захваченной задачи. Ошибка выполнения сохраняется в задаче и не прерывает рабочий процесс.
+
+    :param job_id: id задачи.
+    :param worker: имя рабочего процесса.
+    :return: итоговый статус задачи.
+    """
+    job = Job.objects.get(pk=job_id)
+    try:
+        result, result_file = JOB_KINDS[job.kind].run(job)
+        values: Dict[str, Any] = {'status': 'done', 'result': result, 'result_file': result_file, 'error': ''}
+    except Exception:
+        values = {'status': 'failed', 'error': traceback.format_exc()[-settings.JOB_ERROR_MAX_LENGTH:]}
+    # задача, возвращенная в очередь и захваченная другим процессом, этим процессом не завершается
+    retry_write(lambda: Job.objects.filter(pk=job_id, status='running', worker=worker).update(
+        finished_at=timezone.now(), **values))
+    return values['status']
+
+
+def pool_run_job(job_id: int, worker: str) -> str:
+    """
+    Функция выполнения задачи в потоке или процессе пула: подключение к БД закрывается после задачи.
+
+    :param job_id: id задачи.
+    :param worker: имя рабочего процесса.
+    :return: итоговый статус задачи.
+    """
+    close_old_connections()
+    try:
+        return run_job(job_id, worker)
+    finally:
+        connection.close()
+
+
+def heartbeat(job_ids: List[int]) -> None:
+    """
+    Функция отметки выполнения задач рабочего процесса (задачи без отметки дольше JOB_STALE_SECONDS
+    считаются брошенными остановившимся процессом).
+
+    :param job_ids: id выполняемых задач.
+    :return:
+    """
+    if job_ids:
+        retry_write(lambda: Job.objects.filter(pk__in=job_ids, status='running').update(heartbeat_at=timezone.now()))
+
+
+def requeue_stale() -> int:
+    """
+    Функция возврата в очередь задач остановившихся рабочих процессов (после JOB_MAX_ATTEMPTS попыток - ошибка).
+
+    :return: количество задач, возвращенных в очередь.
+    """
+    def requeue() -> int:
+        now = timezone.now()
+        stale_before = now - timedelta(seconds=settings.JOB_STALE_SECONDS)
+        stale = Job.objects.filter(status='running', heartbeat_at__lt=stale_before)
+        stale.filter(attempts__gte=settings.JOB_MAX_ATTEMPTS).update(
+            status='failed', error='Рабочий процесс остановился во время выполнения задачи', finished_at=now)
+        return stale.update(status='queued', worker='')
+
+    return retry_write(requeue)
+
+
+def purge_finished() -> int:
+    """
+    Функция удаления завершенных задач старше JOB_RESULT_TTL вместе с файлами результатов.
+
+    :return: количество удаленных задач.
+    """
+    finished = Job.objects.filter(status__in=Job.FINISHED_STATUSES,
+                                  finished_at__lt=timezone.now() - timedelta(seconds=settings.JOB_RESULT_TTL))
+    jobs = list(finished.values_list('pk', 'result_file')[:settings.JOB_PURGE_BATCH_SIZE])
+    for _, result_file in jobs:
+        if result_file:
+            (Path(settings.JOB_RESULTS_DIR) / result_file).unlink(missing_ok=True)
+    return retry_write(lambda: Job.objects.filter(pk__in=[pk for pk, _ in jobs]).delete()[0]) if jobs else 0
+
+
+def make_executor(pool: str, workers: int) -> Executor:
+    """
+    Функция пула выполнения задач: потоки (отчеты и выгрузки в основном ждут БД и диск)
+    или процессы (задачи, нагружающие процессор, не делят GIL с рабочим процессом).
+
+    :param pool: 'thread' или 'process'.
+    :param workers: количество потоков или процессов.
+    :return: пул выполнения.
+    """
+    if pool == 'process':
+        databases = {alias: connections[alias].settings_dict['NAME'] for alias in connections}
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=init_process,
+                                   initargs=(databases, str(settings.JOB_RESULTS_DIR)))
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+
+
+def run_worker(workers: int, pool: str = 'thread', poll: float = 1.0, once: bool = False,
+               stop: Optional[threading.Event] = None,
+               log: Optional[Callable[[str], None]] = None) -> int:
+    """
+    Функция рабочего процесса задач: захватывает задачи очереди, пока в пуле есть свободные места,
+    отмечает выполнение своих задач, возвращает в очередь брошенные задачи и удаляет старые результаты.
+    При остановке (stop) новые задачи не захватываются, выполняемые завершаются.
+
+    :param workers: количество одновременно выполняемых задач.
+    :param pool: пул выполнения ('thread' или 'process').
+    :param poll: пауза опроса пустой очереди (сек.).
+    :param once: выполнить задачи очереди и завершиться.
+    :param stop: событие остановки.
+    :param log: функция вывода сообщений.
+    :return: количество выполненных задач.
+    """
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    stop = stop or threading.Event()
+    running: Dict[Future, int] = {}
+    processed = 0
+    maintained = 0.0
+    executor = make_executor(pool, workers)
+
+    def report(job_id: int, future: Future) -> None:
+        # сбой выполнения (например, БД недоступна) не останавливает рабочий процесс:
+        # задача без отметки выполнения вернется в очередь
+        exc = future.exception()
+        if log:
+            log(f"Задача #{job_id}: {exc!r}" if exc else f"Задача #{job_id}: {future.result()}")
+
+    try:
+        while not stop.is_set():
+            for future in [future for future in running if future.done()]:
+                processed += 1
+                report(running.pop(future), future)
+
+            if time.monotonic() - maintained >= settings.JOB_HEARTBEAT_SECONDS:
+                heartbeat(list(running.values()))
+                requeue_stale()
+                purge_finished()
+                maintained = time.monotonic()
+
+            claimed = False
+            while len(running) < workers:
+                job_id = claim_job(name)
+                if job_id is None:
+                    break
+                running[executor.submit(pool_run_job, job_id, name)] = job_id
+                claimed = True
+
+            if once and not running and not claimed:
+                break
+            if running:
+                wait(running, timeout=poll, return_when=FIRST_COMPLETED)
+            elif not claimed:
+                stop.wait(poll)
+    finally:
+        executor.shutdown(wait=True)
+        for future, job_id in running.items():
+            processed += 1
+            report(job_id, future)
+    return processed
+
+
+def job_result_response(job: Job) -> FileResponse:
+    """
+    Функция выдачи файла результата задачи.
+
+    :param job: завершенная задача с файлом результата.
+    :return: файл результата (вложение).
+    """
+    path = Path(settings.JOB_RESULTS_DIR) / job.result_file
+    extension = path.suffix.lstrip('.')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name,
+                        content_type=RESULT_CONTENT_TYPES.get(extension, 'application/octet-stream'))
@@ -0,0 +1,42 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from ...archive import archivable_orders, archive_cutoff, archive_orders
+
+
+class Command(BaseCommand):
+    help = ('Перенос оплаченных заказов старше заданного возраста вместе с позициями в архив (ArchivedOrder) '
+            'порциями, без остановки работы кафе')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ARCHIVE_AFTER_DAYS,
+                            help='возраст заказа (дней), после которого он переносится в архив')
+        parser.add_argument('--batch-size', type=int, default=settings.ARCHIVE_BATCH_SIZE,
+                            help='количество заказов, переносимых одной транзакцией')
+        parser.add_argument('--pause', type=float, default=settings.ARCHIVE_BATCH_PAUSE,
+                            help='пауза между транзакциями (сек.)')
+        parser.add_argument('--max-batches', type=int, help='максимальное количество порций за запуск')
+        parser.add_argument('--dry-run', action='store_true', help='только подсчитать заказы для архивирования')
+
+    def handle(self, *args, **options):
+        """
+        Функция обработчик команды.
+        Каждая порция переносится отдельной короткой транзакцией записи (с повтором при занятой блокировке),
+        агрегаты выручки не меняются; выгрузки и пересчет выручки читают архив вместе с рабочими таблицами.
+        """
+
+        cutoff = archive_cutoff(options['days'])
+        if options['dry_run']:
+            self.stdout.write(f"Заказов для архивирования: {archivable_orders(cutoff).count()} "
+                              f"(созданы до {cutoff:%Y-%m-%d %H:%M})")
+            return
+
+        started = time.perf_counter()
+        total = 0
+        for moved in archive_orders(cutoff, options['batch_size'], options['pause'], options['max_batches']):
+            total += moved
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Перенесено заказов: {total}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Заказов перенесено в архив: {total} за {time.perf_counter() - started:.1f} сек."))
@@ -0,0 +1,88 @@
+import json
+import random
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import Client
+from typing import Any, Dict, List, Tuple
+from ...archive import archive_cutoff, archive_orders
+from ...bench import BENCH_SCENARIOS, BenchContext, bench_database, run_scenario, seed_menu, seed_orders
+from ...models import ArchivedOrder, Order
+
+# сценарии замера: списки, фильтры и отчеты, читающие рабочие таблицы заказов
+ARCHIVE_BENCH_SCENARIOS: Tuple[str, ...] = (
+    'order_list',
+    'order_list?status=paid',
+    'api order-list',
+    'api order-list?status=paid',
+    'floor',
+    'table_bill',
+    'revenue_report',
+    'api revenue-report',
+)
+
+
+class Command(BaseCommand):
+    help = ('Замер списков, фильтров и отчетов по заказам до и после архивирования старых оплаченных заказов '
+            '(во временной тестовой БД)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=100000, help='количество заказов')
+        parser.add_argument('--old', type=float, default=0.9,
+                            help='доля старых оплаченных заказов, переносимых в архив')
+        parser.add_argument('--lines', type=int, default=3, help='количество позиций в заказе')
+        parser.add_argument('--requests', type=int, default=20, help='количество запросов на сценарий')
+        parser.add_argument('--seed', type=int, default=1, help='начальное значение генератора случайных чисел')
+        parser.add_argument('--output', help='файл результата JSON (по умолчанию - только таблица)')
+
+    def handle(self, *args, **options):
+        """
+        Функция обработчик команды.
+        Заполняет временную БД заказами (доля --old - оплаченные и старше ARCHIVE_AFTER_DAYS),
+        замеряет сценарии, переносит старые заказы в архив и замеряет те же сценарии повторно.
+        """
+
+        random.seed(options['seed'])
+        scenarios = [scenario for scenario in BENCH_SCENARIOS if scenario.name in ARCHIVE_BENCH_SCENARIOS]
+        results: Dict[str, Dict[str, Dict[str, Any]]] = {'before': {}, 'after': {}}
+
+        with bench_database():
+            seed_orders(options['orders'], seed_menu(), lines=options['lines'])
+            cutoff = archive_cutoff()
+            old = int(options['orders'] * options['old'])
+            if old:
+                # первые по id заказы становятся старыми оплаченными (в обход save: агрегаты выручки не нужны)
+                boundary = Order.objects.order_by('id').values_list('id', flat=True)[old - 1]
+                Order.objects.filter(id__lte=boundary).update(status='paid', created_at=cutoff - timedelta(days=1))
+            client = Client()
+            client.force_login(User.objects.create_superuser(username='bench', password='bench'))
+
+            for stage in ('before', 'after'):
+                if stage == 'after':
+                    for _ in archive_orders(cutoff, pause=0):
+                        pass
+                context = BenchContext()
+                for scenario in scenarios:
+                    results[stage][scenario.name] = run_scenario(client, context, scenario, options['requests'])
+            hot, archived = Order.objects.count(), ArchivedOrder.objects.count()
+
+        self.stdout.write(f"Заказов: {options['orders']}, в рабочей таблице после архивирования: {hot}, "
+                          f"в архиве: {archived}")
+        self.stdout.write(f"  {'сценарий':<30} {'p50 до, мс':>12} {'p50 после, мс':>14} {'ускорение':>10}")
+        rows: List[Dict[str, Any]] = []
+        for scenario in scenarios:
+            before, after = results['before'][scenario.name], results['after'][scenario.name]
+            speedup = before['p50_ms'] / after['p50_ms'] if after['p50_ms'] else 0
+            rows.append({'scenario': scenario.name, 'before': before, 'after': after, 'speedup': round(speedup, 2)})
+            self.stdout.write(f"  {scenario.name:<30} {before['p50_ms']:12.3f} {after['p50_ms']:14.3f} "
+                              f"{'x' + format(speedup, '.1f'):>10}")
+
+        if options['output']:
+            report = {
+                'dataset': {key: options[key] for key in ('orders', 'old', 'lines', 'requests', 'seed')},
+                'hot_orders': hot,
+                'archived_orders': archived,
+                'results': rows,
+            }
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(json.dumps(report, ensure_ascii=False, indent=2) + '\n')
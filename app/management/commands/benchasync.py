@@ -0,0 +1,78 @@
+import asyncio
+import json
+import random
+from types import ModuleType
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import include, path
+from typing import Any, Callable, Dict, List, Tuple
+import api.urls
+from ...bench import BenchContext, bench_database, run_clients, seed_menu, seed_orders
+
+
+class Command(BaseCommand):
+    help = ('Замер одновременной нагрузки на чтение API под ASGI (во временной тестовой БД): '
+            'синхронные представления и асинхронные обработчики (ASYNC_API_VIEWS)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, nargs='+', default=[50, 200, 1000],
+                            help='количества одновременных клиентов')
+        parser.add_argument('--requests', type=int, default=5, help='количество запросов одного клиента')
+        parser.add_argument('--orders', type=int, default=5000, help='количество заказов')
+        parser.add_argument('--lines', type=int, default=3, help='количество позиций в заказе')
+        parser.add_argument('--seed', type=int, default=1, help='начальное значение генератора случайных чисел')
+        parser.add_argument('--output', help='файл результата JSON (по умолчанию - только таблица)')
+
+    def handle(self, *args, **options):
+        """
+        Функция обработчик команды.
+        Запросы списка и деталей заказов, списка меню и отчета о выручке выполняются
+        приложением ASGI Django в текущем процессе (без сетевого сервера) сначала
+        с синхронными, затем с асинхронными маршрутами API.
+        """
+
+        random.seed(options['seed'])
+        with bench_database():
+            seed_orders(options['orders'], seed_menu(), lines=options['lines'])
+            client = Client()
+            client.force_login(User.objects.create_user(username='bench'))
+            cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+            headers: List[Tuple[bytes, bytes]] = [(b'cookie', cookie.encode())]
+            context = BenchContext()
+
+            def paths() -> str:
+                return random.choice((
+                    '/api/orders/',
+                    '/api/orders/?status=paid',
+                    f'/api/orders/{context.order_id()}/',
+                    '/api/menu-items/',
+                    '/api/revenue/?granularity=hour',
+                ))
+
+            results: Dict[str, List[Dict[str, Any]]] = {}
+            for mode, patterns in (('sync', api.urls.sync_urlpatterns), ('async', api.urls.async_urlpatterns)):
+                urlconf = ModuleType(f'bench_{mode}_urls')
+                urlconf.urlpatterns = [path('api/', include(patterns))]
+                with override_settings(ROOT_URLCONF=urlconf):
+                    application: Callable = ASGIHandler()
+                    results[mode] = [
+                        asyncio.run(run_clients(application, paths, clients, options['requests'], headers))
+                        for clients in options['clients']
+                    ]
+
+        self.stdout.write(f"{'режим':<6} {'клиентов':>8} {'запросов/с':>11} {'p50 мс':>9} {'p95 мс':>9} "
+                          f"{'p99 мс':>9} {'потоков':>8} {'ошибок':>7}")
+        for mode, rows in results.items():
+            for row in rows:
+                self.stdout.write(f"{mode:<6} {row['clients']:>8} {row['rps']:>11} {row['p50_ms']:>9} "
+                                  f"{row['p95_ms']:>9} {row['p99_ms']:>9} {row['peak_threads']:>8} {row['errors']:>7}")
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(json.dumps({
+                    'dataset': {key: options[key] for key in ('orders', 'lines', 'requests', 'seed')},
+                    'results': results,
+                }, ensure_ascii=False, indent=2) + '\n')
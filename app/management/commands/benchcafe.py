@@ -0,0 +1,77 @@
+import json
+import random
+import sys
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from typing import Any, Dict, List
+import api.urls
+import app.urls
+from ...bench import (BENCH_SCENARIOS, BENCH_SKIPPED_ROUTES, BenchContext, bench_database, check_thresholds,
+                      route_names, run_scenario, seed_menu, seed_orders)
+
+
+class Command(BaseCommand):
+    help = ('Замер производительности всех страниц и API (во временной тестовой БД): '
+            'перцентили задержки, SQL-запросы, время SQL и пик памяти в формате JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--menu-size', type=int, default=50, help='количество блюд')
+        parser.add_argument('--orders', type=int, default=5000, help='количество заказов')
+        parser.add_argument('--lines', type=int, default=3, help='количество позиций в заказе')
+        parser.add_argument('--requests', type=int, default=50, help='количество запросов на сценарий')
+        parser.add_argument('--only', nargs='+', default=[], help='замерить только сценарии с этими маршрутами')
+        parser.add_argument('--seed', type=int, default=1, help='начальное значение генератора случайных чисел')
+        parser.add_argument('--output', help='файл результата (по умолчанию - стандартный вывод)')
+        parser.add_argument('--thresholds',
+                            help='JSON-файл порогов {"сценарий" или "*": {"p95_ms": 50, "queries": 5}}; '
+                                 'при превышении команда завершается с ошибкой')
+
+    def handle(self, *args, **options):
+        """
+        Функция обработчик команды.
+        Заполняет временную БД, выполняет каждый сценарий тестовым клиентом
+        и выводит показатели в JSON (удобно сравнивать между версиями).
+        """
+
+        random.seed(options['seed'])
+        scenarios = [scenario for scenario in BENCH_SCENARIOS
+                     if not options['only'] or scenario.route in options['only']]
+
+        # маршруты без сценариев замера (например, добавленные позже) выводятся предупреждением
+        uncovered = route_names(app.urls.urlpatterns) | route_names(api.urls.urlpatterns)
+        uncovered -= {scenario.route for scenario in BENCH_SCENARIOS} | set(BENCH_SKIPPED_ROUTES)
+        if uncovered:
+            self.stderr.write(self.style.WARNING(f"Маршруты без сценариев замера: {', '.join(sorted(uncovered))}"))
+
+        with bench_database():
+            seed_orders(options['orders'], seed_menu(options['menu_size']), lines=options['lines'])
+            client = Client()
+            client.force_login(User.objects.create_superuser(username='bench', password='bench'))
+            context = BenchContext()
+
+            results: Dict[str, Dict[str, Any]] = {}
+            for scenario in scenarios:
+                if options['verbosity'] > 1:
+                    self.stderr.write(f"{scenario.name}...")
+                results[scenario.name] = run_scenario(client, context, scenario, options['requests'])
+
+        report = {
+            'dataset': {key: options[key] for key in ('menu_size', 'orders', 'lines', 'requests', 'seed')},
+            'python': sys.version.split()[0],
+            'results': results,
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+        if options['thresholds']:
+            with open(options['thresholds'], encoding='utf-8') as file:
+                thresholds: Dict[str, Dict[str, float]] = json.load(file)
+            regressions: List[str] = check_thresholds(results, thresholds)
+            if regressions:
+                raise CommandError("Превышены пороги производительности:\n" + "\n".join(regressions))
+            self.stderr.write(self.style.SUCCESS("Пороги производительности не превышены"))
@@ -0,0 +1,55 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from typing import Any, Callable, Dict, List
+from ...bench import bench_database, measure, seed_menu, seed_orders
+from ...models import Order
+
+
+class Command(BaseCommand):
+    help = ('Замер отрисовки страницы списка заказов с кэшем фрагментов строк и без него '
+            '(во временной тестовой БД)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=500, help='количество заказов на странице')
+        parser.add_argument('--lines', type=int, default=3, help='количество позиций в заказе')
+        parser.add_argument('--repeat', type=int, default=5, help='количество повторов (берется лучший)')
+
+    def handle(self, *args, **options):
+        """
+        Функция обработчик команды.
+        Заполняет временную БД заказами и замеряет время и число запросов отрисовки одной страницы
+        со всеми заказами: без кэша фрагментов, с пустым кэшем (отрисовка и сохранение всех строк),
+        с заполненным кэшем и с заполненным кэшем после изменения одного заказа.
+        """
+
+        with bench_database(), override_settings(ORDER_LIST_PAGE_SIZE=options['orders']):
+            seed_orders(options['orders'], seed_menu(), lines=options['lines'])
+            client = Client()
+            url = reverse('order_list')
+
+            def changed() -> None:
+                Order.objects.filter(pk=Order.objects.order_by('?').values('pk')[:1]).update(
+                    updated_at=timezone.now())
+                client.get(url)
+
+            variants: Dict[str, Callable[[], Any]] = {
+                'без кэша': lambda: client.get(url),
+                'пустой кэш': lambda: (cache.clear(), client.get(url)),
+                'заполненный кэш': lambda: client.get(url),
+                'изменен 1 заказ': changed,
+            }
+
+            self.stdout.write(f"Заказов на странице: {options['orders']}, позиций в заказе: {options['lines']}")
+            results: List[Dict[str, Any]] = []
+            for name, func in variants.items():
+                # время хранения 0 - фрагменты не сохраняются в кэш
+                with override_settings(ORDER_FRAGMENT_CACHE_TIMEOUT=0 if name == 'без кэша' else 60):
+                    func()
+                    result = measure(func, options['repeat'])
+                results.append(result)
+                self.stdout.write(f"  {name:<16} {result['seconds'] * 1000:9.1f} мс  запросов: {result['queries']}")
+            speedup = results[0]['seconds'] / results[2]['seconds']
+            self.stdout.write(self.style.SUCCESS(f"  Ускорение отрисовки с заполненным кэшем: x{speedup:.1f}"))
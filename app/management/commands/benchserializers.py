@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from typing import Any, Callable, Dict, List
+from ...bench import bench_database, measure, seed_menu, seed_orders
+from ...models import Order
+from ...pagination import KEYSET_ORDERING
+from ...serializers import OrderListSerializer, OrderReadSerializer
+
+
+class Command(BaseCommand):
+    help = ('Замер скорости сериализации списка заказов: OrderListSerializer '
+            'и быстрый сериализатор OrderReadSerializer (во временной тестовой БД)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000],
+                            help='количества заказов для замеров')
+        parser.add_argument('--lines', type=int, default=3, help='количество позиций в заказе')
+        parser.add_argument('--repeat', type=int, default=3, help='количество повторов (берется лучший)')
+
+    def handle(self, *args, **options):
+        """
+        Функция обработчик команды.
+        Для каждого размера заполняет временную БД заказами и замеряет время и число запросов
+        сериализации всех заказов: прежним способом (без prefetch, запрос позиций на каждый заказ),
+        прежним сериализатором с prefetch и быстрым сериализатором.
+        """
+
+        with bench_database():
+            menu = seed_menu()
+            seeded = 0
+            for size in sorted(options['sizes']):
+                seed_orders(size - seeded, menu, lines=options['lines'])
+                seeded = size
+                queryset = Order.objects.order_by(*KEYSET_ORDERING)
+
+                variants: Dict[str, Callable[[], Any]] = {
+                    'OrderListSerializer': lambda: OrderListSerializer(queryset.all(), many=True).data,
+                    'OrderListSerializer+prefetch': lambda: OrderListSerializer(
+                        queryset.with_items(), many=True).data,
+                    'OrderReadSerializer': lambda: OrderReadSerializer.serialize(
+                        list(OrderReadSerializer.order_values(queryset))),
+                }
+
+                self.stdout.write(f"Заказов: {size}, позиций в заказе: {options['lines']}")
+                results: List[Dict[str, Any]] = []
+                for name, func in variants.items():
+                    result = measure(func, options['repeat'])
+                    results.append(result)
+                    self.stdout.write(
+                        f"  {name:<30} {result['seconds']:8.3f} с  {size / result['seconds']:10.0f} заказов/с"
+                        f"  запросов: {result['queries']}"
+                    )
+                speedup = results[0]['seconds'] / results[-1]['seconds']
+                self.stdout.write(self.style.SUCCESS(f"  Ускорение быстрого сериализатора: x{speedup:.1f}"))
@@ -1,64 +1,220 @@
-import logging
-from random import randint, choice
-from django.core.management.base import BaseCommand
+import random
+import time
+from datetime import date, datetime, timedelta
+from datetime import time as day_time
+from decimal import Decimal
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from typing import Any, Dict, List, Tuple
+from ... import menu_cache
 from ...models import Order, MenuItem, OrderItem
 
-logger = logging.Logger(__name__)
+# базовое меню кафе (название, цена); недостающие до --menu-size блюда получают номер
+BASE_MENU: Dict[str, str] = {
+    "Кофе": "60.00",
+    "Чай": "10.00",
+    "Компот": "10.00",
+    "Суп": "20.00",
+    "Сендвич": "35.00",
+    "Яичница": "15.00",
+}
 
+# распределение заказов по часам работы кафе (пики - обед и ужин)
+HOUR_WEIGHTS: Dict[int, int] = {
+    8: 4, 9: 6, 10: 5, 11: 7, 12: 12, 13: 14, 14: 10, 15: 6,
+    16: 5, 17: 7, 18: 11, 19: 12, 20: 9, 21: 6, 22: 3,
+}
 
-def create_order_item(order, menu_item, quantity):
+# распределение статусов: прошлые заказы почти все оплачены, сегодняшние еще в работе
+PAST_STATUS_WEIGHTS: Dict[str, int] = {'paid': 96, 'ready': 2, 'pending': 2}
+TODAY_STATUS_WEIGHTS: Dict[str, int] = {'paid': 55, 'ready': 20, 'pending': 25}
+
+# количество позиций в заказе и количество порций блюда
+LINES_WEIGHTS: Dict[int, int] = {1: 20, 2: 35, 3: 25, 4: 12, 5: 8}
+QUANTITY_WEIGHTS: Dict[int, int] = {1: 70, 2: 20, 3: 7, 4: 2, 5: 1}
+
+# относительная загрузка по дням недели (пн - 0): выходные оживленнее
+WEEKDAY_WEIGHTS: Dict[int, float] = {0: 0.9, 1: 0.9, 2: 1.0, 3: 1.0, 4: 1.2, 5: 1.4, 6: 1.3}
+
+
+def weighted(rng: random.Random, weights: Dict, count: int = 1) -> List:
     """
-    Функция-шаблон создания элемента заказа.
+    Функция случайного выбора с весами.
 
-    :param order: объект заказа
-    :param menu_item: объект элемента (блюда) Меню
-    :param quantity: количество элементов в заказе
-    :return: объект элемента заказа
+    :param rng: генератор случайных чисел.
+    :param weights: словарь {значение: вес}.
+    :param count: количество значений.
+    :return: список выбранных значений.
     """
-    order_item = OrderItem.objects.create(
-        order=order,
-        menu_item=menu_item,
-        quantity=quantity
-    )
-    return order_item
+    return rng.choices(list(weights), weights=list(weights.values()), k=count)
+
+
+def daily_counts(orders: int, days: int, today: date) -> List[Tuple[date, int]]:
+    """
+    Функция распределения заказов по дням с учетом загрузки по дням недели.
+
+    :param orders: общее количество заказов.
+    :param days: количество дней (последний - сегодня).
+    :param today: сегодняшняя дата.
+    :return: список (дата, количество заказов) от старых дат к новым.
+    """
+    dates = [today - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+    weights = [WEEKDAY_WEIGHTS[day.weekday()] for day in dates]
+    total = sum(weights)
+    counts = [int(orders * weight / total) for weight in weights]
+    # остаток от округления добавляется последним (самым свежим) дням
+    for index in range(orders - sum(counts)):
+        counts[-1 - index % days] += 1
+    return list(zip(dates, counts))
 
 
 class Command(BaseCommand):
+    help = ('Создание тестовых данных: общего меню и заказов с позициями за период '
+            '(пакетная вставка, воспроизводимо при одинаковом --seed)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1000, help='количество заказов')
+        parser.add_argument('--menu-size', type=int, default=30, help='количество блюд меню')
+        parser.add_argument('--days', type=int, default=30, help='период заказов в днях (до сегодня включительно)')
+        parser.add_argument('--tables', type=int, default=20, help='количество столов')
+        parser.add_argument('--seed', type=int, default=42, help='начальное значение генератора случайных чисел')
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='количество заказов, вставляемых одной транзакцией')
+
     def handle(self, *args, **options):
         """
         Функция обработчик команды.
-        Создает рандомные тестовые заказы и блюда в меню.
+        Создает недостающие блюда общего меню, затем заказы и их позиции пакетами
+        (вставка пакетом в одной транзакции) и пересчитывает агрегаты выручки за период.
         """
 
-        items_dict = {
-            "Кофе": 60.00,
-            "Чай": 10.00,
-            "Компот": 10.00,
-            "Суп": 20.00,
-            "Сендвич": 35.00,
-            "Яичница": 15.00,
+        if min(options['orders'], options['menu_size'], options['days'], options['tables'],
+               options['batch_size']) < 1:
+            raise CommandError("Все количества должны быть положительными")
+
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+        menu = self.create_menu(rng, options['menu_size'])
+
+        now = timezone.localtime()
+        # часы работы, уже наступившие сегодня (будущих заказов не создается)
+        today_hours = {hour: weight for hour, weight in HOUR_WEIGHTS.items() if hour <= now.hour}
+        orders_created = lines_created = 0
+        order_rows: List[Tuple[Any, ...]] = []
+        line_rows: List[Tuple[Any, ...]] = []
+        # id заказов назначаются при генерации, чтобы позиции ссылались на них без чтения из БД
+        next_id = (Order.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+        ops = connection.ops
+        # цены позиций для всех сочетаний блюда и количества порций считаются один раз
+        line_prices: Dict[Tuple[int, int], Tuple[Decimal, Any]] = {
+            (menu_item.pk, quantity): (menu_item.price * quantity,
+                                       ops.adapt_decimalfield_value(menu_item.price * quantity, 8, 2))
+            for menu_item in menu for quantity in QUANTITY_WEIGHTS
         }
 
-        for i in range(1, 6):
-            # случайный номер стола
-            table_number = randint(1, 10)
-            # создание заказа
-            order = Order.objects.create(table_number=table_number)
-            # создание копии словаря блюд
-            items = items_dict.copy()
-            # случайное количество блюд в заказе
-            order_items = randint(1, 5)
-            for j in range(order_items):
-                # случайный выбор блюда из меню
-                menu_random = choice(list(items.keys()))
-                # создание объекта меню
-                menu_item = MenuItem.objects.create(name=menu_random, price=items_dict[menu_random])
-                # удаление выбранного блюда из словаря, чтобы не повторялось
-                items.pop(menu_random)
-                # случайное количество заказанного блюда
-                quantity = randint(1, 5)
-                # создание элемента заказа
-                order_item = create_order_item(order, menu_item, quantity)
-                logger.info(f"created Order-item: {order_item} and Table: {table_number}")
-                print(f"created Order-item: {order_item} and Table: {table_number}")
+        for day, count in daily_counts(options['orders'], options['days'], now.date()):
+            is_today = day == now.date()
+            hours = today_hours if is_today else HOUR_WEIGHTS
+            if not hours:
+                hours = {now.hour: 1}
+            statuses = TODAY_STATUS_WEIGHTS if is_today else PAST_STATUS_WEIGHTS
+
+            created = sorted(
+                timezone.make_aware(datetime.combine(day, day_time(hour, rng.randrange(60), rng.randrange(60))))
+                for hour in weighted(rng, hours, count)
+            )
+            for created_at, status in zip(created, weighted(rng, statuses, count)):
+                # разные блюда в заказе, количество порций каждого - по распределению
+                lines_count = min(weighted(rng, LINES_WEIGHTS)[0], len(menu))
+                total_price = Decimal('0')
+                for menu_item, quantity in zip(rng.sample(menu, lines_count),
+                                               weighted(rng, QUANTITY_WEIGHTS, lines_count)):
+                    price, db_price = line_prices[menu_item.pk, quantity]
+                    total_price += price
+                    line_rows.append((next_id, menu_item.pk, quantity, db_price))
+                timestamp = ops.adapt_datetimefield_value(min(created_at, now))
+                order_rows.append((next_id, rng.randint(1, options['tables']), status,
+                                   ops.adapt_decimalfield_value(total_price, 10, 2), timestamp, timestamp))
+                next_id += 1
+
+                if len(order_rows) >= options['batch_size']:
+                    self.insert(order_rows, line_rows)
+                    orders_created += len(order_rows)
+                    lines_created += len(line_rows)
+                    order_rows, line_rows = [], []
+                    self.stdout.write(f"Заказов создано: {orders_created}")
 
+        if order_rows:
+            self.insert(order_rows, line_rows)
+            orders_created += len(order_rows)
+            lines_created += len(line_rows)
+        self.reset_sequences()
+
+        # агрегаты выручки пересчитываются одним группирующим запросом за весь период
+        date_from = (now.date() - timedelta(days=options['days'] - 1)).isoformat()
+        call_command('rebuildrevenue', date_from=date_from, stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано заказов: {orders_created}, позиций: {lines_created}, блюд в меню: {len(menu)} "
+            f"за {time.perf_counter() - started:.1f} с"
+        ))
+
+    def create_menu(self, rng: random.Random, size: int) -> List[MenuItem]:
+        """
+        Функция подготовки общего меню: существующие блюда переиспользуются, недостающие создаются.
+
+        :param rng: генератор случайных чисел.
+        :param size: количество блюд меню.
+        :return: список блюд меню.
+        """
+        names = list(BASE_MENU)[:size] + [f"Блюдо {number}" for number in range(len(BASE_MENU) + 1, size + 1)]
+        # при повторяющихся названиях (меню прежних версий команды) берется первое блюдо
+        menu: Dict[str, MenuItem] = {}
+        for item in MenuItem.objects.filter(name__in=names).order_by('id'):
+            menu.setdefault(item.name, item)
+        # цены разыгрываются для всех блюд, чтобы последовательность случайных чисел не зависела от БД
+        prices = {name: Decimal(BASE_MENU.get(name) or f"{rng.randint(10, 150)}.00") for name in names}
+        missing = [MenuItem(name=name, price=prices[name]) for name in names if name not in menu]
+        if missing:
+            MenuItem.objects.bulk_create(missing)
+            # bulk_create не вызывает save(), поэтому кэш меню сбрасывается явно
+            menu_cache.invalidate()
+            menu.update((item.name, item) for item in missing)
+        return [menu[name] for name in names]
+
+    @staticmethod
+    def insert(order_rows: List[Tuple[Any, ...]], line_rows: List[Tuple[Any, ...]]) -> None:
+        """
+        Функция вставки пакета заказов и позиций в одной транзакции.
+        Строки вставляются executemany без создания объектов моделей: при миллионах позиций
+        основное время bulk_create уходит на создание и подготовку объектов, а не на БД.
+
+        :param order_rows: строки заказов (id, table_number, status, total_price, created_at, updated_at).
+        :param line_rows: строки позиций (order_id, menu_item_id, quantity, price).
+        :return:
+        """
+        with transaction.atomic(), connection.cursor() as cursor:
+            for model, fields, rows in (
+                (Order, ['id', 'table_number', 'status', 'total_price', 'created_at', 'updated_at'], order_rows),
+                (OrderItem, ['order', 'menu_item', 'quantity', 'price'], line_rows),
+            ):
+                columns = ', '.join(connection.ops.quote_name(model._meta.get_field(name).column) for name in fields)
+                cursor.executemany(
+                    f"INSERT INTO {connection.ops.quote_name(model._meta.db_table)} ({columns}) "
+                    f"VALUES ({', '.join(['%s'] * len(fields))})",
+                    rows,
+                )
+
+    @staticmethod
+    def reset_sequences() -> None:
+        """
+        Функция сдвига счетчиков id после вставки заказов с заданными id (для БД с последовательностями).
+
+        :return:
+        """
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Order]):
+                cursor.execute(sql)
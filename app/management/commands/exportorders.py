@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from typing import Dict
+from ...exports import EXPORT_COLUMNS, EXPORT_FORMATS, export_stream
+from ...routers import reporting_reads
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка заказов, позиций заказов или выручки в файл CSV / JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='путь к файлу выгрузки')
+        parser.add_argument('--kind', choices=list(EXPORT_COLUMNS), default='orders',
+                            help='выгружаемые данные')
+        parser.add_argument('--format', dest='export_format', choices=list(EXPORT_FORMATS), default='csv',
+                            help='формат выгрузки')
+        parser.add_argument('--status', help='статус заказов')
+        parser.add_argument('--table', help='номер стола')
+        parser.add_argument('--date-from', help='первая дата (ГГГГ-ММ-ДД)')
+        parser.add_argument('--date-to', help='последняя дата (ГГГГ-ММ-ДД)')
+
+    def handle(self, *args, **options):
+        """
+        Функция обработчик команды.
+        Записывает выгрузку в файл по мере чтения из БД, не накапливая строки в памяти.
+        """
+
+        params: Dict[str, str] = {
+            key: options[key] for key in ('status', 'table', 'date_from', 'date_to') if options[key]
+        }
+        lines = 0
+        # выгрузка читается из БД отчетов (если настроена), не нагружая основную БД
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output, reporting_reads():
+            for line in export_stream(options['kind'], options['export_format'], params):
+                output.write(line)
+                lines += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Записано строк: {lines} ({options['output']})"))
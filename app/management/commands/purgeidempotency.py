@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from ...idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Удаление просроченных ключей идемпотентности (IdempotencyKey) порциями'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.IDEMPOTENCY_PURGE_BATCH_SIZE,
+                            help='количество ключей, удаляемых одной транзакцией')
+
+    def handle(self, *args, **options):
+        """
+        Функция обработчик команды.
+        Каждая порция удаляется отдельной короткой транзакцией записи, поэтому запуск по расписанию
+        (например, раз в час) не задерживает создание заказов.
+        """
+
+        total = 0
+        while True:
+            purged = purge_expired(options['batch_size'])
+            total += purged
+            if purged < options['batch_size']:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f"Удалено просроченных ключей идемпотентности: {total}"))
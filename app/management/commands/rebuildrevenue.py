@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models.query import QuerySet
+from ...filters import filter_by_created, parse_day
+from ...models import ArchivedOrder, Order, RevenueRollup
+from ...reports import revenue_buckets
+
+
+class Command(BaseCommand):
+    help = 'Полный пересчет агрегатов выручки (RevenueRollup) по оплаченным заказам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-from', help='первая дата пересчета (ГГГГ-ММ-ДД), по умолчанию - вся история')
+        parser.add_argument('--date-to', help='последняя дата пересчета (ГГГГ-ММ-ДД)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='количество агрегатов, вставляемых одним запросом')
+
+    def handle(self, *args, **options):
+        """
+        Функция обработчик команды.
+        Удаляет агрегаты за период и заново заполняет их группирующими запросами
+        по оплаченным заказам (день, час, стол): рабочей таблицы и архива заказов.
+        """
+
+        date_from, date_to = parse_day(options['date_from']), parse_day(options['date_to'])
+        buckets = revenue_buckets(filter_by_created(orders, date_from, date_to)
+                                  for orders in (Order.objects.filter(status='paid'), ArchivedOrder.objects.all()))
+
+        # агрегаты периода (включая опустевшие) удаляются и создаются заново
+        stale: QuerySet[RevenueRollup] = RevenueRollup.objects.all()
+        if date_from:
+            stale = stale.filter(date__gte=date_from)
+        if date_to:
+            stale = stale.filter(date__lte=date_to)
+
+        with transaction.atomic():
+            stale.delete()
+            rollups = RevenueRollup.objects.bulk_create(
+                (RevenueRollup(date=day, hour=hour, table_number=table_number, revenue=revenue,
+                               orders_count=orders_count)
+                 for (day, hour, table_number), (revenue, orders_count) in buckets.items()),
+                batch_size=options['batch_size'],
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Агрегатов выручки создано: {len(rollups)}"))
@@ -0,0 +1,63 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from typing import List
+from ...models import Order
+
+
+class Command(BaseCommand):
+    help = 'Проверка и исправление расхождений итоговых сумм заказов с суммой их позиций'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='только вывести расхождения, не исправляя их')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='количество заказов, исправляемых одним запросом')
+
+    def handle(self, *args, **options):
+        """
+        Функция обработчик команды.
+        Находит заказы, у которых total_price не совпадает с суммой позиций
+        (один агрегирующий запрос с HAVING), и исправляет их пакетами.
+        """
+
+        drifted = (
+            Order.objects
+            .annotate(computed=Coalesce(Sum('order_items__price'), Value(Decimal('0')),
+                                        output_field=DecimalField(max_digits=10, decimal_places=2)))
+            .exclude(total_price=F('computed'))
+            .values_list('pk', 'total_price', 'computed')
+            .order_by('pk')
+        )
+
+        # расхождений обычно немного; список читается целиком до начала записи,
+        # т.к. SQLite не изолирует открытый курсор от изменений в том же соединении
+        found = 0
+        batch: List[Order] = []
+        for pk, total_price, computed in list(drifted):
+            found += 1
+            self.stdout.write(f"Order #{pk}: {total_price} -> {computed}")
+            batch.append(Order(pk=pk, total_price=computed, updated_at=timezone.now()))
+            if len(batch) >= options['batch_size']:
+                self._repair(batch, options['dry_run'])
+                batch = []
+        self._repair(batch, options['dry_run'])
+
+        action = 'найдено' if options['dry_run'] else 'исправлено'
+        self.stdout.write(self.style.SUCCESS(f"Расхождений {action}: {found}"))
+
+    @staticmethod
+    def _repair(batch: List[Order], dry_run: bool) -> None:
+        """
+        Функция записи исправленных итоговых сумм.
+
+        :param batch: заказы с рассчитанными итоговыми суммами.
+        :param dry_run: True - ничего не записывать.
+        :return:
+        """
+        if batch and not dry_run:
+            with transaction.atomic():
+                Order.objects.bulk_update(batch, ['total_price', 'updated_at'])
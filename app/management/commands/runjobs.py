@@ -0,0 +1,36 @@
+import signal
+import threading
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from ...jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = ('Рабочий процесс фоновых задач (тяжелые отчеты, выгрузки, пересчеты): выполняет задачи очереди '
+            'в пуле потоков или процессов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.JOB_WORKERS,
+                            help='количество одновременно выполняемых задач')
+        parser.add_argument('--pool', choices=['thread', 'process'], default=settings.JOB_POOL,
+                            help='пул выполнения: потоки или процессы')
+        parser.add_argument('--poll', type=float, default=settings.JOB_POLL_INTERVAL,
+                            help='пауза опроса пустой очереди (сек.)')
+        parser.add_argument('--once', action='store_true', help='выполнить задачи очереди и завершиться')
+
+    def handle(self, *args, **options):
+        """
+        Функция обработчик команды.
+        Несколько рабочих процессов (в том числе на разных серверах с общей БД) могут работать одновременно:
+        задачу захватывает один из них. По SIGTERM / SIGINT новые задачи не берутся, выполняемые завершаются.
+        """
+
+        stop = threading.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: stop.set())
+
+        if options['verbosity'] > 0:
+            self.stdout.write(f"Рабочий процесс задач: {options['workers']} ({options['pool']})")
+        processed = run_worker(options['workers'], options['pool'], options['poll'], options['once'], stop,
+                               log=self.stdout.write if options['verbosity'] > 1 else None)
+        self.stdout.write(self.style.SUCCESS(f"Выполнено задач: {processed}"))
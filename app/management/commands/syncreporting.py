@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from ...routers import sync_reporting
+
+
+class Command(BaseCommand):
+    help = ('Обновление БД отчетов (REPORTING_DB_NAME) копией основной БД SQLite '
+            '(вместо репликации; запускается по расписанию, например раз в минуту)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=-1,
+                            help='количество страниц за шаг копирования (-1 - за один шаг)')
+
+    def handle(self, *args, **options):
+        """
+        Функция обработчик команды.
+        Копирует основную БД в БД отчетов резервным копированием SQLite (согласованный снимок).
+        """
+
+        if not settings.REPORTING_DB_NAME:
+            self.stdout.write("БД отчетов не настроена (REPORTING_DB_NAME): чтения идут в основную БД")
+            return
+        seconds = sync_reporting(pages=options['pages'])
+        self.stdout.write(self.style.SUCCESS(f"БД отчетов обновлена за {seconds:.2f} с"))
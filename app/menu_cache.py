@@ -0,0 +1,215 @@
+import threading
+import time
+from asgiref.sync import sync_to_async
+from decimal import Decimal
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.response import Response
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# ключ версии меню и шаблон ключа содержимого меню в кэше Django (общем для всех процессов)
+MENU_VERSION_KEY: str = 'menu:version'
+MENU_ITEMS_KEY: str = 'menu:items:{version}'
+
+# копия меню текущего процесса: (версия, блюда по порядку, блюда по id)
+_local: Tuple[Optional[int], List[Dict[str, Any]], Dict[int, Dict[str, Any]]] = (None, [], {})
+_lock = threading.Lock()
+
+
+def get_version() -> int:
+    """
+    Функция получения текущей версии меню.
+    Версия хранится в кэше Django, поэтому общая для всех рабочих процессов;
+    при отсутствии (первый запуск, очистка кэша) создается новая.
+
+    :return: номер версии меню.
+    """
+    version: Optional[int] = cache.get(MENU_VERSION_KEY)
+    if version is None:
+        cache.add(MENU_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(MENU_VERSION_KEY)
+    return version
+
+
+async def aget_version() -> int:
+    """
+    Функция получения текущей версии меню (асинхронная, для представлений ASGI).
+
+    :return: номер версии меню.
+    """
+    version: Optional[int] = await cache.aget(MENU_VERSION_KEY)
+    if version is None:
+        await cache.aadd(MENU_VERSION_KEY, time.time_ns(), None)
+        version = await cache.aget(MENU_VERSION_KEY)
+    return version
+
+
+def bump_version() -> int:
+    """
+    Функция смены версии меню (после изменения или удаления блюда).
+    Версия растет монотонно, ее можно использовать как признак изменения меню.
+
+    :return: новый номер версии меню.
+    """
+    version = max(time.time_ns(), (cache.get(MENU_VERSION_KEY) or 0) + 1)
+    cache.set(MENU_VERSION_KEY, version, None)
+    return version
+
+
+def invalidate() -> None:
+    """
+    Функция сброса кэша меню при изменении блюд.
+    Версия меняется сразу (текущий процесс видит свои изменения) и повторно после фиксации
+    транзакции, чтобы другие процессы не закэшировали меню, прочитанное до фиксации.
+
+    :return:
+    """
+    bump_version()
+    transaction.on_commit(bump_version)
+
+
+def _load() -> Tuple[Optional[int], List[Dict[str, Any]], Dict[int, Dict[str, Any]]]:
+    """
+    Функция получения меню текущей версии: из копии процесса, из кэша Django или из БД.
+
+    :return: версия, блюда по порядку и блюда по id.
+    """
+    global _local
+    version = get_version()
+    local = _local
+    if local[0] == version:
+        return local
+
+    with _lock:
+        items: Optional[List[Dict[str, Any]]] = cache.get(MENU_ITEMS_KEY.format(version=version))
+        if items is None:
+            menu_item_model = apps.get_model('app', 'MenuItem')
+            # меню кэшируется под текущей версией, поэтому читается из основной БД (не из реплики отчетов)
+            items = list(menu_item_model.objects.using(DEFAULT_DB_ALIAS).order_by('id')
+                         .values('id', 'name', 'price'))
+            cache.set(MENU_ITEMS_KEY.format(version=version), items, settings.MENU_CACHE_TIMEOUT)
+        _local = (version, items, {item['id']: item for item in items})
+        return _local
+
+
+def get_menu() -> List[Dict[str, Any]]:
+    """
+    Функция получения всех блюд меню.
+
+    :return: список словарей блюд (id, name, price), упорядоченный по id.
+    """
+    return _load()[1]
+
+
+async def _aload() -> Tuple[Optional[int], List[Dict[str, Any]], Dict[int, Dict[str, Any]]]:
+    """
+    Функция получения меню текущей версии (асинхронная, для представлений ASGI).
+    Если копия процесса устарела, меню загружается из кэша Django или БД в отдельном потоке.
+
+    :return: версия, блюда по порядку и блюда по id.
+    """
+    version = await aget_version()
+    local = _local
+    if local[0] == version:
+        return local
+    return await sync_to_async(_load)()
+
+
+async def aget_menu() -> List[Dict[str, Any]]:
+    """
+    Функция получения всех блюд меню (асинхронная, для представлений ASGI).
+
+    :return: список словарей блюд (id, name, price), упорядоченный по id.
+    """
+    return (await _aload())[1]
+
+
+def _find(menu: Dict[int, Dict[str, Any]], pk: Any) -> Optional[Dict[str, Any]]:
+    """
+    Функция поиска блюда по id в меню одной версии.
+
+    :param menu: блюда по id.
+    :param pk: id блюда.
+    :return: словарь блюда (id, name, price) или None, если блюда нет.
+    """
+    try:
+        return menu.get(int(pk))
+    except (TypeError, ValueError):
+        return None
+
+
+def get_menu_item(pk: Any, menu: Optional[Dict[int, Dict[str, Any]]] = None):
+    """
+    Функция получения блюда по id без запроса к БД.
+
+    :param pk: id блюда.
+    :param menu: блюда по id одной версии меню (по умолчанию - меню текущей версии).
+    :return: объект блюда (MenuItem) или None, если блюда нет.
+    """
+    item = _find(_load()[2] if menu is None else menu, pk)
+    if item is None:
+        return None
+    menu_item_model = apps.get_model('app', 'MenuItem')
+    return menu_item_model.from_db(DEFAULT_DB_ALIAS, ['id', 'name', 'price'], [item['id'], item['name'], item['price']])
+
+
+def get_menu_items(pks: Iterable[Any]) -> Dict[int, Any]:
+    """
+    Функция получения нескольких блюд по id без запроса к БД (аналог in_bulk).
+    Все блюда берутся из меню одной версии (одно обращение к кэшу за версией).
+
+    :param pks: id блюд.
+    :return: словарь {id: объект блюда} для найденных блюд.
+    """
+    menu = _load()[2]
+    menu_items = {}
+    for pk in pks:
+        menu_item = get_menu_item(pk, menu)
+        if menu_item is not None:
+            menu_items[menu_item.pk] = menu_item
+    return menu_items
+
+
+def get_price(pk: Any) -> Optional[Decimal]:
+    """
+    Функция получения цены блюда без запроса к БД.
+
+    :param pk: id блюда.
+    :return: цена блюда или None, если блюда нет.
+    """
+    item = _find(_load()[2], pk)
+    return item['price'] if item else None
+
+
+class CachedMenuListMixin:
+    """
+    Примесь для ViewSet блюд: список меню выдается из кэша меню без запроса к БД.
+    Асинхронные обработчики (alist / aretrieve, см. api.async_views) выдают из кэша и список, и блюдо.
+    """
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        menu = get_menu()
+        page = self.paginate_queryset(menu)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(menu, many=True).data)
+
+    async def alist(self, request: Request, *args, **kwargs) -> Response:
+        menu = await aget_menu()
+        page = self.paginate_queryset(menu)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(menu, many=True).data)
+
+    async def aretrieve(self, request: Request, *args, **kwargs) -> Response:
+        try:
+            item = (await _aload())[2].get(int(kwargs[self.lookup_url_kwarg or self.lookup_field]))
+        except (TypeError, ValueError):
+            item = None
+        if item is None:
+            raise NotFound()
+        return Response(self.get_serializer(item).data)
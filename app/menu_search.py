@@ -0,0 +1,41 @@
+from django.apps import apps
+from django.conf import settings
+from typing import Any, Dict, List, Optional
+
+# верхняя граница диапазона строк с заданным префиксом (максимальный символ Юникода)
+PREFIX_END: str = '\U0010ffff'
+
+
+def normalize(value: str) -> str:
+    """
+    Функция нормализации названия блюда для поиска: без учета регистра (в том числе кириллицы),
+    ё приравнивается к е, пробелы схлопываются.
+
+    :param value: название блюда или строка поиска.
+    :return: нормализованная строка.
+    """
+    return ' '.join(value.casefold().replace('ё', 'е').split())
+
+
+def search_menu(query: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Функция поиска блюд по названию (MenuItem.search_name).
+    Сначала выдаются блюда, название которых начинается со строки поиска (диапазон индекса),
+    затем - содержащие ее (просмотр только столбца поиска). Внутри групп - по названию.
+
+    :param query: строка поиска.
+    :param limit: количество блюд (по умолчанию MENU_SEARCH_LIMIT, не больше MENU_SEARCH_MAX_LIMIT).
+    :return: список словарей блюд (id, name, price).
+    """
+    term = normalize(query)
+    limit = min(limit or settings.MENU_SEARCH_LIMIT, settings.MENU_SEARCH_MAX_LIMIT)
+    if not term or limit <= 0:
+        return []
+
+    items = apps.get_model('app', 'MenuItem').objects.order_by('search_name', 'id')
+    fields = ('id', 'name', 'price')
+    found = list(items.filter(search_name__gte=term, search_name__lt=term + PREFIX_END).values(*fields)[:limit])
+    if len(found) < limit:
+        found += list(items.filter(search_name__contains=term).exclude(search_name__startswith=term)
+                      .values(*fields)[:limit - len(found)])
+    return found
@@ -0,0 +1,304 @@
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpRequest, HttpResponse
+from django.template.backends.django import DjangoTemplates, Template
+from typing import Callable, Dict, List, Optional, Tuple
+
+# границы интервалов гистограмм: время (сек.) и количество SQL-запросов
+DURATION_BUCKETS: Tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERIES_BUCKETS: Tuple[float, ...] = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+# метрики (название, описание, интервалы гистограммы)
+METRICS: Tuple[Tuple[str, str, Tuple[float, ...]], ...] = (
+    ('cafe_request_duration_seconds', 'Полное время обработки запроса', DURATION_BUCKETS),
+    ('cafe_request_sql_duration_seconds', 'Время SQL-запросов за запрос', DURATION_BUCKETS),
+    ('cafe_request_render_duration_seconds', 'Время отрисовки шаблонов и ответа', DURATION_BUCKETS),
+    ('cafe_request_queries', 'Количество SQL-запросов за запрос', QUERIES_BUCKETS),
+)
+
+# счетчики (название, описание)
+COUNTERS: Tuple[Tuple[str, str], ...] = (
+    ('cafe_order_json_cache_hits_total', 'Заказы API, выданные из кэша JSON'),
+    ('cafe_order_json_cache_misses_total', 'Заказы API, сериализованные заново (нет в кэше JSON)'),
+)
+
+
+class RequestMetrics:
+    """Показатели одного запроса (накапливаются оберткой SQL-запросов и отрисовкой шаблонов)."""
+
+    queries: int
+    sql_time: float
+    render_time: float
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+
+
+# показатели текущего запроса (None - запрос не замеряется); контекст переходит
+# и в потоки sync_to_async, поэтому учитываются и запросы к БД асинхронных представлений
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar('request_metrics', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Функция-обертка выполнения SQL-запроса: учитывает запрос в показателях текущего запроса.
+    Устанавливается на каждое подключение к БД постоянно (см. install_query_recorder).
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.sql_time += time.perf_counter() - started
+        metrics.queries += 1
+
+
+def install_query_recorder(connection, **kwargs) -> None:
+    """
+    Функция установки обертки record_query на подключение к БД (обработчик сигнала connection_created).
+    Обертка ставится первой в списке: временные обертки (execute_wrapper) снимаются с конца списка.
+
+    :param connection: подключение к БД.
+    :return:
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+connection_created.connect(install_query_recorder)
+
+
+class Histogram:
+    """Гистограмма в формате Prometheus: количество значений по интервалам, сумма и количество."""
+
+    buckets: Tuple[float, ...]
+    counts: List[int]
+    total: float
+    count: int
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Гистограммы показателей запросов по имени представления (маршрута) и счетчики (COUNTERS).
+    Показатели хранятся в памяти процесса: при нескольких рабочих процессах
+    Prometheus собирает /metrics каждого процесса отдельно.
+    """
+
+    histograms: Dict[Tuple[str, str], Histogram]
+    counters: Dict[str, int]
+
+    def __init__(self) -> None:
+        self.histograms = {}
+        self.counters = {name: 0 for name, _ in COUNTERS}
+        self._lock = threading.Lock()
+
+    def observe(self, view: str, values: Dict[str, float]) -> None:
+        """
+        Функция учета показателей запроса.
+
+        :param view: имя представления.
+        :param values: значения по названиям метрик.
+        :return:
+        """
+        with self._lock:
+            for name, _, buckets in METRICS:
+                histogram = self.histograms.get((name, view))
+                if histogram is None:
+                    histogram = self.histograms[name, view] = Histogram(buckets)
+                histogram.observe(values[name])
+
+    def increment(self, name: str, value: int = 1) -> None:
+        """
+        Функция увеличения счетчика.
+
+        :param name: название счетчика (COUNTERS).
+        :param value: приращение.
+        :return:
+        """
+        with self._lock:
+            self.counters[name] += value
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+            self.counters = {name: 0 for name, _ in COUNTERS}
+
+    def render(self) -> str:
+        """
+        Функция вывода гистограмм и счетчиков в текстовом формате Prometheus.
+
+        :return: текст метрик.
+        """
+        lines: List[str] = []
+        with self._lock:
+            for name, description, buckets in METRICS:
+                lines += [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+                for (metric, view), histogram in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    label = view.replace('\\', '\\\\').replace('"', '\\"')
+                    cumulative = 0
+                    for bound, count in zip(buckets + (float('inf'),), histogram.counts):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else f"{bound:g}"
+                        lines.append(f'{name}_bucket{{view="{label}",le="{le}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{view="{label}"}} {histogram.total:.6f}')
+                    lines.append(f'{name}_count{{view="{label}"}} {histogram.count}')
+            for name, description in COUNTERS:
+                lines += [f"# HELP {name} {description}", f"# TYPE {name} counter", f"{name} {self.counters[name]}"]
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class TimedTemplate(Template):
+    """Шаблон Django, время отрисовки которого учитывается в показателях текущего запроса."""
+
+    def render(self, context=None, request=None) -> str:
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.render_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблонизатор Django с учетом времени отрисовки шаблонов (settings.TEMPLATES['BACKEND'])."""
+
+    def from_string(self, template_code: str) -> TimedTemplate:
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name: str) -> TimedTemplate:
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+class MetricsMiddleware:
+    """
+    Промежуточный слой замера запросов: количество и время SQL-запросов, время отрисовки
+    и полное время по имени представления ('order_list', 'order-list', ...).
+    Показатели добавляются в заголовок Server-Timing и в гистограммы /metrics.
+
+    Настройки: METRICS_ENABLED - включение, METRICS_SAMPLE_RATE - доля замеряемых запросов (0-1).
+    """
+
+    sync_capable: bool = True
+    async_capable: bool = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        # асинхронная цепочка не переключает запросы в отдельные потоки (потоки событий ASGI и т.п.)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if self.is_async:
+            return self.__acall__(request)
+        metrics = self.start()
+        if metrics is None:
+            return self.get_response(request)
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        metrics = self.start()
+        if metrics is None:
+            return await self.get_response(request)
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    @staticmethod
+    def start() -> Optional[RequestMetrics]:
+        """
+        Функция начала замера запроса (с учетом доли замеряемых запросов).
+
+        :return: показатели запроса или None, если запрос не замеряется.
+        """
+        sample_rate: float = getattr(settings, 'METRICS_SAMPLE_RATE', 1.0)
+        if sample_rate < 1 and random.random() >= sample_rate:
+            return None
+        # подключения, открытые до загрузки модуля (например, тестовой БД), получают обертку здесь
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+        return RequestMetrics()
+
+    @staticmethod
+    def finish(request: HttpRequest, response: HttpResponse, metrics: RequestMetrics, started: float) -> HttpResponse:
+        """
+        Функция завершения замера: учет показателей в гистограммах и заголовок Server-Timing.
+
+        :param request:
+        :param response:
+        :param metrics: показатели запроса.
+        :param started: время начала запроса (perf_counter).
+        :return: ответ с заголовком Server-Timing.
+        """
+        total = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else 'unresolved'
+        registry.observe(view, {
+            'cafe_request_duration_seconds': total,
+            'cafe_request_sql_duration_seconds': metrics.sql_time,
+            'cafe_request_render_duration_seconds': metrics.render_time,
+            'cafe_request_queries': metrics.queries,
+        })
+        response['Server-Timing'] = (
+            f'db;dur={metrics.sql_time * 1000:.1f};desc="{metrics.queries} queries", '
+            f'render;dur={metrics.render_time * 1000:.1f}, '
+            f'total;dur={total * 1000:.1f}'
+        )
+        return response
+
+    def process_template_response(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
+        # ответы, отрисовываемые после представления (DRF, TemplateResponse): время отрисовки - от этого вызова
+        # (последнего перед render()) до конца render(), без ответной части внутренних промежуточных слоев
+        metrics = _current.get()
+        if metrics is not None:
+            started, before = time.perf_counter(), metrics.render_time
+
+            def rendered(response: HttpResponse) -> None:
+                # время шаблонов внутри render() уже входит в этот интервал
+                metrics.render_time = before + (time.perf_counter() - started)
+
+            response.add_post_render_callback(rendered)
+        return response
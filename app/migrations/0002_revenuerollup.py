@@ -0,0 +1,59 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:57
+
+from django.db import migrations, models
+
+from app.reports import revenue_buckets
+
+
+def fill_revenue_rollups(apps, schema_editor):
+    # заполнение агрегатов выручки по уже оплаченным заказам (тем же группирующим запросом, что rebuildrevenue):
+    # иначе отчет не учитывает их, а изменение такого заказа уводит пустые агрегаты в минус
+    order_model = apps.get_model('app', 'Order')
+    rollup_model = apps.get_model('app', 'RevenueRollup')
+    buckets = revenue_buckets([order_model.objects.filter(status='paid')])
+    rollup_model.objects.bulk_create(
+        (rollup_model(date=day, hour=hour, table_number=table_number, revenue=revenue, orders_count=orders_count)
+         for (day, hour, table_number), (revenue, orders_count) in buckets.items()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='menuitem',
+            options={'verbose_name': 'Блюдо', 'verbose_name_plural': 'Блюда'},
+        ),
+        migrations.AlterField(
+            model_name='menuitem',
+            name='name',
+            field=models.CharField(max_length=100, verbose_name='Название блюда'),
+        ),
+        migrations.AlterField(
+            model_name='menuitem',
+            name='price',
+            field=models.DecimalField(decimal_places=2, max_digits=8, verbose_name='Цена'),
+        ),
+        migrations.CreateModel(
+            name='RevenueRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('hour', models.PositiveSmallIntegerField(verbose_name='Час')),
+                ('table_number', models.PositiveIntegerField(verbose_name='Номер стола')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+                ('orders_count', models.IntegerField(default=0, verbose_name='Количество заказов')),
+            ],
+            options={
+                'verbose_name': 'Выручка за час',
+                'verbose_name_plural': 'Выручка по часам',
+                'constraints': [models.UniqueConstraint(fields=('date', 'hour', 'table_number'), name='unique_revenue_rollup_bucket')],
+            },
+        ),
+        migrations.RunPython(fill_revenue_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-18 08:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_order_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('table_number', models.PositiveIntegerField(verbose_name='Номер стола')),
+                ('status', models.CharField(default='paid', max_length=10, verbose_name='Статус')),
+                ('total_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Итоговая сумма')),
+                ('created_at', models.DateTimeField(verbose_name='Создан')),
+                ('updated_at', models.DateTimeField(verbose_name='Изменен')),
+                ('archived_at', models.DateTimeField(verbose_name='Перенесен в архив')),
+                ('lines', models.JSONField(default=list, verbose_name='Позиции')),
+            ],
+            options={
+                'verbose_name': 'Архивный заказ',
+                'verbose_name_plural': 'Архивные заказы',
+                'indexes': [models.Index(fields=['created_at'], name='archived_created_idx'), models.Index(fields=['table_number', 'created_at'], name='archived_table_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-18 08:57
+
+from django.db import migrations, models
+
+from app.menu_search import normalize
+
+
+def fill_search_name(apps, schema_editor):
+    # заполнение столбца поиска для существующих блюд
+    menu_item_model = apps.get_model('app', 'MenuItem')
+    items = list(menu_item_model.objects.only('id', 'name'))
+    for item in items:
+        item.search_name = normalize(item.name)
+    menu_item_model.objects.bulk_update(items, ['search_name'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_archivedorder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='search_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(fill_search_name, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_menuitem_search_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owner', models.CharField(default='', max_length=150, verbose_name='Владелец')),
+                ('key', models.CharField(max_length=255, verbose_name='Ключ')),
+                ('request_hash', models.CharField(max_length=64, verbose_name='Хэш запроса')),
+                ('status_code', models.PositiveSmallIntegerField(null=True, verbose_name='Код ответа')),
+                ('content_type', models.CharField(default='', max_length=100, verbose_name='Тип ответа')),
+                ('location', models.CharField(default='', max_length=500, verbose_name='Адрес перенаправления')),
+                ('body', models.BinaryField(default=b'', verbose_name='Тело ответа')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создан')),
+                ('expires_at', models.DateTimeField(verbose_name='Хранится до')),
+            ],
+            options={
+                'verbose_name': 'Ключ идемпотентности',
+                'verbose_name_plural': 'Ключи идемпотентности',
+                'indexes': [models.Index(fields=['expires_at'], name='idempotency_expires_idx')],
+                'constraints': [models.UniqueConstraint(fields=('owner', 'key'), name='unique_idempotency_owner_key')],
+            },
+        ),
+    ]
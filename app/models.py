@@ -1,7 +1,27 @@
 from datetime import datetime
-from django.db import models
+from decimal import Decimal
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Sum
 from django.db.models.query import QuerySet
-from typing import List
+from django.utils import timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from . import conditional, events, menu_cache
+from .menu_search import normalize
+
+
+class MenuItemQuerySet(models.QuerySet):
+    """Набор блюд: столбец поиска заполняется и при пакетных вставке и изменении названия."""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.search_name = normalize(obj.name)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def update(self, **kwargs):
+        if isinstance(kwargs.get('name'), str):
+            kwargs['search_name'] = normalize(kwargs['name'])
+        return super().update(**kwargs)
 
 
 class MenuItem(models.Model):
@@ -11,6 +31,25 @@ class MenuItem(models.Model):
         decimal_places=2,
         verbose_name='Цена'
     )
+    # нормализованное название для поиска по префиксу (индекс) и подстроке (см. menu_search)
+    search_name: str = models.CharField(max_length=100, default='', editable=False, db_index=True)
+
+    objects: MenuItemQuerySet = MenuItemQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        self.search_name = normalize(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'search_name'}
+        result = super().save(*args, **kwargs)
+        # смена версии кэша меню (см. menu_cache); update() и delete() набора записей кэш не сбрасывают
+        menu_cache.invalidate()
+        return result
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        menu_cache.invalidate()
+        return result
 
     def __str__(self):
         return f"{self.name} - {self.price}₽"
@@ -20,12 +59,124 @@ class MenuItem(models.Model):
         verbose_name_plural: str = 'Блюда'
 
 
+def order_items_prefetch() -> models.Prefetch:
+    """
+    Функция подгрузки позиций заказов с блюдами (одним запросом на все заказы, по порядку добавления).
+
+    :return: объект подгрузки для prefetch_related / prefetch_related_objects.
+    """
+    return models.Prefetch('order_items', queryset=OrderItem.objects.select_related('menu_item').order_by('id'))
+
+
+class OrderQuerySet(models.QuerySet):
+    """Набор заказов с дополнительными методами выборки."""
+
+    def with_items(self) -> 'OrderQuerySet':
+        """
+        Функция подгрузки позиций заказов вместе с блюдами.
+        Позиции и названия блюд загружаются одним дополнительным запросом
+        на всю страницу заказов, а не отдельными запросами на каждый заказ.
+
+        :return: набор заказов с предзагруженными позициями.
+        """
+        return self.prefetch_related(order_items_prefetch())
+
+    def create_with_items(self, orders_data: List[Dict[str, Any]]) -> List['Order']:
+        """
+        Функция создания заказов вместе с позициями в одной транзакции.
+        Заказы и позиции вставляются пакетно (bulk_create), итоговая сумма
+        каждого заказа рассчитывается один раз до вставки.
+
+        :param orders_data: данные заказов; ключ 'order_items' - список позиций
+                            вида {'menu_item': объект блюда, 'quantity': количество}.
+        :return: список созданных заказов.
+        """
+        orders: List[Order] = []
+        lines: List[OrderItem] = []
+        for order_data in orders_data:
+            order_data = dict(order_data)
+            items_data = order_data.pop('order_items', [])
+            order = self.model(**order_data)
+            order_lines = [
+                OrderItem(
+                    order=order,
+                    menu_item=item_data['menu_item'],
+                    quantity=item_data['quantity'],
+                    price=item_data['menu_item'].price * item_data['quantity'],
+                )
+                for item_data in items_data
+            ]
+            order.total_price = sum((line.price for line in order_lines), Decimal('0'))
+            orders.append(order)
+            lines.extend(order_lines)
+
+        with transaction.atomic(using=self.db):
+            self.bulk_create(orders)
+            # id заказов уже известны после вставки, связь позиций с заказом подставляется по объекту
+            OrderItem.objects.using(self.db).bulk_create(lines)
+            RevenueRollup.add_orders([order for order in orders if order.status == 'paid'])
+            for order in orders:
+                events.publish_on_commit(events.ORDER_CREATED, events.order_data(order))
+        return orders
+
+    def set_status(self, status: str, ids: Optional[Iterable[int]] = None,
+                   sources: Optional[Tuple[str, ...]] = None) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Функция смены статуса заказов набора одним UPDATE (без загрузки объектов заказов).
+        Без ids меняется статус всех заказов набора, для которых переход допустим
+        (Order.STATUS_TRANSITIONS); с ids - статус всех перечисленных заказов или ни одного.
+        Агрегаты выручки изменяются по оплаченным заказам, события публикуются после фиксации.
+
+        :param status: новый статус.
+        :param ids: id заказов, статус которых меняется только вместе.
+        :param sources: статусы, из которых допустим переход (по умолчанию - по STATUS_TRANSITIONS).
+        :return: измененные и отклоненные заказы (словари id, стола и статуса до изменения;
+                 у несуществующих заказов статус None).
+        """
+        sources = sources or self.model.previous_statuses(status)
+        fields = ('id', 'table_number', 'status', 'created_at', 'total_price')
+        with transaction.atomic(using=self.db):
+            if ids is None:
+                # заказы с другими статусами не читаются (например, вся история стола)
+                rows = list(self.filter(status__in=sources).select_for_update().order_by('id').values(*fields))
+                rejected: List[Dict[str, Any]] = []
+            else:
+                ids = set(ids)
+                rows = list(self.filter(pk__in=ids).select_for_update().order_by('id').values(*fields))
+                rejected = [row for row in rows if row['status'] not in sources]
+                rejected += [{'id': order_id, 'status': None}
+                             for order_id in sorted(ids - {row['id'] for row in rows})]
+            if rejected or not rows:
+                return [], rejected
+
+            self.model.objects.using(self.db).filter(
+                pk__in=[row['id'] for row in rows], status__in=sources,
+            ).update(status=status, updated_at=timezone.now())
+            if status == 'paid':
+                RevenueRollup.add_totals((row['created_at'], row['table_number'], row['total_price'])
+                                         for row in rows)
+            for row in rows:
+                events.publish_on_commit(events.ORDER_STATUS_CHANGED, {
+                    'order': row['id'], 'table_number': row['table_number'], 'status': status,
+                    'previous_status': row['status'],
+                })
+        return rows, rejected
+
+
 class Order(models.Model):
     STATUS_CHOICES: List[tuple] = [
         ('pending', 'В ожидании'),
         ('ready', 'Готово'),
         ('paid', 'Оплачено'),
     ]
+    # допустимые переходы статуса (в ожидании -> готово -> оплачено) для API смены статуса
+    STATUS_TRANSITIONS: Dict[str, Tuple[str, ...]] = {
+        'pending': ('ready',),
+        'ready': ('paid',),
+        'paid': (),
+    }
+    # статусы неоплаченных (открытых) заказов стола
+    OPEN_STATUSES: Tuple[str, ...] = ('pending', 'ready')
 
     table_number: int = models.PositiveIntegerField()
     items: QuerySet[MenuItem] = models.ManyToManyField(MenuItem, through='OrderItem')
@@ -34,13 +185,141 @@ class Order(models.Model):
     created_at: datetime = models.DateTimeField(auto_now_add=True)
     updated_at: datetime = models.DateTimeField(auto_now=True)
 
-    def calculate_total(self):
-        return sum(item.price for item in self.order_items.all()) if self.pk else 0
+    objects: OrderQuerySet = OrderQuerySet.as_manager()
+
+    class Meta:
+        # индексы под реальные запросы: списки заказов фильтруются по статусу и/или столу,
+        # по диапазону дат и выдаются по (created_at, id); id входит в каждый индекс SQLite (rowid)
+        indexes: List[models.Index] = [
+            models.Index(fields=['created_at'], name='order_created_idx'),
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+            models.Index(fields=['table_number', 'created_at'], name='order_table_created_idx'),
+        ]
+
+    def calculate_total(self) -> Decimal:
+        """
+        Функция расчета итоговой суммы заказа по его позициям (одним агрегирующим запросом).
+
+        :return: сумма цен всех позиций заказа.
+        """
+        if not self.pk:
+            return Decimal('0')
+        return self.order_items.aggregate(total=Sum('price'))['total'] or Decimal('0')
+
+    @classmethod
+    def previous_statuses(cls, status: str) -> Tuple[str, ...]:
+        """
+        Функция получения статусов, из которых допустим переход в заданный статус.
+
+        :param status: новый статус.
+        :return: кортеж статусов.
+        """
+        return tuple(source for source, targets in cls.STATUS_TRANSITIONS.items() if status in targets)
+
+    # статус заказа на момент загрузки из БД - для учета перехода в/из "оплачено" в агрегатах выручки
+    _saved_status: Optional[str] = None
+    # номер стола на момент загрузки из БД - для события переноса заказа на другой стол
+    _saved_table_number: Optional[int] = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_status = instance.__dict__.get('status')
+        instance._saved_table_number = instance.__dict__.get('table_number')
+        return instance
+
+    @classmethod
+    def add_to_total(cls, order_id: int, delta: Decimal) -> None:
+        """
+        Функция атомарного изменения итоговой суммы заказа на величину delta.
+        Изменение выполняется одним UPDATE на стороне БД (total_price = total_price + delta),
+        без перечитывания позиций заказа. Для оплаченного заказа на ту же величину
+        изменяется агрегат выручки. Отметка изменения заказа (updated_at) обновляется и при нулевом
+        приращении: по ней проверяются кэшированные фрагменты страниц заказа (см. fragments).
+
+        :param order_id: id заказа.
+        :param delta: приращение итоговой суммы (может быть отрицательным).
+        :return:
+        """
+        if not delta:
+            cls.objects.filter(pk=order_id).update(updated_at=timezone.now())
+            return
+        with transaction.atomic():
+            cls.objects.filter(pk=order_id).update(
+                total_price=F('total_price') + delta,
+                updated_at=timezone.now(),
+            )
+            paid = cls.objects.filter(pk=order_id, status='paid').values_list('created_at', 'table_number').first()
+            if paid:
+                RevenueRollup.add(*paid, revenue=delta, orders_count=0)
 
     def save(self, *args, **kwargs):
-        if self.pk:
-            self.total_price = self.calculate_total()
-        return super().save(*args, **kwargs)
+        # итоговая сумма поддерживается приращениями от позиций заказа (OrderItem),
+        # поэтому обычное сохранение заказа не перезаписывает её значением из памяти
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'total_price'
+            ]
+
+        # агрегаты выручки затрагивает только заказ, оплаченный до или после сохранения
+        adding = self._state.adding
+        if self.status != 'paid' and (adding or self._saved_status not in ('paid', None)):
+            result = super().save(*args, **kwargs)
+            self.publish_saved(adding)
+            return result
+
+        with transaction.atomic():
+            previous: Optional[tuple] = None
+            if not adding:
+                previous = Order.objects.filter(pk=self.pk).values_list(
+                    'status', 'table_number', 'total_price').first()
+            result = super().save(*args, **kwargs)
+
+            # перенос заказа в агрегатах выручки при оплате, отмене оплаты или смене стола
+            was_paid = previous is not None and previous[0] == 'paid'
+            unchanged = was_paid and self.status == 'paid' and previous[1] == self.table_number
+            if was_paid and not unchanged:
+                RevenueRollup.add(self.created_at, previous[1], revenue=-previous[2], orders_count=-1)
+            if self.status == 'paid' and (adding or previous is not None) and not unchanged:
+                total_price = self.total_price if adding else previous[2]
+                RevenueRollup.add(self.created_at, self.table_number, revenue=total_price, orders_count=1)
+            self.publish_saved(adding)
+        return result
+
+    def publish_saved(self, adding: bool) -> None:
+        """
+        Функция публикации события сохранения заказа (после фиксации транзакции)
+        и запоминания сохраненных статуса и стола. Вызывается после записи заказа в БД:
+        событие создания содержит id заказа.
+
+        :param adding: заказ создается.
+        :return:
+        """
+        data = events.order_data(self)
+        if not adding and self._saved_table_number not in (None, self.table_number):
+            # заказ уходит со стола - событие получают и подписчики прежнего стола
+            data['previous_table_number'] = self._saved_table_number
+        if adding:
+            events.publish_on_commit(events.ORDER_CREATED, data)
+        elif self._saved_status is not None and self._saved_status != self.status:
+            events.publish_on_commit(events.ORDER_STATUS_CHANGED, {**data, 'previous_status': self._saved_status})
+        else:
+            events.publish_on_commit(events.ORDER_UPDATED, data)
+        self._saved_status = self.status
+        self._saved_table_number = self.table_number
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            paid = Order.objects.filter(pk=self.pk, status='paid').values_list(
+                'created_at', 'table_number', 'total_price').first()
+            data = events.order_data(self)
+            result = super().delete(*args, **kwargs)
+            if paid:
+                RevenueRollup.add(paid[0], paid[1], revenue=-paid[2], orders_count=-1)
+            events.publish_on_commit(events.ORDER_DELETED, data)
+        conditional.touch_orders_deleted()
+        return result
 
     def __str__(self):
         return f"Order #{self.id} - Table {self.table_number}"
@@ -52,10 +331,282 @@ class OrderItem(models.Model):
     quantity: int = models.PositiveIntegerField(default=1)
     price: float = models.DecimalField(max_digits=8, decimal_places=2)
 
+    # заказ и цена позиции на момент загрузки из БД - база для расчета приращения итоговой суммы
+    _saved_order_id: Optional[int] = None
+    _saved_price: Optional[Decimal] = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_order_id = instance.__dict__.get('order_id')
+        instance._saved_price = instance.__dict__.get('price')
+        return instance
+
     def save(self, *args, **kwargs):
-        self.price = self.menu_item.price * self.quantity
-        super().save(*args, **kwargs)
-        self.order.save()
+        # цена блюда берется из кэша меню; блюдо загружается из БД, только если его нет в кэше
+        price: Optional[Decimal] = menu_cache.get_price(self.menu_item_id)
+        if price is None:
+            price = MenuItem._meta.get_field('price').to_python(self.menu_item.price)
+        self.price = price * self.quantity
+        with transaction.atomic():
+            adding = self._state.adding
+            if adding:
+                saved_order_id, saved_price = self.order_id, Decimal('0')
+            elif self._saved_price is None:
+                saved_order_id, saved_price = OrderItem.objects.filter(pk=self.pk).values_list(
+                    'order_id', 'price').get()
+            else:
+                saved_order_id, saved_price = self._saved_order_id, self._saved_price
+            super().save(*args, **kwargs)
+
+            # перенос итоговой суммы приращениями вместо полного пересчета заказа
+            if saved_order_id != self.order_id:
+                Order.add_to_total(saved_order_id, -saved_price)
+                saved_price = Decimal('0')
+            Order.add_to_total(self.order_id, self.price - saved_price)
+            if adding or saved_order_id != self.order_id:
+                events.publish_on_commit(events.LINE_ADDED, self.event_data)
+        self._saved_order_id, self._saved_price = self.order_id, self.price
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            line_id = self.pk
+            result = super().delete(*args, **kwargs)
+            Order.add_to_total(self.order_id, -self.price)
+            events.publish_on_commit(events.LINE_DELETED, lambda: {**self.event_data(), 'line': line_id})
+        return result
+
+    def event_data(self) -> Dict[str, Any]:
+        """
+        Функция данных события позиции заказа (со столом и статусом заказа для фильтров подписчиков).
+        Вызывается после фиксации транзакции.
+
+        :return: словарь данных события.
+        """
+        # заказ обычно уже загружен (добавление позиции к заказу), иначе читаются только стол и статус
+        if OrderItem.order.is_cached(self):
+            data = events.order_data(self.order)
+        else:
+            order = Order.objects.filter(pk=self.order_id).values('table_number', 'status').first()
+            data = {'order': self.order_id, **(order or {})}
+        return {**data, 'line': self.pk, 'menu_item': self.menu_item_id, 'quantity': self.quantity,
+                'price': str(self.price)}
 
     def __str__(self):
         return f"{self.quantity}x {self.menu_item.name} for Order #{self.order.id}"
+
+
+class RevenueRollup(models.Model):
+    """
+    Агрегат выручки оплаченных заказов за один час работы одного стола.
+
+    Поддерживается приращениями при переходе заказа в статус "оплачено" и из него
+    (см. Order.save, Order.add_to_total), полностью пересчитывается командой rebuildrevenue.
+    Заказ относится к часу своего создания (в часовом поясе TIME_ZONE).
+    """
+
+    date: datetime = models.DateField(verbose_name='Дата')
+    hour: int = models.PositiveSmallIntegerField(verbose_name='Час')
+    table_number: int = models.PositiveIntegerField(verbose_name='Номер стола')
+    revenue: float = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Выручка')
+    orders_count: int = models.IntegerField(default=0, verbose_name='Количество заказов')
+
+    class Meta:
+        verbose_name: str = 'Выручка за час'
+        verbose_name_plural: str = 'Выручка по часам'
+        constraints: List[models.BaseConstraint] = [
+            models.UniqueConstraint(fields=['date', 'hour', 'table_number'], name='unique_revenue_rollup_bucket'),
+        ]
+
+    @staticmethod
+    def bucket(created_at: datetime, table_number: int) -> Dict[str, Any]:
+        """
+        Функция получения ключа агрегата для заказа.
+
+        :param created_at: дата создания заказа.
+        :param table_number: номер стола.
+        :return: словарь полей ключа (дата, час, стол).
+        """
+        local = timezone.localtime(created_at)
+        return {'date': local.date(), 'hour': local.hour, 'table_number': table_number}
+
+    @classmethod
+    def add(cls, created_at: datetime, table_number: int, revenue: Decimal, orders_count: int) -> None:
+        """
+        Функция изменения агрегата выручки заказа на заданные приращения.
+
+        :param created_at: дата создания заказа.
+        :param table_number: номер стола.
+        :param revenue: приращение выручки.
+        :param orders_count: приращение количества заказов.
+        :return:
+        """
+        cls._add_to_bucket(cls.bucket(created_at, table_number), revenue, orders_count)
+
+    @classmethod
+    def add_orders(cls, orders: List[Order], sign: int = 1) -> None:
+        """
+        Функция учета (sign=1) или исключения (sign=-1) набора оплаченных заказов в агрегатах:
+        заказы группируются по ключу агрегата, на каждый ключ выполняется одно изменение.
+
+        :param orders: заказы с заполненными created_at, table_number и total_price.
+        :param sign: направление изменения.
+        :return:
+        """
+        cls.add_totals(((order.created_at, order.table_number, order.total_price) for order in orders), sign)
+
+    @classmethod
+    def add_totals(cls, totals: Iterable[Tuple[datetime, int, Decimal]], sign: int = 1) -> None:
+        """
+        Функция учета (sign=1) или исключения (sign=-1) оплаченных заказов в агрегатах
+        по их дате создания, номеру стола и итоговой сумме (без объектов заказов).
+
+        :param totals: кортежи (created_at, table_number, total_price) заказов.
+        :param sign: направление изменения.
+        :return:
+        """
+        buckets: Dict[tuple, tuple] = {}
+        for created_at, table_number, total_price in totals:
+            key = tuple(cls.bucket(created_at, table_number).items())
+            revenue, orders_count = buckets.get(key, (Decimal('0'), 0))
+            buckets[key] = (revenue + total_price, orders_count + 1)
+        for key, (revenue, orders_count) in buckets.items():
+            cls._add_to_bucket(dict(key), sign * revenue, sign * orders_count)
+
+    @classmethod
+    def _add_to_bucket(cls, key: Dict[str, Any], revenue: Decimal, orders_count: int) -> None:
+        """
+        Функция атомарного изменения одного агрегата (UPDATE с приращением, при отсутствии - INSERT).
+
+        :param key: поля ключа агрегата.
+        :param revenue: приращение выручки.
+        :param orders_count: приращение количества заказов.
+        :return:
+        """
+        values = {'revenue': F('revenue') + revenue, 'orders_count': F('orders_count') + orders_count}
+        if cls.objects.filter(**key).update(**values):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(**key, revenue=revenue, orders_count=orders_count)
+        except IntegrityError:
+            # агрегат успел создать параллельный запрос
+            cls.objects.filter(**key).update(**values)
+
+    @property
+    def average_check(self) -> Decimal:
+        """Средний чек агрегата."""
+        return self.revenue / self.orders_count if self.orders_count else Decimal('0')
+
+    def __str__(self):
+        return f"{self.date} {self.hour:02d}:00 - Table {self.table_number}: {self.revenue}₽"
+
+
+class ArchivedOrder(models.Model):
+    """
+    Архивный (оплаченный и давно закрытый) заказ вместе с позициями (см. app.archive, команда archiveorders).
+
+    Позиции хранятся компактно в одном поле JSON: [[id, id блюда, название блюда, количество, сумма], ...];
+    id заказа и позиций сохраняются прежними. Агрегаты выручки при архивировании не меняются,
+    выгрузки и пересчет выручки читают архив вместе с рабочими таблицами.
+    """
+
+    id: int = models.BigIntegerField(primary_key=True)
+    table_number: int = models.PositiveIntegerField(verbose_name='Номер стола')
+    status: str = models.CharField(max_length=10, default='paid', verbose_name='Статус')
+    total_price: float = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Итоговая сумма')
+    created_at: datetime = models.DateTimeField(verbose_name='Создан')
+    updated_at: datetime = models.DateTimeField(verbose_name='Изменен')
+    archived_at: datetime = models.DateTimeField(verbose_name='Перенесен в архив')
+    lines: list = models.JSONField(default=list, verbose_name='Позиции')
+
+    class Meta:
+        verbose_name: str = 'Архивный заказ'
+        verbose_name_plural: str = 'Архивные заказы'
+        indexes: List[models.Index] = [
+            models.Index(fields=['created_at'], name='archived_created_idx'),
+            models.Index(fields=['table_number', 'created_at'], name='archived_table_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived order #{self.id} - Table {self.table_number}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Сохраненный ответ на изменяющий запрос с ключом идемпотентности (см. app.idempotency):
+    повтор запроса с тем же ключом получает этот ответ без повторной обработки.
+
+    Ключ уникален в пределах владельца (id пользователя, '' - без авторизации),
+    хэш запроса (метод, адрес, тело) не дает повторно использовать ключ для другого запроса.
+    Записи удаляются после expires_at командой purgeidempotency.
+    """
+
+    owner: str = models.CharField(max_length=150, default='', verbose_name='Владелец')
+    key: str = models.CharField(max_length=255, verbose_name='Ключ')
+    request_hash: str = models.CharField(max_length=64, verbose_name='Хэш запроса')
+    status_code: Optional[int] = models.PositiveSmallIntegerField(null=True, verbose_name='Код ответа')
+    content_type: str = models.CharField(max_length=100, default='', verbose_name='Тип ответа')
+    location: str = models.CharField(max_length=500, default='', verbose_name='Адрес перенаправления')
+    body: bytes = models.BinaryField(default=b'', verbose_name='Тело ответа')
+    created_at: datetime = models.DateTimeField(auto_now_add=True, verbose_name='Создан')
+    expires_at: datetime = models.DateTimeField(verbose_name='Хранится до')
+
+    class Meta:
+        verbose_name: str = 'Ключ идемпотентности'
+        verbose_name_plural: str = 'Ключи идемпотентности'
+        constraints: List[models.BaseConstraint] = [
+            models.UniqueConstraint(fields=['owner', 'key'], name='unique_idempotency_owner_key'),
+        ]
+        indexes: List[models.Index] = [
+            models.Index(fields=['expires_at'], name='idempotency_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"Idempotency key {self.key} ({self.status_code})"
+
+
+class Job(models.Model):
+    """
+    Фоновая задача (тяжелый отчет, выгрузка, пересчет): ставится в очередь запросом,
+    выполняется рабочими процессами команды runjobs (см. app.jobs), результат - файл в JOB_RESULTS_DIR
+    и/или краткий результат JSON.
+    """
+
+    STATUS_CHOICES: List[tuple] = [
+        ('queued', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Готово'),
+        ('failed', 'Ошибка'),
+    ]
+    FINISHED_STATUSES: Tuple[str, ...] = ('done', 'failed')
+
+    kind: str = models.CharField(max_length=30, verbose_name='Вид задачи')
+    params: dict = models.JSONField(default=dict, verbose_name='Параметры')
+    status: str = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued', verbose_name='Статус')
+    owner = models.ForeignKey('auth.User', null=True, blank=True, on_delete=models.SET_NULL,
+                              verbose_name='Пользователь')
+    worker: str = models.CharField(max_length=100, default='', verbose_name='Рабочий процесс')
+    attempts: int = models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')
+    result: Optional[dict] = models.JSONField(null=True, blank=True, verbose_name='Результат')
+    result_file: str = models.CharField(max_length=255, default='', verbose_name='Файл результата')
+    error: str = models.TextField(default='', blank=True, verbose_name='Ошибка')
+    created_at: datetime = models.DateTimeField(auto_now_add=True, verbose_name='Создана')
+    started_at: Optional[datetime] = models.DateTimeField(null=True, blank=True, verbose_name='Начата')
+    heartbeat_at: Optional[datetime] = models.DateTimeField(null=True, blank=True, verbose_name='Отметка выполнения')
+    finished_at: Optional[datetime] = models.DateTimeField(null=True, blank=True, verbose_name='Завершена')
+
+    class Meta:
+        verbose_name: str = 'Фоновая задача'
+        verbose_name_plural: str = 'Фоновые задачи'
+        indexes: List[models.Index] = [
+            models.Index(fields=['status', 'created_at'], name='job_status_created_idx'),
+            models.Index(fields=['owner', 'created_at'], name='job_owner_created_idx'),
+        ]
+
+    @property
+    def finished(self) -> bool:
+        return self.status in self.FINISHED_STATUSES
+
+    def __str__(self):
+        return f"Job #{self.id} {self.kind} ({self.status})"
@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from .metrics import registry
+
+# метка места вставки готового JSON в ответ (строка, которой нет в данных ответа)
+RAW_JSON_PLACEHOLDER: str = '\x00raw-json\x00'
+
+
+class RawJSON(bytes):
+    """Готовое (закодированное) JSON-представление значения: вставляется в ответ без повторного кодирования."""
+
+
+class OrderJSONRenderer(JSONRenderer):
+    """
+    JSON-отрисовка ответов API с готовыми JSON-представлениями заказов (RawJSON):
+    значения RawJSON и списки из них (в самом ответе или в полях ответа-словаря, например,
+    'results' страницы) вставляются в ответ как есть, остальное кодируется обычным образом.
+    """
+
+    def render(self, data: Any, accepted_media_type: Optional[str] = None,
+               renderer_context: Optional[Dict[str, Any]] = None) -> bytes:
+        chunks: List[bytes] = []
+
+        def placeholder(value: Any) -> Any:
+            if isinstance(value, RawJSON):
+                chunks.append(bytes(value))
+            elif isinstance(value, list) and value and all(isinstance(item, RawJSON) for item in value):
+                chunks.append(b'[' + b','.join(value) + b']')
+            else:
+                return value
+            return f'{RAW_JSON_PLACEHOLDER}{len(chunks) - 1}'
+
+        data = {key: placeholder(value) for key, value in data.items()} if isinstance(data, dict) else placeholder(data)
+        content = super().render(data, accepted_media_type, renderer_context)
+        for number, chunk in enumerate(chunks):
+            marker = super().render(f'{RAW_JSON_PLACEHOLDER}{number}')
+            content = content.replace(marker, chunk, 1)
+        return content
+
+
+def order_key(order: Dict[str, Any]) -> str:
+    """
+    Функция ключа кэша JSON-представления заказа. Любое изменение заказа или его позиций
+    обновляет updated_at (Order.save, Order.add_to_total, OrderQuerySet.set_status, recalculate_totals),
+    поэтому устаревшее представление не выдается и не требует явного сброса.
+
+    :param order: словарь заказа (id, updated_at).
+    :return: ключ кэша.
+    """
+    return f"order-json:{order['id']}:{order['updated_at'].timestamp():.6f}"
+
+
+def encode(item: Dict[str, Any]) -> bytes:
+    """
+    Функция кодирования представления заказа в JSON (как в ответе API).
+
+    :param item: словарь представления заказа.
+    :return: JSON-представление.
+    """
+    return OrderJSONRenderer().render(item)
+
+
+def split(order_rows: List[Dict[str, Any]], found: Dict[str, bytes]) -> List[Dict[str, Any]]:
+    """
+    Функция отбора заказов, представлений которых нет в кэше (с учетом счетчиков попаданий и промахов).
+
+    :param order_rows: словари заказов.
+    :param found: найденные в кэше представления по ключам.
+    :return: словари заказов, которых нет в кэше.
+    """
+    missing = [order for order in order_rows if order_key(order) not in found]
+    registry.increment('cafe_order_json_cache_hits_total', len(order_rows) - len(missing))
+    registry.increment('cafe_order_json_cache_misses_total', len(missing))
+    return missing
+
+
+def cached_orders(order_rows: List[Dict[str, Any]],
+                  serialize: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]) -> List[RawJSON]:
+    """
+    Функция JSON-представлений заказов с кэшированием: представления неизменившихся заказов
+    читаются из кэша одним запросом (get_many), позиции читаются и сериализуются
+    только для заказов, которых нет в кэше.
+
+    :param order_rows: словари заказов (id, updated_at и поля сериализатора).
+    :param serialize: функция сериализации заказов (OrderReadSerializer.serialize).
+    :return: JSON-представления в порядке заказов.
+    """
+    keys = [order_key(order) for order in order_rows]
+    found: Dict[str, bytes] = cache.get_many(keys)
+    missing = split(order_rows, found)
+    if missing:
+        encoded = {order_key(order): encode(item) for order, item in zip(missing, serialize(missing))}
+        cache.set_many(encoded, settings.ORDER_JSON_CACHE_TIMEOUT)
+        found.update(encoded)
+    return [RawJSON(found[key]) for key in keys]
+
+
+async def acached_orders(order_rows: List[Dict[str, Any]],
+                         aserialize: Callable[[List[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]]
+                         ) -> List[RawJSON]:
+    """
+    Функция JSON-представлений заказов с кэшированием (асинхронная, для представлений ASGI).
+
+    :param order_rows: словари заказов (id, updated_at и поля сериализатора).
+    :param aserialize: функция сериализации заказов (OrderReadSerializer.aserialize).
+    :return: JSON-представления в порядке заказов.
+    """
+    keys = [order_key(order) for order in order_rows]
+    found: Dict[str, bytes] = await cache.aget_many(keys)
+    missing = split(order_rows, found)
+    if missing:
+        encoded = {order_key(order): encode(item) for order, item in zip(missing, await aserialize(missing))}
+        await cache.aset_many(encoded, settings.ORDER_JSON_CACHE_TIMEOUT)
+        found.update(encoded)
+    return [RawJSON(found[key]) for key in keys]
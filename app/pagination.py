@@ -0,0 +1,207 @@
+import base64
+import binascii
+from collections import OrderedDict
+from datetime import datetime
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.query import QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+from typing import Any, Dict, List, Optional, Tuple
+
+# порядок выдачи заказов: от новых к старым, id - для однозначности при равном времени
+KEYSET_ORDERING: Tuple[str, str] = ('-created_at', '-id')
+
+
+def encode_cursor(created_at: datetime, pk: int) -> str:
+    """
+    Функция кодирования курсора (позиции последнего показанного заказа).
+
+    :param created_at: дата создания последнего заказа на странице.
+    :param pk: id последнего заказа на странице.
+    :return: строка курсора, пригодная для адресной строки.
+    """
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """
+    Функция декодирования курсора.
+
+    :param cursor: строка курсора из адресной строки.
+    :return: пара (created_at, id) или None, если курсор пуст или поврежден.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        return None
+
+
+def seek(queryset: QuerySet, cursor: Optional[str]) -> QuerySet:
+    """
+    Функция отбора заказов, следующих за позицией курсора.
+    Условие (created_at, id) < (c, i) обслуживается индексом и не зависит
+    от номера страницы, в отличие от OFFSET.
+
+    :param queryset: исходный набор заказов.
+    :param cursor: строка курсора.
+    :return: набор заказов после позиции курсора, упорядоченный по KEYSET_ORDERING.
+    """
+    position = decode_cursor(cursor)
+    if position:
+        created_at, pk = position
+        # отдельное условие created_at <= c дает планировщику границу диапазона индекса
+        queryset = queryset.filter(Q(created_at__lte=created_at), Q(created_at__lt=created_at) | Q(id__lt=pk))
+    return queryset.order_by(*KEYSET_ORDERING)
+
+
+def keyset_page(queryset: QuerySet, cursor: Optional[str], page_size: int) -> Tuple[List, Optional[str]]:
+    """
+    Функция получения одной страницы заказов по курсору.
+    Выбирается page_size + 1 строка, чтобы без COUNT(*) узнать, есть ли следующая страница.
+
+    :param queryset: исходный набор заказов (объекты или values() с полями created_at и id).
+    :param cursor: строка курсора (None - первая страница).
+    :param page_size: размер страницы.
+    :return: список заказов страницы и курсор следующей страницы (None - страница последняя).
+    """
+    return split_page(list(seek(queryset, cursor)[:page_size + 1]), page_size)
+
+
+async def akeyset_page(queryset: QuerySet, cursor: Optional[str], page_size: int) -> Tuple[List, Optional[str]]:
+    """
+    Функция получения одной страницы заказов по курсору (асинхронная, для представлений ASGI).
+
+    :param queryset: исходный набор заказов (объекты или values() с полями created_at и id).
+    :param cursor: строка курсора (None - первая страница).
+    :param page_size: размер страницы.
+    :return: список заказов страницы и курсор следующей страницы (None - страница последняя).
+    """
+    return split_page([row async for row in seek(queryset, cursor)[:page_size + 1]], page_size)
+
+
+def split_page(rows: List, page_size: int) -> Tuple[List, Optional[str]]:
+    """
+    Функция отделения лишней (page_size + 1) строки страницы и расчета курсора следующей страницы.
+
+    :param rows: выбранные строки (не больше page_size + 1).
+    :param page_size: размер страницы.
+    :return: список заказов страницы и курсор следующей страницы (None - страница последняя).
+    """
+    next_cursor: Optional[str] = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        # строки могут быть объектами заказов или словарями values() с полями created_at и id
+        if isinstance(last, dict):
+            next_cursor = encode_cursor(last['created_at'], last['id'])
+        else:
+            next_cursor = encode_cursor(last.created_at, last.pk)
+    return rows, next_cursor
+
+
+class OrderCursorPagination(BasePagination):
+    """
+    Постраничная выдача заказов API по курсору (created_at, id).
+
+    Параметры запроса:
+        cursor - курсор страницы (из ссылки 'next' предыдущей страницы);
+        page_size - размер страницы (не больше ORDERS_API_MAX_PAGE_SIZE);
+        count - при значении 1/true в ответ добавляется общее количество заказов (отдельный COUNT(*)).
+
+    Страница выбирается условием по индексу, без OFFSET и без COUNT(*),
+    поэтому стоимость любой страницы одинакова.
+    """
+
+    cursor_query_param: str = 'cursor'
+    page_size_query_param: str = 'page_size'
+    count_query_param: str = 'count'
+
+    def get_page_size(self, request: Request) -> int:
+        """
+        Функция определения размера страницы с учетом ограничения сверху.
+
+        :param request:
+        :return: размер страницы.
+        """
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=settings.ORDERS_API_MAX_PAGE_SIZE,
+            )
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request, view=None) -> List:
+        cursor = self.start(request)
+        self.count: Optional[int] = queryset.count() if self.count_requested(request) else None
+        rows, self.next_cursor = keyset_page(queryset, cursor, self.get_page_size(request))
+        return rows
+
+    async def apaginate_queryset(self, queryset: QuerySet, request: Request, view=None) -> List:
+        cursor = self.start(request)
+        self.count: Optional[int] = await queryset.acount() if self.count_requested(request) else None
+        rows, self.next_cursor = await akeyset_page(queryset, cursor, self.get_page_size(request))
+        return rows
+
+    def start(self, request: Request) -> Optional[str]:
+        """
+        Функция начала выдачи страницы: запоминает запрос и проверяет курсор.
+
+        :param request:
+        :return: строка курсора (None - первая страница).
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        cursor: Optional[str] = request.query_params.get(self.cursor_query_param)
+        if cursor and decode_cursor(cursor) is None:
+            raise NotFound('Неверный курсор.')
+        return cursor
+
+    def count_requested(self, request: Request) -> bool:
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true')
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.next_cursor:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data: List[Any]) -> Response:
+        payload: Dict[str, Any] = OrderedDict()
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['next'] = self.get_next_link()
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'example': 123, 'description': 'только при count=true'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view) -> List[Dict[str, Any]]:
+        return [
+            {'name': self.cursor_query_param, 'required': False, 'in': 'query',
+             'description': 'Курсор страницы', 'schema': {'type': 'string'}},
+            {'name': self.page_size_query_param, 'required': False, 'in': 'query',
+             'description': f'Размер страницы (не больше {settings.ORDERS_API_MAX_PAGE_SIZE})',
+             'schema': {'type': 'integer'}},
+            {'name': self.count_query_param, 'required': False, 'in': 'query',
+             'description': 'Добавить в ответ общее количество заказов', 'schema': {'type': 'boolean'}},
+        ]
@@ -0,0 +1,135 @@
+from datetime import date
+from decimal import Decimal
+from django.conf import settings
+from collections import defaultdict
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractHour, TruncDate
+from django.db.models.query import QuerySet
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from .models import RevenueRollup
+
+# уровни детализации отчета о выручке: ключ - поля группировки агрегатов
+REVENUE_GRANULARITIES: Dict[str, Tuple[str, ...]] = {
+    'day': ('date',),
+    'hour': ('date', 'hour'),
+    'table': ('table_number',),
+}
+
+
+def revenue_buckets(order_sets: Iterable[QuerySet]) -> Dict[Tuple[date, int, int], List]:
+    """
+    Функция группировки оплаченных заказов по агрегатам выручки (день, час, стол)
+    для полного пересчета (команда rebuildrevenue, миграция 0002).
+
+    :param order_sets: наборы оплаченных заказов (рабочая таблица, архив).
+    :return: словарь {(дата, час, стол): [выручка, количество заказов]}.
+    """
+    buckets: Dict[Tuple[date, int, int], List] = defaultdict(lambda: [Decimal('0'), 0])
+    for orders in order_sets:
+        grouped: QuerySet = (
+            orders
+            .annotate(day=TruncDate('created_at'), hour=ExtractHour('created_at'))
+            .values('day', 'hour', 'table_number')
+            .annotate(revenue=Sum('total_price'), orders_count=Count('id'))
+            .order_by()
+        )
+        for row in grouped:
+            bucket = buckets[row['day'], row['hour'], row['table_number']]
+            bucket[0] += row['revenue']
+            bucket[1] += row['orders_count']
+    return buckets
+
+
+def revenue_rollups(date_from: Optional[date] = None, date_to: Optional[date] = None) -> QuerySet:
+    """
+    Функция получения агрегатов выручки за диапазон дат (включительно).
+
+    :param date_from: первая дата диапазона (None - без ограничения).
+    :param date_to: последняя дата диапазона (None - без ограничения).
+    :return: набор непустых агрегатов выручки.
+    """
+    rollups: QuerySet[RevenueRollup] = RevenueRollup.objects.filter(orders_count__gt=0)
+    if date_from:
+        rollups = rollups.filter(date__gte=date_from)
+    if date_to:
+        rollups = rollups.filter(date__lte=date_to)
+    return rollups
+
+
+def is_heavy_report(date_from: Optional[date] = None, date_to: Optional[date] = None) -> bool:
+    """
+    Функция проверки тяжелого отчета: явно заданный период длиннее REVENUE_REPORT_SYNC_MAX_DAYS
+    строится фоновой задачей (app.jobs), а не в запросе. Отчет без границ периода (вся история)
+    строится в запросе: объем работы ограничен количеством агрегатов выручки.
+
+    :param date_from: первая дата диапазона.
+    :param date_to: последняя дата диапазона.
+    :return: True, если отчет нужно строить в фоне.
+    """
+    if date_from is None or date_to is None:
+        return False
+    return (date_to - date_from).days + 1 > settings.REVENUE_REPORT_SYNC_MAX_DAYS
+
+
+def with_average_check(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Функция дополнения строки отчета средним чеком.
+
+    :param row: строка отчета с полями revenue и orders_count.
+    :return: та же строка с полем average_check.
+    """
+    revenue: Decimal = (row['revenue'] or Decimal('0')).quantize(Decimal('0.01'))
+    orders_count: int = row['orders_count'] or 0
+    row['revenue'] = revenue
+    row['orders_count'] = orders_count
+    row['average_check'] = (revenue / orders_count).quantize(Decimal('0.01')) if orders_count else Decimal('0')
+    return row
+
+
+def revenue_report(date_from: Optional[date] = None, date_to: Optional[date] = None,
+                   granularity: str = 'day') -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Функция построения отчета о выручке по агрегатам.
+    Объем работы зависит от числа агрегатов в диапазоне (дни × часы × столы),
+    а не от количества заказов за всю историю.
+
+    :param date_from: первая дата диапазона.
+    :param date_to: последняя дата диапазона.
+    :param granularity: уровень детализации: 'day', 'hour' или 'table'.
+    :return: строки отчета и итог (выручка, количество заказов, средний чек).
+    """
+    rows, rollups = revenue_querysets(date_from, date_to, granularity)
+    totals = rollups.aggregate(revenue=Sum('revenue'), orders_count=Sum('orders_count'))
+    return [with_average_check(row) for row in rows], with_average_check(totals)
+
+
+async def arevenue_report(date_from: Optional[date] = None, date_to: Optional[date] = None,
+                          granularity: str = 'day') -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Функция построения отчета о выручке по агрегатам (асинхронная, для представлений ASGI).
+
+    :param date_from: первая дата диапазона.
+    :param date_to: последняя дата диапазона.
+    :param granularity: уровень детализации: 'day', 'hour' или 'table'.
+    :return: строки отчета и итог (выручка, количество заказов, средний чек).
+    """
+    rows, rollups = revenue_querysets(date_from, date_to, granularity)
+    totals = await rollups.aaggregate(revenue=Sum('revenue'), orders_count=Sum('orders_count'))
+    return [with_average_check(row) async for row in rows], with_average_check(totals)
+
+
+def revenue_querysets(date_from: Optional[date], date_to: Optional[date],
+                      granularity: str) -> Tuple[QuerySet, QuerySet]:
+    """
+    Функция получения запросов отчета о выручке: строки по уровню детализации и агрегаты диапазона.
+
+    :param date_from: первая дата диапазона.
+    :param date_to: последняя дата диапазона.
+    :param granularity: уровень детализации (неизвестный - 'day').
+    :return: набор строк отчета (values) и набор агрегатов диапазона (для итога).
+    """
+    fields = REVENUE_GRANULARITIES.get(granularity, REVENUE_GRANULARITIES['day'])
+    rollups = revenue_rollups(date_from, date_to)
+    rows = rollups.values(*fields).annotate(
+        revenue=Sum('revenue'), orders_count=Sum('orders_count')).order_by(*fields)
+    return rows, rollups
@@ -0,0 +1,225 @@
+import sqlite3
+import time
+from contextlib import closing, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpRequest, HttpResponse
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+# cookie закрепления чтений за основной БД после записи (чтение своих изменений при отставании реплики)
+PIN_COOKIE: str = 'db_pinned'
+
+# приложения, модели которых читаются из БД отчетов (пользователи и сессии - всегда из основной БД)
+REPORTING_APPS = ('app',)
+
+
+class RoutingState:
+    """Маршрутизация запросов к БД текущего HTTP-запроса (или блока reporting_reads)."""
+
+    reporting: bool
+    pinned: bool
+    wrote: bool
+
+    def __init__(self, pinned: bool = False) -> None:
+        # чтения направляются в БД отчетов
+        self.reporting = False
+        # чтения закреплены за основной БД (запрос или недавний запрос клиента изменял данные)
+        self.pinned = pinned
+        # запрос изменял данные
+        self.wrote = False
+
+
+_state: ContextVar[Optional[RoutingState]] = ContextVar('db_routing', default=None)
+
+
+@contextmanager
+def request_routing(pinned: bool = False) -> Iterator[RoutingState]:
+    """
+    Функция (контекстный менеджер) маршрутизации одного HTTP-запроса.
+
+    :param pinned: чтения закреплены за основной БД с начала запроса.
+    :return: состояние маршрутизации запроса.
+    """
+    state = RoutingState(pinned)
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+@contextmanager
+def reporting_reads() -> Iterator[None]:
+    """
+    Функция (контекстный менеджер) направления чтений в БД отчетов
+    (если чтения не закреплены за основной БД записью).
+
+    :return:
+    """
+    state = _state.get()
+    token = None
+    if state is None:
+        state = RoutingState()
+        token = _state.set(state)
+    previous, state.reporting = state.reporting, True
+    try:
+        yield
+    finally:
+        state.reporting = previous
+        if token is not None:
+            _state.reset(token)
+
+
+def reporting_view(view: Callable) -> Callable:
+    """
+    Декоратор представления (синхронного или асинхронного), читающего из БД отчетов.
+    Для представлений-классов: method_decorator(reporting_view, name='get').
+
+    :param view: функция представления.
+    :return: функция представления.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+            with reporting_reads():
+                return await view(request, *args, **kwargs)
+
+        return markcoroutinefunction(async_wrapper)
+
+    @wraps(view)
+    def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        with reporting_reads():
+            return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def reporting_iterator(iterable: Iterable[Any]) -> Iterator[Any]:
+    """
+    Функция чтения потокового ответа из БД отчетов: содержимое StreamingHttpResponse
+    формируется после выхода из представления, поэтому маршрутизация запроса
+    восстанавливается на время получения каждой части.
+
+    :param iterable: содержимое потокового ответа.
+    :return: итератор частей ответа.
+    """
+    state = _state.get() or RoutingState()
+    iterator = iter(iterable)
+    while True:
+        token = _state.set(state)
+        try:
+            with reporting_reads():
+                chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _state.reset(token)
+        yield chunk
+
+
+def reporting_alias() -> Optional[str]:
+    """
+    Функция псевдонима БД отчетов для текущего чтения.
+
+    :return: псевдоним БД отчетов или None (основная БД).
+    """
+    if not settings.REPORTING_READS:
+        return None
+    state = _state.get()
+    if state is None or not state.reporting or state.pinned:
+        return None
+    # внутри транзакции основной БД (в том числе в тестах) данные читаются из нее же
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return None
+    return settings.REPORTING_DB_ALIAS
+
+
+class ReportingRouter:
+    """
+    Маршрутизатор БД: запись - всегда в основную БД (default), чтение отчетов, выгрузок
+    и списков заказов (reporting_view / reporting_reads) - из БД отчетов (реплики для чтения,
+    REPORTING_DB_ALIAS). После записи чтения запроса закрепляются за основной БД,
+    а ReadYourWritesMiddleware закрепляет за ней и следующие запросы клиента на REPORTING_PIN_SECONDS.
+    """
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        if model._meta.app_label not in REPORTING_APPS:
+            return None
+        return reporting_alias()
+
+    def db_for_write(self, model, **hints) -> Optional[str]:
+        state = _state.get()
+        if state is not None:
+            state.wrote = state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> Optional[bool]:
+        # реплика содержит те же данные, что и основная БД
+        aliases = {DEFAULT_DB_ALIAS, settings.REPORTING_DB_ALIAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db: str, app_label: str, **hints) -> Optional[bool]:
+        # схема реплики копируется вместе с данными (sync_reporting)
+        if db == settings.REPORTING_DB_ALIAS and db != DEFAULT_DB_ALIAS:
+            return False
+        return None
+
+
+class ReadYourWritesMiddleware:
+    """
+    Промежуточный слой закрепления чтений за основной БД: после изменяющего запроса клиент
+    получает cookie PIN_COOKIE, и его запросы REPORTING_PIN_SECONDS (не меньше отставания реплики)
+    читают из основной БД - например, список заказов сразу после создания заказа.
+    """
+
+    sync_capable: bool = True
+    async_capable: bool = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if self.is_async:
+            return self.__acall__(request)
+        with request_routing(PIN_COOKIE in request.COOKIES) as state:
+            response = self.get_response(request)
+        return self.pin(response, state)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        with request_routing(PIN_COOKIE in request.COOKIES) as state:
+            response = await self.get_response(request)
+        return self.pin(response, state)
+
+    @staticmethod
+    def pin(response: HttpResponse, state: RoutingState) -> HttpResponse:
+        if state.wrote and settings.REPORTING_READS:
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPORTING_PIN_SECONDS, httponly=True,
+                                samesite='Lax')
+        return response
+
+
+def sync_reporting(using: Optional[str] = None, pages: int = -1) -> float:
+    """
+    Функция обновления БД отчетов копией основной БД (замена репликации при работе на SQLite).
+    Копия делается встроенным резервным копированием SQLite: согласованный снимок основной БД
+    без остановки записи (в режиме WAL запись не ждет копирования).
+
+    :param using: псевдоним БД отчетов (по умолчанию REPORTING_DB_ALIAS).
+    :param pages: количество страниц за шаг копирования (-1 - за один шаг).
+    :return: время копирования (сек.).
+    """
+    source = connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+    target = connections[using or settings.REPORTING_DB_ALIAS].settings_dict['NAME']
+    started = time.perf_counter()
+    if str(source) != str(target):
+        with closing(sqlite3.connect(source)) as source_db, closing(sqlite3.connect(target)) as target_db:
+            source_db.backup(target_db, pages=pages)
+    return time.perf_counter() - started
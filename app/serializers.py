@@ -1,7 +1,18 @@
+from collections import defaultdict
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from rest_framework import serializers
+from rest_framework.exceptions import NotFound
+from rest_framework.renderers import BaseRenderer, BrowsableAPIRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
 from django.db.models import Model
-from typing import List, Dict, Any
-from .models import Order, MenuItem, OrderItem
+from django.db.models.query import QuerySet
+from django.urls import reverse
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+from . import menu_cache
+from .models import Job, Order, MenuItem, OrderItem
+from .order_cache import OrderJSONRenderer, acached_orders, cached_orders
 
 
 class MenuItemSerializer(serializers.ModelSerializer):
@@ -36,6 +47,27 @@ class OrderItemSerializer(serializers.ModelSerializer):
         extra_kwargs: Dict[str, Dict[str, Any]] = {'menu_item': {'required': True}, 'quantity': {'min_value': 1}}
 
 
+class OrderItemCreateSerializer(OrderItemSerializer):
+    """
+    Сериализатор позиции создаваемого заказа.
+
+    Блюдо принимается как id без отдельного запроса к БД на каждую позицию:
+    существование блюд и их цены проверяются по кэшу меню (см. menu_cache).
+    """
+
+    menu_item = serializers.IntegerField(source='menu_item_id', min_value=1)
+
+
+class OrderBulkCreateSerializer(serializers.ListSerializer):
+    """
+    Сериализатор пакетного создания заказов.
+    Заказы и позиции всего пакета вставляются пакетно в одной транзакции.
+    """
+
+    def create(self, validated_data) -> List[Order]:
+        return Order.objects.create_with_items(validated_data)
+
+
 class OrderCreateSerializer(serializers.ModelSerializer):
     """
     Сериализатор создания заказа.
@@ -46,11 +78,32 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         items - вложенные позиции (блюда) заказа;
     """
 
-    items = OrderItemSerializer(many=True, source='order_items')
+    items = OrderItemCreateSerializer(many=True, source='order_items')
 
     class Meta:
         model = Order
         fields: List[str] = ['id', 'table_number', 'status', 'items']
+        list_serializer_class = OrderBulkCreateSerializer
+
+    def validate_items(self, items_data) -> List[Dict[str, Any]]:
+        """
+        Функция проверки блюд заказа по кэшу меню (без запросов к БД).
+
+        :param items_data: позиции заказа с id блюд.
+        :return: позиции заказа с объектами блюд.
+        """
+        ids = {item_data['menu_item_id'] for item_data in items_data}
+        menu_items: Dict[int, MenuItem] = menu_cache.get_menu_items(ids)
+
+        missing = sorted(ids - menu_items.keys())
+        if missing:
+            raise serializers.ValidationError(
+                f"Недопустимый первичный ключ {', '.join(map(str, missing))} - объект не существует."
+            )
+        return [
+            {'menu_item': menu_items[item_data['menu_item_id']], 'quantity': item_data['quantity']}
+            for item_data in items_data
+        ]
 
     def create(self, validated_data) -> Order:
         """
@@ -60,24 +113,8 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         :return: объект заказа.
         """
 
-        # извлечение данных об элементах (блюдах) заказа
-        items_data = validated_data.pop('order_items')
-        # создание объекта заказа
-        order = Order.objects.create(**validated_data)
-
-        for item_data in items_data:
-            menu_item = item_data['menu_item']
-            # наполнение заказа элементами (блюдами) заказа
-            OrderItem.objects.create(
-                order=order,
-                menu_item=menu_item,
-                quantity=item_data['quantity'],
-                price=menu_item.price * item_data['quantity']
-            )
-        # расчет итоговой цены заказа
-        order.total_price = order.calculate_total()
-        order.save()
-        return order
+        # создание заказа и его позиций в одной транзакции с однократным расчетом итоговой цены
+        return Order.objects.create_with_items([validated_data])[0]
 
 
 class OrderListSerializer(serializers.ModelSerializer):
@@ -96,3 +133,317 @@ class OrderListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields: List[str] = ['id', 'table_number', 'status', 'total_price', 'items']
+
+
+class OrderStatusSerializer(serializers.Serializer):
+    """
+    Сериализатор смены статуса заказа.
+
+    Поля:
+        status - новый статус заказа (переходы: pending -> ready -> paid).
+    """
+
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
+
+
+class OrderBulkStatusSerializer(OrderStatusSerializer):
+    """
+    Сериализатор пакетной смены статуса заказов.
+
+    Поля:
+        ids - id заказов (статус меняется у всех или ни у одного);
+        table - номер стола (статус меняется у всех заказов стола, для которых переход допустим);
+        status - новый статус заказов.
+    Передается ровно одно из полей ids и table.
+    """
+
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_empty=False)
+    table = serializers.IntegerField(min_value=0, required=False)
+
+    def validate_ids(self, ids: List[int]) -> List[int]:
+        if len(ids) > settings.ORDERS_BULK_MAX_SIZE:
+            raise serializers.ValidationError(f'Не более {settings.ORDERS_BULK_MAX_SIZE} заказов за запрос.')
+        return ids
+
+    def validate(self, attrs: Dict[str, Any]) -> Dict[str, Any]:
+        if ('ids' in attrs) == ('table' in attrs):
+            raise serializers.ValidationError('Укажите список заказов (ids) или номер стола (table).')
+        return attrs
+
+
+class BillOrderSerializer(serializers.Serializer):
+    """Сериализатор неоплаченного заказа в счете стола."""
+
+    id = serializers.IntegerField()
+    status = serializers.CharField()
+    total_price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    created_at = serializers.DateTimeField()
+
+
+class BillLineSerializer(serializers.Serializer):
+    """
+    Сериализатор строки счета стола (позиции всех заказов стола по одному блюду).
+
+    Поля:
+        menu_item - id блюда;
+        name - название блюда;
+        quantity - количество;
+        amount - сумма.
+    """
+
+    menu_item = serializers.IntegerField()
+    name = serializers.CharField()
+    quantity = serializers.IntegerField()
+    amount = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class TableBillSerializer(serializers.Serializer):
+    """
+    Сериализатор счета стола.
+
+    Поля:
+        table_number - номер стола;
+        orders - неоплаченные заказы стола;
+        lines - строки счета по блюдам;
+        total - итоговая сумма счета.
+    """
+
+    table_number = serializers.IntegerField()
+    orders = BillOrderSerializer(many=True)
+    lines = BillLineSerializer(many=True)
+    total = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class FloorTableSerializer(serializers.Serializer):
+    """
+    Сериализатор открытого стола в обзоре зала.
+
+    Поля:
+        table_number - номер стола;
+        orders_count - количество неоплаченных заказов;
+        total - текущая сумма стола;
+        opened_at - время первого неоплаченного заказа.
+    """
+
+    table_number = serializers.IntegerField()
+    orders_count = serializers.IntegerField()
+    total = serializers.DecimalField(max_digits=14, decimal_places=2)
+    opened_at = serializers.DateTimeField()
+
+
+class TableCloseSerializer(serializers.Serializer):
+    """
+    Сериализатор расчета стола.
+
+    Поля:
+        total - сумма счета, показанная гостю (необязательно): при расхождении стол не закрывается.
+    """
+
+    total = serializers.DecimalField(max_digits=14, decimal_places=2, required=False)
+
+
+class RevenueRowSerializer(serializers.Serializer):
+    """
+    Сериализатор строки (или итога) отчета о выручке.
+
+    Поля группировки зависят от детализации отчета (date / date, hour / table_number),
+    отсутствующие в строке поля не выводятся.
+    """
+
+    date = serializers.DateField(required=False)
+    hour = serializers.IntegerField(required=False)
+    table_number = serializers.IntegerField(required=False)
+    orders_count = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+    average_check = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class RevenueReportSerializer(serializers.Serializer):
+    """
+    Сериализатор отчета о выручке API.
+
+    Поля:
+        granularity - уровень детализации (day, hour, table);
+        rows - строки отчета;
+        totals - итог за диапазон дат.
+    """
+
+    granularity = serializers.CharField()
+    rows = RevenueRowSerializer(many=True)
+    totals = RevenueRowSerializer()
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор фоновой задачи (состояние выполнения и результат).
+
+    Поля:
+        result_url - адрес файла результата (только у выполненной задачи с файлом).
+    """
+
+    result_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model: Model = Job
+        fields: List[str] = ['id', 'kind', 'params', 'status', 'attempts', 'result', 'error', 'result_url',
+                             'created_at', 'started_at', 'finished_at']
+        read_only_fields: List[str] = fields
+
+    def get_result_url(self, job: Job) -> Optional[str]:
+        if job.status != 'done' or not job.result_file:
+            return None
+        url = reverse('job-result', args=[job.pk])
+        request: Optional[Request] = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+class JobCreateSerializer(serializers.Serializer):
+    """
+    Сериализатор постановки фоновой задачи в очередь.
+
+    Поля:
+        kind - вид задачи (app.jobs.JOB_KINDS);
+        params - параметры задачи (проверяются app.jobs.validate_params).
+    """
+
+    kind = serializers.CharField(max_length=30)
+    params = serializers.DictField(required=False, default=dict)
+
+
+# поля DRF, используемые быстрым сериализатором для форматирования сумм точно как OrderListSerializer
+_TOTAL_PRICE_FIELD = OrderListSerializer().fields['total_price']
+_LINE_PRICE_FIELD = OrderItemSerializer().fields['price']
+
+
+class OrderReadSerializer:
+    """
+    Быстрый сериализатор чтения заказов (только для выдачи).
+
+    Формирует тот же JSON, что и OrderListSerializer, но из словарей values():
+    страница заказов и все их позиции читаются двумя запросами, без создания
+    объектов моделей и без вложенных ModelSerializer на каждую позицию.
+    """
+
+    ORDER_FIELDS: Tuple[str, ...] = ('id', 'table_number', 'status', 'total_price')
+    LINE_FIELDS: Tuple[str, ...] = ('id', 'order_id', 'menu_item_id', 'quantity', 'price')
+
+    @classmethod
+    def order_values(cls, queryset: QuerySet) -> QuerySet:
+        """
+        Функция получения набора заказов в виде словарей (с полями для курсора страниц
+        и версии заказа для кэша JSON-представлений).
+
+        :param queryset: набор заказов.
+        :return: набор словарей заказов.
+        """
+        return queryset.values(*cls.ORDER_FIELDS, 'created_at', 'updated_at')
+
+    @classmethod
+    def line_values(cls, order_ids: Iterable[int]) -> QuerySet:
+        """
+        Функция получения позиций заказов в виде словарей (одним запросом).
+
+        :param order_ids: id заказов.
+        :return: набор словарей позиций, упорядоченный по id.
+        """
+        return OrderItem.objects.filter(order_id__in=list(order_ids)).values(*cls.LINE_FIELDS).order_by('id')
+
+    @classmethod
+    def build(cls, order_rows: Iterable[Dict[str, Any]], line_rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Функция сборки JSON-представления заказов из строк заказов и позиций.
+
+        :param order_rows: словари заказов.
+        :param line_rows: словари позиций этих заказов.
+        :return: список словарей в формате OrderListSerializer.
+        """
+        items: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+        for line in line_rows:
+            items[line['order_id']].append({
+                'id': line['id'],
+                'menu_item': line['menu_item_id'],
+                'quantity': line['quantity'],
+                'price': _LINE_PRICE_FIELD.to_representation(line['price']),
+            })
+        return [
+            {
+                'id': order['id'],
+                'table_number': order['table_number'],
+                'status': order['status'],
+                'total_price': _TOTAL_PRICE_FIELD.to_representation(order['total_price']),
+                'items': items.get(order['id'], []),
+            }
+            for order in order_rows
+        ]
+
+    @classmethod
+    def serialize(cls, order_rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Функция сериализации страницы заказов (одним дополнительным запросом позиций).
+
+        :param order_rows: словари заказов (из order_values).
+        :return: список словарей в формате OrderListSerializer.
+        """
+        return cls.build(order_rows, cls.line_values(order['id'] for order in order_rows))
+
+    @classmethod
+    async def aserialize(cls, order_rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Функция сериализации страницы заказов (асинхронная, для представлений ASGI).
+
+        :param order_rows: словари заказов (из order_values).
+        :return: список словарей в формате OrderListSerializer.
+        """
+        line_rows = [line async for line in cls.line_values(order['id'] for order in order_rows)]
+        return cls.build(order_rows, line_rows)
+
+
+class OrderFastReadMixin:
+    """
+    Примесь ViewSet заказов: list и retrieve выдаются быстрым сериализатором OrderReadSerializer
+    через кэш JSON-представлений заказов (order_cache): после запроса заказов (id и версии)
+    позиции читаются и сериализуются только для изменившихся заказов.
+    """
+
+    renderer_classes: List[Type[BaseRenderer]] = [OrderJSONRenderer, BrowsableAPIRenderer]
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        queryset = OrderReadSerializer.order_values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(cached_orders(page, OrderReadSerializer.serialize))
+        return Response(cached_orders(list(queryset), OrderReadSerializer.serialize))
+
+    def retrieve(self, request: Request, *args, **kwargs) -> Response:
+        order_rows = list(self.order_lookup(kwargs))
+        if not order_rows:
+            raise NotFound()
+        return Response(cached_orders(order_rows, OrderReadSerializer.serialize)[0])
+
+    async def alist(self, request: Request, *args, **kwargs) -> Response:
+        queryset = OrderReadSerializer.order_values(self.filter_queryset(self.get_queryset()))
+        if self.paginator is None:
+            return Response(await acached_orders([order async for order in queryset], OrderReadSerializer.aserialize))
+        # постраничная выдача - курсорная (OrderCursorPagination с асинхронным apaginate_queryset)
+        page = await self.paginator.apaginate_queryset(queryset, request, view=self)
+        return self.get_paginated_response(await acached_orders(page, OrderReadSerializer.aserialize))
+
+    async def aretrieve(self, request: Request, *args, **kwargs) -> Response:
+        order_rows = [order async for order in self.order_lookup(kwargs)]
+        if not order_rows:
+            raise NotFound()
+        return Response((await acached_orders(order_rows, OrderReadSerializer.aserialize))[0])
+
+    def order_lookup(self, kwargs: Dict[str, Any]) -> QuerySet:
+        """
+        Функция отбора заказа по параметру адреса (одна строка values()).
+
+        :param kwargs: параметры адреса.
+        :return: набор из не более чем одного словаря заказа.
+        """
+        lookup = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        queryset = OrderReadSerializer.order_values(self.filter_queryset(self.get_queryset()))
+        try:
+            return queryset.filter(**{self.lookup_field: lookup})[:1]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound()
@@ -0,0 +1,100 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, Min, Sum
+from django.db.models.query import QuerySet
+from typing import Any, Dict, List, Optional
+from .models import Order, OrderItem
+
+# точность сумм счета (суммы SQLite возвращаются без дробной части)
+CENTS = Decimal('0.01')
+
+
+def open_orders(table_number: int) -> QuerySet:
+    """
+    Функция получения неоплаченных заказов стола.
+
+    :param table_number: номер стола.
+    :return: набор заказов.
+    """
+    return Order.objects.filter(table_number=table_number, status__in=Order.OPEN_STATUSES)
+
+
+def open_lines(table_number: int) -> QuerySet:
+    """
+    Функция получения позиций неоплаченных заказов стола.
+
+    :param table_number: номер стола.
+    :return: набор позиций.
+    """
+    return OrderItem.objects.filter(order__table_number=table_number, order__status__in=Order.OPEN_STATUSES)
+
+
+def bill_lines(table_number: int) -> QuerySet:
+    """
+    Функция получения строк счета стола: позиции всех неоплаченных заказов стола,
+    сгруппированные по блюду (одним группирующим запросом).
+
+    :param table_number: номер стола.
+    :return: набор словарей (блюдо, название, количество, сумма), упорядоченный по названию блюда.
+    """
+    return (open_lines(table_number)
+            .values('menu_item_id', 'menu_item__name')
+            .annotate(quantity=Sum('quantity'), amount=Sum('price'))
+            .order_by('menu_item__name', 'menu_item_id'))
+
+
+def table_bill(table_number: int) -> Dict[str, Any]:
+    """
+    Функция счета стола: неоплаченные заказы, строки счета по блюдам и итоговая сумма.
+    Сумма считается по строкам счета, без загрузки объектов заказов и позиций.
+
+    :param table_number: номер стола.
+    :return: словарь счета (table_number, orders, lines, total).
+    """
+    orders = list(open_orders(table_number).order_by('created_at', 'id').values(
+        'id', 'status', 'total_price', 'created_at'))
+    lines = [
+        {'menu_item': line['menu_item_id'], 'name': line['menu_item__name'], 'quantity': line['quantity'],
+         'amount': line['amount'].quantize(CENTS)}
+        for line in bill_lines(table_number)
+    ] if orders else []
+    return {
+        'table_number': table_number,
+        'orders': orders,
+        'lines': lines,
+        'total': sum((line['amount'] for line in lines), Decimal('0')).quantize(CENTS),
+    }
+
+
+def close_table(table_number: int, expected_total: Optional[Decimal] = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    Функция расчета стола: все неоплаченные заказы стола (в том числе в ожидании)
+    оплачиваются в одной транзакции одним UPDATE (см. OrderQuerySet.set_status).
+
+    :param table_number: номер стола.
+    :param expected_total: сумма счета, показанная гостю (None - без проверки).
+    :return: оплаченные заказы или None, если сумма счета с тех пор изменилась.
+    """
+    with transaction.atomic():
+        if expected_total is not None:
+            total = open_lines(table_number).aggregate(total=Sum('price'))['total'] or Decimal('0')
+            if total != expected_total:
+                return None
+        changed, _ = open_orders(table_number).set_status('paid', sources=Order.OPEN_STATUSES)
+    return changed
+
+
+def floor_overview() -> List[Dict[str, Any]]:
+    """
+    Функция обзора зала: открытые столы с количеством неоплаченных заказов, текущей суммой
+    и временем первого заказа (одним агрегирующим запросом).
+
+    :return: список словарей (table_number, orders_count, total, opened_at) по номеру стола.
+    """
+    tables = list(Order.objects.filter(status__in=Order.OPEN_STATUSES)
+                  .values('table_number')
+                  .annotate(orders_count=Count('id'), total=Sum('total_price'), opened_at=Min('created_at'))
+                  .order_by('table_number'))
+    for table in tables:
+        table['total'] = table['total'].quantize(CENTS)
+    return tables
@@ -1,7 +1,46 @@
-from django.test import TestCase, Client
+import asyncio
+import json
+import os
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from django.apps import apps as django_apps
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.core.signals import request_finished, request_started
+from django.db import OperationalError, close_old_connections, connection, models
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractHour, TruncDate
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
 
-from .models import Order, MenuItem, OrderItem
+from .archive import archivable_orders, archive_cutoff
+from .bench import BENCH_SCENARIOS, BENCH_SKIPPED_ROUTES, check_thresholds, percentile, route_names
+from .exports import export_queryset
+from .filters import filter_orders
+from . import events, menu_cache
+from .forms import OrderForm, OrderItemForm
+from .jobs import JOB_KINDS, JobKind, requeue_stale, run_worker, submit_job
+from .menu_search import PREFIX_END, normalize, search_menu
+from .metrics import registry as metrics_registry
+from .models import ArchivedOrder, IdempotencyKey, Job, Order, MenuItem, OrderItem, RevenueRollup
+from .pagination import encode_cursor, seek
+from .reports import revenue_rollups
+from .tables import close_table, floor_overview, table_bill
+from .routers import PIN_COOKIE, ReportingRouter, reporting_alias, reporting_reads, request_routing, sync_reporting
+from .transactions import retry_write
 
 items_dict = {
     "Кофе": 60.00,
@@ -105,6 +144,177 @@ class OrderViewsTest(TestCase):
         MenuItem.objects.all().delete()
 
 
+class OrderListPaginationTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.menu_item = MenuItem.objects.create(name="Суп", price=10.00)
+        self.orders = [Order.objects.create(table_number=number) for number in range(1, 6)]
+        for order in self.orders:
+            create_order_item(order, self.menu_item, 1)
+
+    @override_settings(ORDER_LIST_PAGE_SIZE=2)
+    def test_order_list_keyset_pages(self):
+        """Тест постраничной выдачи списка заказов по курсору без повторов и пропусков"""
+
+        seen = []
+        response = self.client.get(reverse('order_list'))
+        while True:
+            seen.extend(order.pk for order in response.context['orders'])
+            if not response.context['next_query']:
+                break
+            response = self.client.get(reverse('order_list') + '?' + response.context['next_query'])
+
+        self.assertEqual(seen, [order.pk for order in reversed(self.orders)])
+
+    def test_order_list_query_count_is_fixed(self):
+        """Тест постоянного числа запросов независимо от количества заказов и позиций"""
+
+        with self.assertNumQueries(2):
+            self.client.get(reverse('order_list'))
+        for order in self.orders:
+            create_order_item(order, self.menu_item, 2)
+        with self.assertNumQueries(2):
+            self.client.get(reverse('order_list'))
+
+    def test_order_list_date_range(self):
+        """Тест фильтрации списка заказов по диапазону дат"""
+
+        old_order = self.orders[0]
+        Order.objects.filter(pk=old_order.pk).update(created_at=timezone.now() - timedelta(days=10))
+        today = timezone.localdate().isoformat()
+
+        response = self.client.get(reverse('order_list'), {'date_from': today, 'date_to': today})
+
+        self.assertNotIn(old_order, response.context['orders'])
+        self.assertEqual(len(response.context['orders']), 4)
+
+    def tearDown(self):
+        Order.objects.all().delete()
+        MenuItem.objects.all().delete()
+
+
+class OrderFragmentCacheTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.menu_item = MenuItem.objects.create(name="Суп", price=10.00)
+        self.order = Order.objects.create(table_number=3)
+        self.line = create_order_item(self.order, self.menu_item, 1)
+
+    def test_order_list_rows_cached(self):
+        """Тест выдачи строк неизменившихся заказов из кэша без подгрузки позиций"""
+
+        with self.assertNumQueries(2):
+            first = self.client.get(reverse('order_list'))
+        with self.assertNumQueries(1):
+            second = self.client.get(reverse('order_list'))
+
+        self.assertEqual(first.content, second.content)
+        self.assertContains(second, "<li>1 × Суп - 10,00 ₽</li>")
+
+    def test_line_changes_refresh_fragments(self):
+        """Тест обновления строки списка и состава заказа при добавлении и удалении позиций через страницы"""
+
+        self.client.get(reverse('order_list'))
+        self.client.get(reverse('order_detail', args=[self.order.pk]))
+
+        self.client.post(reverse('order_item_add', args=[self.order.pk]), {'menu_item': self.menu_item.pk,
+                                                                            'quantity': 2})
+        self.assertContains(self.client.get(reverse('order_list')), "<li>2 × Суп - 20,00 ₽</li>")
+        self.assertContains(self.client.get(reverse('order_detail', args=[self.order.pk])), "2 × Суп")
+
+        self.client.post(reverse('order_item_delete', args=[self.line.pk]))
+        self.assertNotContains(self.client.get(reverse('order_list')), "<li>1 × Суп - 10,00 ₽</li>")
+        self.assertNotContains(self.client.get(reverse('order_detail', args=[self.order.pk])), "1 × Суп")
+
+    def test_zero_price_line_bumps_updated_at(self):
+        """Тест обновления отметки изменения заказа при добавлении позиции с нулевой ценой"""
+
+        updated_at = Order.objects.get(pk=self.order.pk).updated_at
+        create_order_item(self.order, MenuItem.objects.create(name="Вода", price=0), 1)
+
+        self.assertGreater(Order.objects.get(pk=self.order.pk).updated_at, updated_at)
+        self.assertContains(self.client.get(reverse('order_list')), "Вода")
+
+    def test_menu_rename_refreshes_fragments(self):
+        """Тест обновления фрагментов при изменении названия блюда (по версии меню)"""
+
+        self.client.get(reverse('order_list'))
+        self.menu_item.name = "Борщ"
+        self.menu_item.save()
+
+        self.assertContains(self.client.get(reverse('order_list')), "<li>1 × Борщ - 10,00 ₽</li>")
+
+    def test_order_detail_lines_cached(self):
+        """Тест выдачи состава заказа из кэша и формы удаления позиции с CSRF-токеном вне фрагмента"""
+
+        client = Client(enforce_csrf_checks=True)
+        client.get(reverse('order_detail', args=[self.order.pk]))
+        with self.assertNumQueries(1):
+            response = client.get(reverse('order_detail', args=[self.order.pk]))
+
+        self.assertContains(response, f'formaction="{reverse("order_item_delete", kwargs={"pk": self.line.pk})}"')
+        self.assertContains(response, '<form id="order-item-delete" method="post"><input type="hidden" '
+                                      'name="csrfmiddlewaretoken"')
+
+    def tearDown(self):
+        Order.objects.all().delete()
+        MenuItem.objects.all().delete()
+
+
+class IdempotencyTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.menu_item = MenuItem.objects.create(name="Суп", price=10.00)
+        self.order = Order.objects.create(table_number=3)
+
+    def add_item(self, key, quantity=1):
+        return self.client.post(reverse('order_item_add', args=[self.order.pk]),
+                                {'menu_item': self.menu_item.pk, 'quantity': quantity, 'idempotency_key': key})
+
+    def test_form_retry_adds_line_once(self):
+        """Тест повторной отправки формы добавления блюда: сохраненный ответ без обращения к заказам"""
+
+        response = self.client.get(reverse('order_detail', args=[self.order.pk]))
+        key = re.search(r'name="idempotency_key" value="(\w+)"', response.content.decode()).group(1)
+
+        first = self.add_item(key)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.add_item(key)
+
+        self.assertEqual((second.status_code, second['Location']), (first.status_code, first['Location']))
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertFalse([query for query in queries if 'app_order' in query['sql']])
+        self.assertEqual(self.order.order_items.count(), 1)
+
+    def test_key_reused_for_other_request(self):
+        """Тест отказа (422) при повторном использовании ключа для другого запроса"""
+
+        self.add_item('tap-1')
+        self.assertEqual(self.add_item('tap-1', quantity=5).status_code, 422)
+        self.assertEqual(self.add_item('tap-2', quantity=5).status_code, 302)
+        self.assertEqual(self.order.order_items.count(), 2)
+
+    def test_purge_expired_keys(self):
+        """Тест удаления просроченных ключей и повторной обработки запроса с просроченным ключом"""
+
+        self.add_item('tap-1')
+        self.add_item('tap-2')
+        IdempotencyKey.objects.filter(key='tap-1').update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(self.add_item('tap-1').status_code, 302)
+        self.assertEqual(self.order.order_items.count(), 3)
+
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        out = StringIO()
+        call_command('purgeidempotency', '--batch-size', '1', stdout=out)
+        self.assertIn("Удалено просроченных ключей идемпотентности: 2", out.getvalue())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def tearDown(self):
+        Order.objects.all().delete()
+        MenuItem.objects.all().delete()
+
+
 class OrderUpdateTest(TestCase):
     def setUp(self):
         self.menu_item = MenuItem.objects.create(name="Суп", price=10.00)
@@ -131,6 +341,1117 @@ class OrderUpdateTest(TestCase):
         self.order.refresh_from_db()
         self.assertEqual(self.order.total_price, 30.00)
 
+    def test_order_delete_item_updates_total(self):
+        """Тест уменьшения итоговой суммы при удалении блюда из заказа"""
+
+        create_order_item(self.order, self.menu_item, 2)
+        order_item = create_order_item(self.order, self.menu_item, 1)
+
+        self.client.post(reverse('order_item_delete', kwargs={'pk': order_item.pk}))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_price, 20.00)
+
+    def test_order_status_change_does_not_recalculate(self):
+        """Тест изменения статуса без пересчета позиций заказа"""
+
+        create_order_item(self.order, self.menu_item, 2)
+        self.order.refresh_from_db()
+        form = OrderForm({'table_number': 3, 'status': 'ready'}, instance=self.order)
+        self.assertTrue(form.is_valid())
+
+        with self.assertNumQueries(1):
+            form.save()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'ready')
+        self.assertEqual(self.order.total_price, 20.00)
+
+    def tearDown(self):
+        Order.objects.all().delete()
+        MenuItem.objects.all().delete()
+
+
+class RecalculateTotalsCommandTest(TestCase):
+    def setUp(self):
+        self.menu_item = MenuItem.objects.create(name="Суп", price=10.00)
+        self.order = Order.objects.create(table_number=4)
+        create_order_item(self.order, self.menu_item, 3)
+
+    def test_recalculate_totals_repairs_drift(self):
+        """Тест исправления расхождения итоговой суммы командой recalculate_totals"""
+
+        Order.objects.filter(pk=self.order.pk).update(total_price=1)
+
+        call_command('recalculate_totals', '--dry-run', stdout=StringIO())
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_price, 1)
+
+        out = StringIO()
+        call_command('recalculate_totals', stdout=out)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_price, 30.00)
+        self.assertIn("Расхождений исправлено: 1", out.getvalue())
+
+    def tearDown(self):
+        Order.objects.all().delete()
+        MenuItem.objects.all().delete()
+
+
+class CreateTestItemsCommandTest(TestCase):
+    def generate(self, **options):
+        call_command('createtestitems', orders=300, menu_size=8, days=7, tables=5, batch_size=100,
+                     stdout=StringIO(), **options)
+        return list(Order.objects.order_by('id').values_list(
+            'table_number', 'status', 'total_price', 'created_at__date'))
+
+    def test_shared_menu_and_consistent_totals(self):
+        """Тест общего меню без дублей, итоговых сумм и агрегатов выручки сгенерированных заказов"""
+
+        self.generate()
+        self.generate(seed=7)
+
+        self.assertEqual(MenuItem.objects.count(), 8)
+        self.assertEqual(Order.objects.count(), 600)
+        self.assertFalse(Order.objects.filter(created_at__gt=timezone.now()).exists())
+        out = StringIO()
+        call_command('recalculate_totals', '--dry-run', stdout=out)
+        self.assertIn("Расхождений найдено: 0", out.getvalue())
+        self.assertEqual(
+            RevenueRollup.objects.aggregate(total=Sum('revenue'))['total'],
+            Order.objects.filter(status='paid').aggregate(total=Sum('total_price'))['total'],
+        )
+
+    def test_same_seed_same_data(self):
+        """Тест воспроизводимости данных при одинаковом seed"""
+
+        first = self.generate(seed=3)
+        Order.objects.all().delete()
+        self.assertEqual(self.generate(seed=3), first)
+
+    def tearDown(self):
+        Order.objects.all().delete()
+        MenuItem.objects.all().delete()
+
+
+class RevenueRollupTest(TestCase):
+    def setUp(self):
+        self.menu_item = MenuItem.objects.create(name="Кофе", price=60.00)
+        self.order = Order.objects.create(table_number=7)
+        create_order_item(self.order, self.menu_item, 2)
+        self.order.refresh_from_db()
+
+    def rollup_totals(self):
+        rollups = list(RevenueRollup.objects.values_list('revenue', 'orders_count'))
+        return sum(revenue for revenue, _ in rollups), sum(count for _, count in rollups)
+
+    def test_rollup_follows_paid_status(self):
+        """Тест учета заказа в агрегатах выручки при оплате и отмене оплаты"""
+
+        self.assertEqual(self.rollup_totals(), (0, 0))
+
+        self.order.status = 'paid'
+        self.order.save()
+        self.assertEqual(self.rollup_totals(), (120, 1))
+
+        self.order.status = 'ready'
+        self.order.save()
+        self.assertEqual(self.rollup_totals(), (0, 0))
+
+    def test_rollup_follows_paid_order_lines_and_delete(self):
+        """Тест изменения агрегата при изменении позиций и удалении оплаченного заказа"""
+
+        self.order.status = 'paid'
+        self.order.save()
+        create_order_item(self.order, self.menu_item, 1)
+        self.assertEqual(self.rollup_totals(), (180, 1))
+
+        self.order.delete()
+        self.assertEqual(self.rollup_totals(), (0, 0))
+
+    def test_rebuild_matches_incremental(self):
+        """Тест совпадения пересчитанных командой rebuildrevenue агрегатов с инкрементальными"""
+
+        self.order.status = 'paid'
+        self.order.save()
+        incremental = list(RevenueRollup.objects.values_list('date', 'hour', 'table_number', 'revenue', 'orders_count'))
+
+        call_command('rebuildrevenue', stdout=StringIO())
+
+        rebuilt = list(RevenueRollup.objects.values_list('date', 'hour', 'table_number', 'revenue', 'orders_count'))
+        self.assertEqual(rebuilt, incremental)
+
+    def test_migration_fills_rollups(self):
+        """Тест заполнения агрегатов выручки по уже оплаченным заказам миграцией 0002"""
+
+        self.order.status = 'paid'
+        self.order.save()
+        Order.objects.create(table_number=2, total_price=50)
+        incremental = list(RevenueRollup.objects.values_list('date', 'hour', 'table_number', 'revenue', 'orders_count'))
+        RevenueRollup.objects.all().delete()
+
+        import_module('app.migrations.0002_revenuerollup').fill_revenue_rollups(django_apps, None)
+
+        filled = list(RevenueRollup.objects.values_list('date', 'hour', 'table_number', 'revenue', 'orders_count'))
+        self.assertEqual(filled, incremental)
+
+    def test_revenue_report_view(self):
+        """Тест отображения отчета о выручке по агрегатам"""
+
+        self.order.status = 'paid'
+        self.order.save()
+
+        for granularity in ('day', 'hour', 'table'):
+            response = self.client.get(reverse('revenue_report'), {'granularity': granularity})
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, "Общая выручка: 120,00 ₽")
+            self.assertEqual(len(response.context['rows']), 1)
+
     def tearDown(self):
         Order.objects.all().delete()
         MenuItem.objects.all().delete()
+        RevenueRollup.objects.all().delete()
+
+
+class TableBillTest(TestCase):
+    def setUp(self):
+        self.coffee = MenuItem.objects.create(name="Кофе", price=Decimal('60.00'))
+        self.tea = MenuItem.objects.create(name="Чай", price=Decimal('10.00'))
+        self.orders = Order.objects.create_with_items([
+            {'table_number': 4, 'status': status, 'order_items': [
+                {'menu_item': self.coffee, 'quantity': 1}, {'menu_item': self.tea, 'quantity': 2}]}
+            for status in ('pending', 'ready', 'paid')
+        ] + [{'table_number': 7, 'order_items': [{'menu_item': self.tea, 'quantity': 1}]}])
+
+    def test_bill_lines_and_total(self):
+        """Тест счета стола: только неоплаченные заказы, блюда сгруппированы, число запросов не зависит от заказов"""
+
+        with self.assertNumQueries(2):
+            bill = table_bill(4)
+
+        self.assertEqual([order['id'] for order in bill['orders']], [self.orders[0].pk, self.orders[1].pk])
+        self.assertEqual([(line['name'], line['quantity'], line['amount']) for line in bill['lines']],
+                         [('Кофе', 2, Decimal('120.00')), ('Чай', 4, Decimal('40.00'))])
+        self.assertEqual(bill['total'], Decimal('160.00'))
+
+        response = self.client.get(reverse('table_bill', args=[4]))
+        self.assertContains(response, '4 × Чай')
+        self.assertContains(response, 'value="160.00"')
+
+    def test_close_table(self):
+        """Тест расчета стола: все неоплаченные заказы оплачиваются, сумма учитывается в выручке"""
+
+        self.assertIsNone(close_table(4, Decimal('100.00')))
+        self.assertEqual(Order.objects.filter(status='paid').count(), 1)
+
+        response = self.client.post(reverse('table_close', args=[4]), {'total': '160.00'})
+
+        self.assertRedirects(response, reverse('floor'))
+        self.assertFalse(Order.objects.filter(table_number=4).exclude(status='paid').exists())
+        rollup = RevenueRollup.objects.get(table_number=4)
+        self.assertEqual((rollup.revenue, rollup.orders_count), (Decimal('240.00'), 3))
+        self.assertEqual(table_bill(4)['orders'], [])
+
+    def test_floor_overview(self):
+        """Тест обзора зала одним агрегирующим запросом"""
+
+        with self.assertNumQueries(1):
+            tables = floor_overview()
+
+        self.assertEqual([(table['table_number'], table['orders_count'], table['total']) for table in tables],
+                         [(4, 2, Decimal('160.00')), (7, 1, Decimal('10.00'))])
+        response = self.client.get(reverse('floor'))
+        self.assertContains(response, reverse('table_bill', args=[7]))
+
+    def tearDown(self):
+        Order.objects.all().delete()
+        MenuItem.objects.all().delete()
+        RevenueRollup.objects.all().delete()
+
+
+class ExportTest(TestCase):
+    def setUp(self):
+        self.menu_item = MenuItem.objects.create(name="Суп", price=20.00)
+        self.pending_order = Order.objects.create(table_number=1)
+        self.paid_order = Order.objects.create(table_number=2)
+        create_order_item(self.pending_order, self.menu_item, 1)
+        create_order_item(self.paid_order, self.menu_item, 2)
+        self.paid_order.status = 'paid'
+        self.paid_order.save()
+
+    def test_export_orders_csv(self):
+        """Тест потоковой выгрузки заказов в CSV с фильтром по статусу"""
+
+        response = self.client.get(reverse('export', kwargs={'kind': 'orders'}), {'status': 'paid'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,table_number,status,total_price,created_at,updated_at')
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(f"{self.paid_order.pk},2,paid,40.00,"))
+
+    def test_export_order_items_jsonl(self):
+        """Тест потоковой выгрузки позиций заказов в JSON Lines"""
+
+        response = self.client.get(reverse('export', kwargs={'kind': 'order-items'}), {'format': 'jsonl'})
+
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['menu_item'] for row in rows], ["Суп", "Суп"])
+        self.assertEqual(rows[1]['price'], '40.00')
+
+    def test_export_unknown_kind(self):
+        """Тест отказа в неизвестной выгрузке"""
+
+        response = self.client.get(reverse('export', kwargs={'kind': 'users'}))
+        self.assertEqual(response.status_code, 400)
+
+    def test_exportorders_command(self):
+        """Тест выгрузки выручки в файл командой exportorders"""
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'revenue.csv')
+            call_command('exportorders', path, '--kind', 'revenue', stdout=StringIO())
+            with open(path, encoding='utf-8') as export_file:
+                lines = export_file.read().splitlines()
+
+        self.assertEqual(lines[0], 'date,hour,table_number,orders_count,revenue')
+        self.assertTrue(lines[1].endswith(',2,1,40.00'))
+
+    def tearDown(self):
+        Order.objects.all().delete()
+        MenuItem.objects.all().delete()
+        RevenueRollup.objects.all().delete()
+
+
+class ArchiveOrdersTest(TestCase):
+    def setUp(self):
+        self.menu_item = MenuItem.objects.create(name="Суп", price=Decimal('20.00'))
+        self.orders = Order.objects.create_with_items([
+            {'table_number': number, 'status': status, 'order_items': [{'menu_item': self.menu_item, 'quantity': number}]}
+            for number, status in ((1, 'paid'), (2, 'paid'), (3, 'paid'), (4, 'pending'), (5, 'paid'))
+        ])
+        # первые четыре заказа - старые (последний оплаченный - свежий)
+        old = timezone.now() - timedelta(days=settings.ARCHIVE_AFTER_DAYS + 1)
+        for minutes, order in enumerate(self.orders[:4]):
+            Order.objects.filter(pk=order.pk).update(created_at=old + timedelta(minutes=minutes))
+        call_command('rebuildrevenue', stdout=StringIO())
+        self.rollups = list(RevenueRollup.objects.order_by('date', 'hour', 'table_number').values_list(
+            'date', 'hour', 'table_number', 'revenue', 'orders_count'))
+
+    def export_lines(self, kind, **params):
+        response = self.client.get(reverse('export', kwargs={'kind': kind}), {'format': 'jsonl', **params})
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_archive_in_batches(self):
+        """Тест переноса старых оплаченных заказов с позициями в архив порциями"""
+
+        orders_before = self.export_lines('orders')
+        lines_before = self.export_lines('order-items')
+        line_id = OrderItem.objects.get(order=self.orders[1]).pk
+
+        out = StringIO()
+        call_command('archiveorders', '--batch-size', '2', '--pause', '0', '--verbosity', '2', stdout=out)
+
+        self.assertIn('Перенесено заказов: 2', out.getvalue())
+        self.assertIn('Заказов перенесено в архив: 3', out.getvalue())
+        self.assertEqual(sorted(Order.objects.values_list('table_number', flat=True)), [4, 5])
+        self.assertEqual(OrderItem.objects.count(), 2)
+        archived = ArchivedOrder.objects.get(pk=self.orders[1].pk)
+        self.assertEqual((archived.table_number, archived.total_price), (2, Decimal('40.00')))
+        self.assertEqual(archived.lines, [[line_id, self.menu_item.pk, 'Суп', 2, '40.00']])
+
+        # агрегаты выручки и выгрузки не меняются
+        self.assertEqual(list(RevenueRollup.objects.order_by('date', 'hour', 'table_number').values_list(
+            'date', 'hour', 'table_number', 'revenue', 'orders_count')), self.rollups)
+        self.assertEqual(self.export_lines('orders'), orders_before)
+        self.assertEqual(self.export_lines('order-items'), lines_before)
+        self.assertEqual([row['table_number'] for row in self.export_lines('orders', table='2')], [2])
+
+        call_command('rebuildrevenue', stdout=StringIO())
+        self.assertEqual(list(RevenueRollup.objects.order_by('date', 'hour', 'table_number').values_list(
+            'date', 'hour', 'table_number', 'revenue', 'orders_count')), self.rollups)
+
+    def test_dry_run_and_max_batches(self):
+        """Тест подсчета заказов без переноса и ограничения количества порций"""
+
+        out = StringIO()
+        call_command('archiveorders', '--dry-run', stdout=out)
+        self.assertIn('Заказов для архивирования: 3', out.getvalue())
+        self.assertFalse(ArchivedOrder.objects.exists())
+
+        call_command('archiveorders', '--batch-size', '1', '--pause', '0', '--max-batches', '2', stdout=StringIO())
+        self.assertEqual(ArchivedOrder.objects.count(), 2)
+        self.assertEqual(archivable_orders(archive_cutoff()).count(), 1)
+
+    def tearDown(self):
+        Order.objects.all().delete()
+        ArchivedOrder.objects.all().delete()
+        MenuItem.objects.all().delete()
+        RevenueRollup.objects.all().delete()
+
+
+class QueryPlanTest(TestCase):
+    """
+    Проверка планов выполнения (EXPLAIN QUERY PLAN) основных запросов на большом наборе данных:
+    каждый запрос должен использовать индекс, а не полный просмотр таблицы.
+    """
+
+    ORDERS = 20000
+    TABLES = 30
+
+    @classmethod
+    def setUpTestData(cls):
+        menu_item = MenuItem.objects.create(name="Кофе", price=60.00)
+        statuses = ['pending', 'ready', 'paid', 'paid', 'paid', 'paid']
+        Order.objects.bulk_create(
+            [Order(table_number=number % cls.TABLES + 1, status=statuses[number % len(statuses)])
+             for number in range(cls.ORDERS)],
+            batch_size=2000,
+        )
+        order_ids = list(Order.objects.values_list('pk', flat=True))
+        OrderItem.objects.bulk_create(
+            [OrderItem(order_id=order_id, menu_item=menu_item, quantity=1, price=60) for order_id in order_ids],
+            batch_size=2000,
+        )
+        with connection.cursor() as cursor:
+            # заказы распределяются по времени (по минуте на заказ), статистика - для планировщика
+            cursor.execute("UPDATE app_order SET created_at = datetime('2025-01-01', '+' || id || ' minutes')")
+            cursor.execute("ANALYZE")
+
+    def assertUsesIndex(self, queryset, table, sorted_by_index=True):
+        plan = queryset.explain()
+        self.assertIsNone(re.search(rf'\bSCAN {table}\b(?! USING)', plan), f"Full scan of {table}:\n{plan}")
+        self.assertRegex(plan, rf'{table} USING (COVERING )?INDEX')
+        if sorted_by_index:
+            self.assertNotIn('TEMP B-TREE FOR ORDER BY', plan)
+
+    def orders_page(self, params, cursor=None):
+        return seek(filter_orders(Order.objects.all(), params), cursor)[:51]
+
+    def test_order_list_plans(self):
+        """Тест использования индексов списком заказов с фильтрами и без"""
+
+        for params in ({}, {'status': 'pending'}, {'table': '5'}, {'table': '5', 'status': 'paid'},
+                       {'date_from': '2025-01-03', 'date_to': '2025-01-04'}):
+            with self.subTest(params=params):
+                self.assertUsesIndex(self.orders_page(params), 'app_order')
+
+    def test_order_list_cursor_plans(self):
+        """Тест использования диапазона индекса для глубоких страниц (без просмотра предыдущих)"""
+
+        order = Order.objects.order_by('created_at').values('created_at', 'pk')[self.ORDERS // 2]
+        cursor = encode_cursor(order['created_at'], order['pk'])
+        for params in ({}, {'status': 'pending'}, {'table': '5'}):
+            with self.subTest(params=params):
+                queryset = self.orders_page(params, cursor)
+                self.assertUsesIndex(queryset, 'app_order')
+                self.assertIn('created_at<?', queryset.explain())
+
+    def test_order_items_prefetch_plan(self):
+        """Тест использования индекса при подгрузке позиций заказов"""
+
+        self.assertUsesIndex(OrderItem.objects.filter(order_id__in=[1, 2, 3]), 'app_orderitem')
+
+    def test_revenue_plans(self):
+        """Тест использования индексов отчетом и пересчетом выручки"""
+
+        self.assertUsesIndex(revenue_rollups(timezone.localdate(), timezone.localdate()), 'app_revenuerollup')
+        grouped = (Order.objects.filter(status='paid')
+                   .annotate(day=TruncDate('created_at'), hour=ExtractHour('created_at'))
+                   .values('day', 'hour', 'table_number')
+                   .annotate(revenue=Sum('total_price'), orders_count=Count('id')).order_by())
+        self.assertUsesIndex(grouped, 'app_order', sorted_by_index=False)
+
+    def test_archive_plan(self):
+        """Тест использования индекса отбором заказов для архивирования"""
+
+        self.assertUsesIndex(archivable_orders(timezone.now())[:500], 'app_order')
+
+    def test_table_plans(self):
+        """Тест использования индексов счетом стола и обзором зала"""
+
+        self.assertUsesIndex(Order.objects.filter(table_number=5, status__in=Order.OPEN_STATUSES), 'app_order',
+                             sorted_by_index=False)
+        self.assertUsesIndex(Order.objects.filter(status__in=Order.OPEN_STATUSES).values('table_number')
+                             .annotate(total=Sum('total_price')).order_by(), 'app_order', sorted_by_index=False)
+
+    def test_export_plans(self):
+        """Тест использования индексов выгрузками"""
+
+        for params in ({}, {'status': 'paid'}, {'date_from': '2025-01-03'}):
+            with self.subTest(params=params):
+                self.assertUsesIndex(export_queryset('orders', params), 'app_order')
+                self.assertUsesIndex(export_queryset('order-items', params), 'app_order')
+
+
+class MenuCacheTest(TestCase):
+    def setUp(self):
+        self.menu_item = MenuItem.objects.create(name="Кофе", price=60.00)
+        self.order = Order.objects.create(table_number=1)
+
+    def test_menu_version_bumped_on_change(self):
+        """Тест смены версии меню и обновления кэша при изменении и удалении блюда"""
+
+        version = menu_cache.get_version()
+        tea = MenuItem.objects.create(name="Чай", price=10.00)
+        self.assertGreater(menu_cache.get_version(), version)
+        self.assertIn("Чай", [item['name'] for item in menu_cache.get_menu()])
+
+        tea.delete()
+        self.assertNotIn("Чай", [item['name'] for item in menu_cache.get_menu()])
+
+    def test_order_item_form_uses_cache(self):
+        """Тест отображения и проверки формы добавления блюда без запросов меню к БД"""
+
+        menu_cache.get_menu()
+        with self.assertNumQueries(0):
+            html = OrderItemForm().as_p()
+            form = OrderItemForm({'menu_item': self.menu_item.pk, 'quantity': 2})
+            self.assertTrue(form.is_valid())
+        self.assertIn(reverse('menuitem-search'), html)
+        self.assertNotIn("Кофе - 60.00₽", html)
+        self.assertEqual(form.cleaned_data['menu_item'].price, 60)
+
+        form.save(order=self.order)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_price, 120.00)
+
+    def test_menu_items_from_one_version(self):
+        """Тест получения нескольких блюд из меню одной версии (одно обращение к кэшу за версией)"""
+
+        tea = MenuItem.objects.create(name="Чай", price=10.00)
+        with mock.patch.object(menu_cache, 'get_version', wraps=menu_cache.get_version) as get_version:
+            menu_items = menu_cache.get_menu_items([self.menu_item.pk, tea.pk, 999999, 'x'])
+        self.assertEqual(get_version.call_count, 1)
+        self.assertEqual({pk: item.name for pk, item in menu_items.items()},
+                         {self.menu_item.pk: "Кофе", tea.pk: "Чай"})
+
+    def test_order_item_form_unknown_menu_item(self):
+        """Тест отказа в добавлении несуществующего блюда"""
+
+        form = OrderItemForm({'menu_item': 999999, 'quantity': 1})
+        self.assertFalse(form.is_valid())
+        self.assertIn('menu_item', form.errors)
+
+    def test_menu_api_list_uses_cache(self):
+        """Тест выдачи меню по API из кэша"""
+
+        menu_cache.get_menu()
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/menu-items/')
+
+        self.assertEqual(response.json()['results'], [{'id': self.menu_item.pk, 'name': "Кофе", 'price': '60.00'}])
+
+    def tearDown(self):
+        Order.objects.all().delete()
+        MenuItem.objects.all().delete()
+
+
+class MenuSearchTest(TestCase):
+    def setUp(self):
+        for name in ("Кофе латте", "Латте макиато", "Ёжик в тумане", "Чай", "Какао с латте"):
+            MenuItem.objects.create(name=name, price=100.00)
+
+    def names(self, query, limit=None):
+        return [item['name'] for item in search_menu(query, limit)]
+
+    def test_search_normalized(self):
+        """Тест поиска без учета регистра, лишних пробелов и различия е/ё"""
+
+        self.assertEqual(self.names("коф"), ["Кофе латте"])
+        self.assertEqual(self.names("  ЕЖИК   в "), ["Ёжик в тумане"])
+        self.assertEqual(self.names(""), [])
+
+    def test_prefix_matches_first(self):
+        """Тест порядка результатов: совпадения по началу названия, затем по подстроке"""
+
+        self.assertEqual(self.names("латте"), ["Латте макиато", "Какао с латте", "Кофе латте"])
+        self.assertEqual(self.names("латте", limit=2), ["Латте макиато", "Какао с латте"])
+
+    def test_search_name_kept_in_sync(self):
+        """Тест обновления столбца поиска при изменении названия блюда"""
+
+        tea = MenuItem.objects.get(name="Чай")
+        tea.name = "Чай зелёный"
+        tea.save(update_fields=['name'])
+        self.assertEqual(self.names("зелен"), ["Чай зелёный"])
+
+    def test_search_api(self):
+        """Тест поиска блюд по API и ответа 304 при неизменном меню"""
+
+        response = self.client.get(reverse('menuitem-search'), {'q': 'лат', 'limit': 1})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['name'] for item in response.json()], ["Латте макиато"])
+
+        response = self.client.get(reverse('menuitem-search'), {'q': 'лат', 'limit': 1},
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_prefix_search_plan(self):
+        """Тест использования индекса столбца поиска для поиска по началу названия"""
+
+        term = normalize("лат")
+        queryset = MenuItem.objects.filter(search_name__gte=term, search_name__lt=term + PREFIX_END)
+        plan = queryset.order_by('search_name', 'id').explain()
+        self.assertRegex(plan, r'app_menuitem USING (COVERING )?INDEX .*search_name')
+
+    def tearDown(self):
+        MenuItem.objects.all().delete()
+
+
+class BenchTest(TestCase):
+    def test_every_route_has_scenario(self):
+        """Тест наличия сценария замера benchcafe для каждого маршрута app.urls и api.urls"""
+
+        import api.urls
+        import app.urls
+
+        routes = route_names(app.urls.urlpatterns) | route_names(api.urls.urlpatterns)
+        self.assertEqual(routes - {scenario.route for scenario in BENCH_SCENARIOS} - set(BENCH_SKIPPED_ROUTES), set())
+
+    def test_percentile(self):
+        """Тест расчета перцентилей задержки"""
+
+        values = [float(value) for value in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 50.0)
+        self.assertEqual(percentile(values, 99), 99.0)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_check_thresholds(self):
+        """Тест поиска превышений порогов (общих '*' и по сценарию)"""
+
+        results = {'order_list': {'p95_ms': 12.0, 'queries': 2}, 'order_detail': {'p95_ms': 3.0, 'queries': 9}}
+        thresholds = {'*': {'queries': 5}, 'order_list': {'p95_ms': 10}}
+
+        self.assertEqual(sorted(check_thresholds(results, thresholds)),
+                         ['order_detail: queries = 9 > 5', 'order_list: p95_ms = 12.0 > 10'])
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.order = Order.objects.create(table_number=1)
+        metrics_registry.reset()
+
+    def test_server_timing_header(self):
+        """Тест заголовка Server-Timing с временем SQL, отрисовки и полным временем"""
+
+        response = self.client.get(reverse('order_list'))
+
+        self.assertRegex(response['Server-Timing'],
+                         r'^db;dur=[\d.]+;desc="\d+ queries", render;dur=[\d.]+, total;dur=[\d.]+$')
+
+    def test_metrics_endpoint(self):
+        """Тест гистограмм /metrics по имени представления в формате Prometheus"""
+
+        self.client.get(reverse('order_list'))
+        self.client.get(reverse('order_list'))
+        self.client.get(reverse('order_detail', args=[self.order.pk]))
+
+        response = self.client.get('/metrics')
+        text = response.content.decode()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn('# TYPE cafe_request_duration_seconds histogram', text)
+        self.assertIn('cafe_request_duration_seconds_bucket{view="order_list",le="+Inf"} 2', text)
+        self.assertIn('cafe_request_queries_count{view="order_detail"} 1', text)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_sampling(self):
+        """Тест пропуска замера запросов, не попавших в выборку"""
+
+        response = self.client.get(reverse('order_list'))
+
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(metrics_registry.histograms, {})
+
+    def tearDown(self):
+        Order.objects.all().delete()
+
+
+@contextmanager
+def without_connection_cleanup():
+    """
+    Функция отключения закрытия подключений к БД сигналами начала и конца запроса
+    (как и тестовый клиент, обработчик ASGI не должен закрывать подключение транзакции теста).
+    """
+    for signal in (request_started, request_finished):
+        signal.disconnect(close_old_connections)
+    try:
+        yield
+    finally:
+        for signal in (request_started, request_finished):
+            signal.connect(close_old_connections)
+
+
+class OrderEventsTest(TestCase):
+    def setUp(self):
+        self.menu_item = MenuItem.objects.create(name="Суп", price=20.00)
+        # номер события-метки: проверяются только события после нее
+        self.marker = events.hub.publish('marker', {}).id
+
+    def published(self, **filters):
+        async def backlog():
+            subscription, missed = events.hub.subscribe(last_event_id=self.marker, **filters)
+            events.hub.unsubscribe(subscription)
+            return missed
+
+        return asyncio.run(backlog())
+
+    def test_write_paths_publish_after_commit(self):
+        """Тест событий создания заказа, добавления позиции, смены статуса и удаления (после фиксации)"""
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(table_number=3)
+        order_id = order.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            OrderItem.objects.create(order=order, menu_item=self.menu_item, quantity=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            order.status = 'ready'
+            order.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            order.delete()
+
+        published = self.published()
+        self.assertEqual([event.type for event in published],
+                         [events.ORDER_CREATED, events.LINE_ADDED, events.ORDER_STATUS_CHANGED, events.ORDER_DELETED])
+        self.assertEqual(published[0].data['order'], order_id)
+        self.assertEqual(published[1].data['price'], '40.00')
+        self.assertEqual(published[2].data['previous_status'], 'pending')
+
+    def test_created_event_after_insert(self):
+        """Тест события создания заказа формой: событие публикуется после записи и содержит id заказа"""
+
+        with mock.patch.object(events.hub, 'publish', wraps=events.hub.publish) as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('order_create'), {'table_number': 3, 'status': 'pending'})
+            order = Order.objects.get()
+            self.assertRedirects(response, reverse('order_detail', args=[order.pk]), fetch_redirect_response=False)
+            publish.assert_called_once_with(events.ORDER_CREATED,
+                                            {'order': order.pk, 'table_number': 3, 'status': 'pending'})
+
+        # при ошибке записи событие не публикуется
+        with self.captureOnCommitCallbacks() as callbacks:
+            with mock.patch.object(models.Model, 'save_base', side_effect=OperationalError('disk I/O error')):
+                with self.assertRaises(OperationalError):
+                    Order(table_number=4).save()
+        self.assertEqual(callbacks, [])
+
+    def test_filters_and_reset(self):
+        """Тест фильтра по столу (включая уход заказа со стола) и события reset для устаревшего Last-Event-ID"""
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first = Order.objects.create(table_number=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            second = Order.objects.create(table_number=2)
+        # перенос заказа на другой стол (заказ загружен из БД)
+        moved = Order.objects.get(pk=first.pk)
+        moved.table_number = 1
+        with self.captureOnCommitCallbacks(execute=True):
+            moved.save()
+
+        self.assertEqual([event.data['order'] for event in self.published(table=2)], [first.pk, second.pk, first.pk])
+        self.assertEqual([event.data['order'] for event in self.published(table=1)], [first.pk])
+        self.assertEqual(self.published(table=1)[0].data['previous_table_number'], 2)
+        self.assertEqual([event.data['order'] for event in self.published(status='ready')], [])
+        self.marker = 1
+        self.assertEqual([event.type for event in self.published()], [events.RESET])
+
+    async def test_stream_resumes_and_pushes_live_events(self):
+        """Тест потока событий: пропущенные события по Last-Event-ID и события в реальном времени"""
+
+        events.hub.publish(events.ORDER_CREATED, {'order': 7, 'table_number': 5, 'status': 'pending'})
+        response = await self.async_client.get(reverse('order_events'), {'table': 5},
+                                               headers={'Last-Event-ID': str(self.marker)})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        stream = response.streaming_content
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))
+        self.assertIn(b'"order": 7', await anext(stream))
+
+        events.hub.publish(events.ORDER_CREATED, {'order': 8, 'table_number': 6, 'status': 'pending'})
+        events.hub.publish(events.LINE_ADDED, {'order': 7, 'table_number': 5, 'status': 'pending'})
+        self.assertIn(b'event: line_added', await anext(stream))
+
+        # отключение клиента: сервер ASGI отменяет задачу, ожидающую следующее событие
+        reader = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.01)
+        reader.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await reader
+        self.assertEqual(events.hub.subscribers, 0)
+
+    async def stream_request(self, application, host, until, query=b'status=ready', disconnected=None):
+        """
+        Функция запроса потока событий к приложению ASGI.
+
+        :param application: приложение ASGI.
+        :param host: заголовок Host.
+        :param until: текст, после получения которого клиент отключается.
+        :param query: параметры запроса.
+        :param disconnected: событие отключения клиента (по умолчанию - после текста until или ответа с ошибкой).
+        :return: отправленные клиенту сообщения ASGI.
+        """
+        disconnected = disconnected or asyncio.Event()
+        received = []
+        messages = []
+
+        async def receive():
+            if not received:
+                received.append(True)
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            messages.append(message)
+            if until is not None and (message.get('status', 200) != 200 or until in message.get('body', b'')):
+                disconnected.set()
+
+        scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                 'scheme': 'http', 'path': reverse('order_events'), 'raw_path': reverse('order_events').encode(),
+                 'root_path': '', 'query_string': query, 'client': ('127.0.0.1', 50000),
+                 'server': ('testserver', 80),
+                 'headers': [(b'host', host), (b'last-event-id', str(self.marker).encode())]}
+        await asyncio.wait_for(application(scope, receive, send), 5)
+        return messages
+
+    async def test_asgi_stream_through_django(self):
+        """Тест потока событий под ASGI (coms/asgi.py): промежуточные слои Django, проверка Host"""
+
+        application = events.with_event_stream(ASGIHandler())
+        events.hub.publish(events.ORDER_CREATED, {'order': 4, 'table_number': 1, 'status': 'pending'})
+        events.hub.publish(events.ORDER_CREATED, {'order': 5, 'table_number': 1, 'status': 'ready'})
+        with without_connection_cleanup():
+            messages = await self.stream_request(application, b'testserver', b'event: order_created')
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertIn((b'X-Frame-Options', b'DENY'), messages[0]['headers'])
+        body = b''.join(message.get('body', b'') for message in messages[1:])
+        self.assertIn(b'"order": 5', body)
+        self.assertNotIn(b'"order": 4', body)
+        self.assertEqual(events.hub.subscribers, 0)
+
+        with without_connection_cleanup(), self.assertLogs('django.security.DisallowedHost', 'ERROR'):
+            messages = await self.stream_request(application, b'evil.example', b'')
+        self.assertEqual(messages[0]['status'], 400)
+        self.assertEqual(events.hub.subscribers, 0)
+
+    def test_asgi_subscribers_without_threads(self):
+        """Тест ожидания событий под ASGI без потоков: число потоков не растет с числом подписчиков"""
+
+        application = events.with_event_stream(ASGIHandler())
+        subscribers = events.hub.subscribers
+        threads = threading.active_count()
+
+        async def subscribe():
+            # собственный цикл событий, как у сервера ASGI (синхронный код запроса выполняется в других потоках)
+            disconnected = asyncio.Event()
+            requests = [asyncio.create_task(self.stream_request(application, b'testserver', None,
+                                                                query=b'table=%d' % number,
+                                                                disconnected=disconnected))
+                        for number in range(200)]
+            while events.hub.subscribers < subscribers + 200:
+                await asyncio.sleep(0.01)
+            active_threads = threading.active_count()
+            events.hub.publish(events.ORDER_CREATED, {'order': 6, 'table_number': 7, 'status': 'pending'})
+            await asyncio.sleep(0.05)
+            disconnected.set()
+            return active_threads, await asyncio.gather(*requests)
+
+        with without_connection_cleanup():
+            active_threads, responses = asyncio.run(subscribe())
+        self.assertLessEqual(active_threads, threads + 1)
+        self.assertEqual(events.hub.subscribers, subscribers)
+        for number, messages in enumerate(responses):
+            body = b''.join(message.get('body', b'') for message in messages[1:])
+            self.assertEqual(b'"order": 6' in body, number == 7)
+
+    def test_stream_under_wsgi(self):
+        """Тест потока событий под WSGI (синхронное чтение потока)"""
+
+        events.hub.publish(events.ORDER_DELETED, {'order': 9, 'table_number': 1, 'status': 'paid'})
+        response = Client().get(reverse('order_events'), HTTP_LAST_EVENT_ID=str(self.marker))
+
+        stream = iter(response.streaming_content)
+        next(stream)
+        self.assertIn(b'event: order_deleted', next(stream))
+        # закрытие ответа отправляет request_finished: подключение к БД внутри транзакции теста не закрывается
+        with mock.patch.object(connection, 'close_if_unusable_or_obsolete'):
+            response.close()
+        self.assertEqual(events.hub.subscribers, 0)
+
+    def tearDown(self):
+        Order.objects.all().delete()
+        MenuItem.objects.all().delete()
+
+
+class SQLiteWriteTest(TransactionTestCase):
+    def test_connection_pragmas(self):
+        """Тест настроек подключения SQLite: журнал WAL, synchronous=NORMAL, ожидание блокировки"""
+
+        with connection.cursor() as cursor:
+            for pragma, expected in (('journal_mode', 'wal'), ('synchronous', 1),
+                                     ('busy_timeout', settings.SQLITE_BUSY_TIMEOUT)):
+                cursor.execute(f'PRAGMA {pragma}')
+                self.assertEqual(cursor.fetchone()[0], expected, pragma)
+
+    @override_settings(DB_WRITE_RETRY_DELAY=0.001)
+    def test_retry_write(self):
+        """Тест повтора транзакции записи при занятой блокировке (другие ошибки не повторяются)"""
+
+        attempts = []
+
+        def locked_twice():
+            attempts.append('locked')
+            MenuItem.objects.create(name=f"Блюдо {len(attempts)}", price=Decimal('10.00'))
+            if len(attempts) < 3:
+                raise OperationalError('database is locked')
+            return len(attempts)
+
+        self.assertEqual(retry_write(locked_twice), 3)
+        # изменения неудачных попыток откатываются
+        self.assertEqual(list(MenuItem.objects.values_list('name', flat=True)), ["Блюдо 3"])
+
+        def broken():
+            attempts.append('broken')
+            raise OperationalError('no such table: missing')
+
+        with self.assertRaises(OperationalError):
+            retry_write(broken)
+        self.assertEqual(attempts.count('broken'), 1)
+
+    def test_concurrent_writers(self):
+        """Стресс-тест одновременной записи: позиции добавляют 8 потоков, ни одна запись не потеряна и не отклонена"""
+
+        menu_item = MenuItem.objects.create(name="Кофе", price=Decimal('60.00'))
+        orders = [Order.objects.create(table_number=table, status='paid') for table in range(1, 5)]
+        writers, lines = 8, 15
+        statuses = []
+        errors = []
+
+        def writer(number: int) -> None:
+            client = Client()
+            try:
+                for line in range(lines):
+                    order = orders[(number + line) % len(orders)]
+                    response = client.post(reverse('order_item_add', args=[order.pk]),
+                                           {'menu_item': menu_item.pk, 'quantity': 1})
+                    statuses.append(response.status_code)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=writer, args=(number,)) for number in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(statuses, [302] * writers * lines)
+        self.assertEqual(OrderItem.objects.count(), writers * lines)
+        for order in Order.objects.all():
+            self.assertEqual(order.total_price, Decimal('60.00') * order.order_items.count())
+        self.assertEqual(RevenueRollup.objects.aggregate(total=Sum('revenue'))['total'],
+                         Decimal('60.00') * writers * lines)
+
+    def test_concurrent_idempotent_retries(self):
+        """Тест одновременных повторов отправки формы с одним ключом: позиция добавляется один раз"""
+
+        menu_item = MenuItem.objects.create(name="Кофе", price=Decimal('60.00'))
+        order = Order.objects.create(table_number=1)
+        responses = []
+
+        def retry() -> None:
+            try:
+                responses.append(Client().post(reverse('order_item_add', args=[order.pk]),
+                                               {'menu_item': menu_item.pk, 'quantity': 1, 'idempotency_key': 'tap-1'}))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=retry) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([response.status_code for response in responses], [302] * 6)
+        self.assertEqual(sum(response.has_header('Idempotent-Replayed') for response in responses), 5)
+        self.assertEqual(OrderItem.objects.count(), 1)
+        self.assertEqual(Order.objects.get().total_price, Decimal('60.00'))
+
+
+@override_settings(REPORTING_READS=True)
+class ReportingRouterTest(TransactionTestCase):
+    databases = {'default', 'reporting'}
+
+    def setUp(self):
+        self.menu_item = MenuItem.objects.create(name="Кофе", price=Decimal('60.00'))
+
+    def create_paid_order(self, quantity: int) -> Order:
+        return Order.objects.create_with_items([
+            {'table_number': 1, 'status': 'paid', 'order_items': [{'menu_item': self.menu_item, 'quantity': quantity}]},
+        ])[0]
+
+    def test_reports_read_replica_until_sync(self):
+        """Тест чтения отчета, выгрузки и списков из БД отчетов (видны данные на момент копирования)"""
+
+        self.create_paid_order(1)
+        sync_reporting()
+        self.create_paid_order(2)
+
+        response = self.client.get(reverse('revenue_report'))
+        self.assertEqual(response.context['totals']['revenue'], Decimal('60.00'))
+        export = b''.join(self.client.get(reverse('export', args=['orders'])).streaming_content).decode()
+        self.assertEqual(len(export.splitlines()), 2)
+        self.assertEqual(len(self.client.get(reverse('order_list')).context['orders']), 1)
+        api_client = APIClient()
+        api_client.force_authenticate(User.objects.create_user(username='manager'))
+        self.assertEqual(len(api_client.get('/api/orders/').json()['results']), 1)
+        # заказ по id читается из основной БД
+        self.assertEqual(api_client.get(f'/api/orders/{Order.objects.latest("id").pk}/').status_code, 200)
+
+        with override_settings(REPORTING_DB_NAME='reporting.sqlite3'):
+            call_command('syncreporting', stdout=StringIO())
+        response = self.client.get(reverse('revenue_report'))
+        self.assertEqual(response.context['totals']['revenue'], Decimal('180.00'))
+
+    def test_read_your_writes(self):
+        """Тест закрепления чтений за основной БД после записи (в том же и в следующих запросах клиента)"""
+
+        sync_reporting()
+        with request_routing(), reporting_reads():
+            self.assertEqual(reporting_alias(), 'reporting')
+            self.assertEqual(Order.objects.count(), 0)
+            Order.objects.create(table_number=2)
+            self.assertIsNone(reporting_alias())
+            self.assertEqual(Order.objects.count(), 1)
+        self.assertIsNone(ReportingRouter().db_for_read(User))
+
+        response = self.client.post(reverse('order_create'), {'table_number': 3, 'status': 'pending'})
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], settings.REPORTING_PIN_SECONDS)
+        self.assertEqual(len(self.client.get(reverse('order_list')).context['orders']), 2)
+        # клиент без записи видит данные реплики
+        self.assertEqual(len(Client().get(reverse('order_list')).context['orders']), 0)
+
+
+class JobTest(TransactionTestCase):
+    def setUp(self):
+        results_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(results_dir.cleanup)
+        override = override_settings(JOB_RESULTS_DIR=results_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.menu_item = MenuItem.objects.create(name="Кофе", price=Decimal('60.00'))
+        Order.objects.create_with_items([
+            {'table_number': table, 'status': 'paid', 'order_items': [{'menu_item': self.menu_item, 'quantity': 1}]}
+            for table in (1, 2, 3)
+        ])
+
+    def test_submit_validates_and_reuses_pending_job(self):
+        """Тест постановки задачи: проверка параметров, повторная постановка возвращает ту же задачу"""
+
+        job = submit_job('export', {'kind': 'orders', 'format': 'csv', 'table': 2, 'status': ''})
+        self.assertEqual(job.params, {'kind': 'orders', 'format': 'csv', 'table': '2'})
+        self.assertEqual(submit_job('export', {'kind': 'orders', 'format': 'csv', 'table': '2'}).pk, job.pk)
+        self.assertNotEqual(submit_job('export', {'kind': 'orders', 'format': 'jsonl'}).pk, job.pk)
+
+        for kind, params in (('unknown', {}), ('export', {'kind': 'menu'}), ('export', {'limit': 1}),
+                             ('revenue-report', {'date_from': '2024-13-01'})):
+            with self.assertRaises(ValueError):
+                submit_job(kind, params)
+
+    def test_thread_worker_runs_queue(self):
+        """Тест рабочего процесса с пулом потоков: задачи выполняются, файл результата выдается по ссылке"""
+
+        export = submit_job('export', {'kind': 'orders', 'format': 'csv', 'table': '2'})
+        report = submit_job('revenue-report', {'granularity': 'table'})
+        recalculate = submit_job('recalculate-totals', {'dry_run': True})
+
+        self.assertEqual(run_worker(2, 'thread', poll=0.01, once=True), 3)
+
+        export.refresh_from_db()
+        self.assertEqual((export.status, export.attempts), ('done', 1))
+        response = self.client.get(reverse('job_result', args=[export.pk]))
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 2)
+
+        report.refresh_from_db()
+        self.assertEqual(report.result, {'rows': 3, 'orders_count': 3, 'revenue': '180.00'})
+        data = json.loads(b''.join(self.client.get(reverse('job_result', args=[report.pk])).streaming_content))
+        self.assertEqual(len(data['rows']), 3)
+
+        recalculate.refresh_from_db()
+        self.assertEqual((recalculate.status, recalculate.result_file), ('done', ''))
+        self.assertIn('output', recalculate.result)
+        self.assertContains(self.client.get(reverse('job_detail', args=[recalculate.pk])), 'Готово')
+        self.assertEqual(self.client.get(reverse('job_result', args=[recalculate.pk])).status_code, 404)
+
+    def test_process_worker(self):
+        """Тест рабочего процесса с пулом процессов (те же БД и каталог результатов)"""
+
+        job = submit_job('export', {'kind': 'orders', 'format': 'jsonl'})
+        self.assertEqual(run_worker(1, 'process', poll=0.01, once=True), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertTrue((Path(settings.JOB_RESULTS_DIR) / job.result_file).exists())
+
+    def test_failed_job_and_stale_requeue(self):
+        """Тест ошибки выполнения задачи и возврата в очередь задач остановившегося рабочего процесса"""
+
+        def broken(job):
+            raise RuntimeError('отчет не построен')
+
+        with mock.patch.dict(JOB_KINDS, {'export': JobKind(broken, JOB_KINDS['export'].params)}):
+            job = submit_job('export', {'kind': 'orders'})
+            run_worker(1, 'thread', poll=0.01, once=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('RuntimeError: отчет не построен', job.error)
+
+        stale = timezone.now() - timedelta(seconds=settings.JOB_STALE_SECONDS + 1)
+        retried = Job.objects.create(kind='export', status='running', worker='lost', attempts=1, heartbeat_at=stale)
+        exhausted = Job.objects.create(kind='export', status='running', worker='lost',
+                                       attempts=settings.JOB_MAX_ATTEMPTS, heartbeat_at=stale)
+        alive = Job.objects.create(kind='export', status='running', worker='alive', attempts=1,
+                                   heartbeat_at=timezone.now())
+        self.assertEqual(requeue_stale(), 1)
+        statuses = dict(Job.objects.filter(pk__in=[retried.pk, exhausted.pk, alive.pk]).values_list('pk', 'status'))
+        self.assertEqual(statuses, {retried.pk: 'queued', exhausted.pk: 'failed', alive.pk: 'running'})
+
+    @override_settings(REVENUE_REPORT_SYNC_MAX_DAYS=7)
+    def test_long_revenue_report_offloaded(self):
+        """Тест отчета о выручке за явно заданный длинный период: фоновая задача вместо построения в запросе"""
+
+        params = {'date_from': '2024-01-01', 'date_to': '2024-03-31', 'granularity': 'hour'}
+        response = self.client.get(reverse('revenue_report'), params)
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse('job_detail', args=[job.pk]))
+        self.assertEqual(job.params, params)
+        # повторный запрос - та же задача
+        self.client.get(reverse('revenue_report'), params)
+        self.assertEqual(Job.objects.count(), 1)
+        self.assertContains(self.client.get(reverse('job_detail', args=[job.pk])), 'window.location.reload')
+
+        # выполненный отчет показывается на странице задачи таблицей
+        run_worker(1, 'thread', poll=0.01, once=True)
+        response = self.client.get(reverse('job_detail', args=[job.pk]))
+        self.assertContains(response, 'Общая выручка: 0.00 ₽')
+        self.assertNotContains(response, 'window.location.reload')
+
+        # короткий период и отчет без дат (даже при длинной истории) строятся в запросе
+        RevenueRollup.objects.create(date='2023-01-01', hour=12, table_number=1, revenue=10, orders_count=1)
+        for params in ({'date_from': '2024-01-01', 'date_to': '2024-01-07'}, {}, {'date_from': '2023-01-01'}):
+            response = self.client.get(reverse('revenue_report'), params)
+            self.assertEqual(response.status_code, 200, params)
+        self.assertEqual(Job.objects.count(), 1)
+
+        # отчет в фоне по запросу
+        response = self.client.get(reverse('revenue_report'), {'background': '1'})
+        self.assertRedirects(response, reverse('job_detail', args=[Job.objects.latest('id').pk]),
+                             fetch_redirect_response=False)
+
+        response = self.client.get(reverse('export', args=['orders']), {'background': '1', 'status': 'paid'})
+        self.assertRedirects(response, reverse('job_detail', args=[Job.objects.latest('id').pk]))
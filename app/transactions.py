@@ -0,0 +1,85 @@
+import random
+import time
+from functools import wraps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.http import HttpRequest, HttpResponse
+from typing import Any, Callable, Tuple
+
+# сообщения SQLite о занятой другим подключением блокировке записи
+LOCKED_MESSAGES: Tuple[str, ...] = ('database is locked', 'database table is locked')
+
+# методы запросов, изменяющих данные
+WRITE_METHODS: Tuple[str, ...] = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+def is_locked(exc: OperationalError) -> bool:
+    """
+    Функция проверки ошибки занятой блокировки записи SQLite.
+
+    :param exc: ошибка БД.
+    :return: True, если транзакцию можно повторить.
+    """
+    message = str(exc).lower()
+    return any(locked in message for locked in LOCKED_MESSAGES)
+
+
+def backoff(attempt: int) -> float:
+    """
+    Функция паузы перед повтором транзакции: экспоненциальный рост со случайной составляющей,
+    чтобы одновременно отказавшие записи не повторялись одновременно.
+
+    :param attempt: номер неудачной попытки (с 0).
+    :return: пауза (сек.).
+    """
+    delay = settings.DB_WRITE_RETRY_DELAY * 2 ** attempt
+    return delay / 2 + random.random() * delay / 2
+
+
+def retry_write(func: Callable[..., Any], *args, using: str = DEFAULT_DB_ALIAS, **kwargs) -> Any:
+    """
+    Функция выполнения записи в транзакции с повтором при занятой блокировке.
+    Транзакция начинается с BEGIN IMMEDIATE (OPTIONS['transaction_mode']): блокировка записи берется
+    сразу, и ожидание занятой блокировки (busy_timeout) не заканчивается взаимной блокировкой
+    транзакций, начавших с чтения. Если блокировка не освободилась за busy_timeout,
+    транзакция повторяется целиком (до DB_WRITE_RETRIES раз).
+    Внутри внешней транзакции повтор невозможен: func выполняется один раз.
+
+    :param func: функция записи.
+    :param using: псевдоним БД.
+    :return: результат func.
+    """
+    if connections[using].in_atomic_block:
+        with transaction.atomic(using=using):
+            return func(*args, **kwargs)
+
+    attempt = 0
+    while True:
+        try:
+            with transaction.atomic(using=using):
+                return func(*args, **kwargs)
+        except OperationalError as exc:
+            if attempt >= settings.DB_WRITE_RETRIES or not is_locked(exc):
+                raise
+        time.sleep(backoff(attempt))
+        attempt += 1
+
+
+def write_transaction(view: Callable[..., HttpResponse]) -> Callable[..., HttpResponse]:
+    """
+    Декоратор представления: изменяющие запросы (POST, PUT, PATCH, DELETE) выполняются
+    одной транзакцией записи с повтором при занятой блокировке (см. retry_write).
+    Для представлений-классов: method_decorator(write_transaction, name='dispatch').
+
+    :param view: функция представления.
+    :return: функция представления.
+    """
+    @wraps(view)
+    def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        if request.method not in WRITE_METHODS:
+            return view(request, *args, **kwargs)
+        # тело запроса читается заранее: при повторе представление разбирает его снова
+        request.body
+        return retry_write(view, request, *args, **kwargs)
+
+    return wrapper
@@ -6,9 +6,17 @@ from .views import (
     OrderUpdateView,
     OrderDeleteView,
     RevenueReportView,
+    FloorView,
+    TableBillView,
+    TableCloseView,
     AddOrderItemView,
     DeleteOrderItemView,
     MenuItemCreateView,
+    ExportView,
+    JobDetailView,
+    JobResultView,
+    MetricsView,
+    OrderEventsView,
 )
 
 urlpatterns = [
@@ -18,8 +26,16 @@ urlpatterns = [
     path('<int:pk>/edit/', OrderUpdateView.as_view(), name='order_update'),
     path('<int:pk>/delete/', OrderDeleteView.as_view(), name='order_delete'),
     path('revenue/', RevenueReportView.as_view(), name='revenue_report'),
+    path('tables/', FloorView.as_view(), name='floor'),
+    path('tables/<int:table>/', TableBillView.as_view(), name='table_bill'),
+    path('tables/<int:table>/close/', TableCloseView.as_view(), name='table_close'),
     path('items/<int:pk>/add/', AddOrderItemView.as_view(), name='order_item_add'),
     path('items/<int:pk>/delete/', DeleteOrderItemView.as_view(), name='order_item_delete'),
     path('menu-item/new/', MenuItemCreateView.as_view(), name='menu_item_create'),
+    path('export/<str:kind>/', ExportView.as_view(), name='export'),
+    path('jobs/<int:pk>/', JobDetailView.as_view(), name='job_detail'),
+    path('jobs/<int:pk>/result/', JobResultView.as_view(), name='job_result'),
+    path('metrics', MetricsView.as_view(), name='metrics'),
+    path('events/', OrderEventsView.as_view(), name='order_events'),
 
 ]
@@ -1,40 +1,70 @@
+import uuid
+from django.conf import settings
 from django.contrib import messages
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.utils import timezone
+from django.utils.decorators import method_decorator
 from django.views import View
 from django.db.models.query import QuerySet
 from typing import Optional
-from .models import Order, OrderItem
-from .forms import OrderForm, OrderItemForm, MenuItemForm
-
-
+from .events import event_stream, iterate_sync, stream_params
+from .exports import EXPORT_COLUMNS, EXPORT_FORMATS, export_stream
+from .filters import filter_orders, parse_day
+from .fragments import render_order_fragments
+from .idempotency import idempotent
+from .jobs import job_result_response, revenue_report_result, submit_job
+from .metrics import registry
+from .models import Job, Order, OrderItem
+from .pagination import keyset_page
+from .reports import REVENUE_GRANULARITIES, is_heavy_report, revenue_report
+from .routers import reporting_iterator, reporting_view
+from .tables import close_table, floor_overview, table_bill
+from .transactions import write_transaction
+from .forms import OrderForm, OrderItemForm, MenuItemForm, TableCloseForm
+
+
+@method_decorator(reporting_view, name='get')
 class OrderListView(View):
     """Класс отображения списка заказов"""
 
     def get(self, request) -> render:
         """
         Функция получения списка заказов.
+        Заказы выдаются постранично по курсору (created_at, id), поэтому стоимость страницы
+        не зависит от размера таблицы. Строки неизменившихся заказов берутся из кэша фрагментов,
+        позиции и блюда подгружаются (одним запросом) только для остальных.
         :param request:
         :return: html-страница списка заказов.
         """
-        orders: QuerySet[Order] = Order.objects.all().order_by('-created_at')
-
-        # попытка получить параметры фильтрации из request (адресной строки)
-        table_number: Optional[str] = request.GET.get('table')
-        status: Optional[str] = request.GET.get('status')
-
-        # фильтрация, при наличии параметров фильтрации
-        if table_number:
-            orders = orders.filter(table_number=table_number)
-        if status:
-            orders = orders.filter(status=status)
+        # фильтрация по параметрам из request (адресной строки): стол, статус, диапазон дат
+        orders: QuerySet[Order] = filter_orders(Order.objects.all(), request.GET)
+        orders, next_cursor = keyset_page(orders, request.GET.get('cursor'), settings.ORDER_LIST_PAGE_SIZE)
+
+        # ссылки на первую и следующую страницы с сохранением параметров фильтрации
+        query = request.GET.copy()
+        first_query: Optional[str] = None
+        if query.pop('cursor', None):
+            first_query = query.urlencode()
+        next_query: Optional[str] = None
+        if next_cursor:
+            query['cursor'] = next_cursor
+            next_query = query.urlencode()
 
         return render(request, 'cafe/order_list.html', {
             'orders': orders,
-            'current_table': table_number,
-            'current_status': status
+            'order_rows': render_order_fragments(orders, 'row'),
+            'current_table': request.GET.get('table'),
+            'current_status': request.GET.get('status'),
+            'current_date_from': request.GET.get('date_from'),
+            'current_date_to': request.GET.get('date_to'),
+            'first_query': first_query,
+            'next_query': next_query,
         })
 
 
+@method_decorator(write_transaction, name='dispatch')
 class OrderCreateView(View):
     """Класс создания заказа"""
 
@@ -74,12 +104,18 @@ class OrderDetailView(View):
         """
         order: Order = get_object_or_404(Order, pk=pk)
         item_form = OrderItemForm()
+        # состав заказа читается из кэша фрагментов, пока заказ не изменился
+        order_lines, = render_order_fragments([order], 'lines')
         return render(request, 'cafe/order_detail.html', {
             'order': order,
+            'order_lines': order_lines,
+            # ключ идемпотентности формы добавления блюда: повторная отправка формы не дублирует позицию
+            'idempotency_key': uuid.uuid4().hex,
             'item_form': item_form
         })
 
 
+@method_decorator(write_transaction, name='dispatch')
 class OrderUpdateView(View):
     """Класс обновления статуса заказа"""
 
@@ -110,6 +146,7 @@ class OrderUpdateView(View):
         return render(request, 'cafe/order_form.html', {'form': form})
 
 
+@method_decorator(write_transaction, name='dispatch')
 class OrderDeleteView(View):
     """Класс удаления заказа"""
 
@@ -125,24 +162,181 @@ class OrderDeleteView(View):
         return redirect('order_list')
 
 
+class FloorView(View):
+    """Класс обзора зала (открытые столы)"""
+
+    def get(self, request) -> render:
+        """
+        Функция обработки Get-запроса.
+        Текущие суммы всех открытых столов считаются одним агрегирующим запросом.
+        :param request:
+        :return: html-страница обзора зала.
+        """
+        return render(request, 'cafe/floor.html', {'tables': floor_overview()})
+
+
+class TableBillView(View):
+    """Класс отображения счета стола"""
+
+    def get(self, request, table) -> render:
+        """
+        Функция обработки Get-запроса.
+        :param request:
+        :param table: номер стола
+        :return: html-страница счета стола (неоплаченные заказы, блюда и итоговая сумма).
+        """
+        bill = table_bill(table)
+        return render(request, 'cafe/table_bill.html', {
+            'bill': bill,
+            'close_form': TableCloseForm(initial={'total': bill['total']}),
+        })
+
+
+@method_decorator(write_transaction, name='dispatch')
+class TableCloseView(View):
+    """Класс расчета (закрытия) стола"""
+
+    def post(self, request, table) -> redirect:
+        """
+        Функция обработки POST-запроса.
+        Все неоплаченные заказы стола оплачиваются в одной транзакции,
+        если сумма счета не изменилась с момента его отображения.
+        :param request:
+        :param table: номер стола
+        :return: перенаправление на html-страницу обзора зала (или счета стола, если сумма изменилась).
+        """
+        form = TableCloseForm(request.POST)
+        if not form.is_valid():
+            return HttpResponseBadRequest('Некорректная сумма счета')
+        closed = close_table(table, form.cleaned_data['total'])
+        if closed is None:
+            messages.error(request, 'Счет стола изменился, проверьте его еще раз')
+            return redirect('table_bill', table=table)
+        messages.success(request, f'Стол {table} закрыт, оплачено заказов: {len(closed)}')
+        return redirect('floor')
+
+
+@method_decorator(reporting_view, name='get')
 class RevenueReportView(View):
     """Класс отображения отчет о выручке"""
 
     def get(self, request) -> render:
         """
         Функция обработки Get-запроса.
+        Отчет строится по агрегатам выручки (RevenueRollup) за диапазон дат
+        ('date_from', 'date_to') с детализацией 'granularity' (day, hour, table).
+        Отчет за явно заданный период длиннее REVENUE_REPORT_SYNC_MAX_DAYS (или с параметром 'background=1')
+        строится фоновой задачей; отчет без дат строится в запросе.
         :param request:
-        :return: html-страница отображения отчета о выручке.
+        :return: html-страница отображения отчета о выручке или переход на страницу задачи.
         """
-        # получение заказов со статусом "оплачено"
-        paid_orders: QuerySet[Order] = Order.objects.filter(status='paid')
-        total_revenue: float = sum(order.total_price for order in paid_orders)
+        granularity: str = request.GET.get('granularity', 'day')
+        if granularity not in REVENUE_GRANULARITIES:
+            granularity = 'day'
+        date_from, date_to = parse_day(request.GET.get('date_from')), parse_day(request.GET.get('date_to'))
+        if request.GET.get('background') == '1' or is_heavy_report(date_from, date_to):
+            job = submit_job('revenue-report', {
+                'date_from': date_from and date_from.isoformat(),
+                'date_to': date_to and date_to.isoformat(),
+                'granularity': granularity,
+            }, request.user)
+            return redirect('job_detail', pk=job.pk)
+        rows, totals = revenue_report(date_from, date_to, granularity)
         return render(request, 'cafe/revenue_report.html', {
-            'paid_orders': paid_orders,
-            'total_revenue': total_revenue
+            'rows': rows,
+            'totals': totals,
+            'total_revenue': totals['revenue'],
+            'granularity': granularity,
+            'current_date_from': request.GET.get('date_from'),
+            'current_date_to': request.GET.get('date_to'),
         })
 
 
+@method_decorator(reporting_view, name='get')
+class ExportView(View):
+    """Класс потоковой выгрузки заказов, позиций заказов и выручки"""
+
+    def get(self, request, kind) -> (StreamingHttpResponse, HttpResponseBadRequest):
+        """
+        Функция обработки Get-запроса.
+        Формат задается параметром 'format' (csv - по умолчанию, jsonl),
+        фильтрация - параметрами 'status', 'table', 'date_from', 'date_to'.
+        С параметром 'background=1' выгрузка выполняется фоновой задачей (файл - на странице задачи).
+        :param request:
+        :param kind: название выгрузки ('orders', 'order-items', 'revenue').
+        :return: файл выгрузки, формируемый по мере чтения из БД, или переход на страницу задачи.
+        """
+        export_format: str = request.GET.get('format', 'csv')
+        if kind not in EXPORT_COLUMNS or export_format not in EXPORT_FORMATS:
+            return HttpResponseBadRequest('Неизвестная выгрузка или формат')
+
+        if request.GET.get('background') == '1':
+            params = {name: request.GET.get(name) for name in ('status', 'table', 'date_from', 'date_to')}
+            try:
+                job = submit_job('export', {'kind': kind, 'format': export_format, **params}, request.user)
+            except ValueError as exc:
+                return HttpResponseBadRequest(str(exc))
+            return redirect('job_detail', pk=job.pk)
+
+        # строки выгрузки читаются после выхода из представления - тоже из БД отчетов
+        response = StreamingHttpResponse(
+            reporting_iterator(export_stream(kind, export_format, request.GET)),
+            content_type=EXPORT_FORMATS[export_format],
+        )
+        filename = f"{kind}-{timezone.localdate():%Y%m%d}.{export_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class JobDetailView(View):
+    """Класс отображения состояния фоновой задачи"""
+
+    def get(self, request, pk) -> render:
+        """
+        Функция обработки Get-запроса (страница обновляется, пока задача не завершена).
+        :param request:
+        :param pk: id задачи.
+        :return: html-страница состояния задачи.
+        """
+        job: Job = get_job(request, pk)
+        context = {'job': job}
+        # отчет о выручке показывается на странице задачи, как на странице отчета
+        if job.kind == 'revenue-report' and job.status == 'done':
+            context['report'] = revenue_report_result(job)
+        return render(request, 'cafe/job_detail.html', context)
+
+
+class JobResultView(View):
+    """Класс выдачи файла результата фоновой задачи"""
+
+    def get(self, request, pk) -> FileResponse:
+        """
+        Функция обработки Get-запроса.
+        :param request:
+        :param pk: id задачи.
+        :return: файл результата выполненной задачи.
+        """
+        job: Job = get_job(request, pk)
+        if job.status != 'done' or not job.result_file:
+            raise Http404('Результат задачи не готов')
+        return job_result_response(job)
+
+
+def get_job(request, pk: int) -> Job:
+    """
+    Функция получения задачи: задачи пользователя доступны ему и персоналу.
+
+    :param request:
+    :param pk: id задачи.
+    :return: объект задачи (404 - нет задачи или нет доступа).
+    """
+    job: Job = get_object_or_404(Job, pk=pk)
+    if job.owner_id is not None and job.owner_id != request.user.pk and not request.user.is_staff:
+        raise Http404('Задача не найдена')
+    return job
+
+
+@method_decorator(write_transaction, name='dispatch')
 class MenuItemCreateView(View):
     """Класс создания (добавления) блюда (в меню)"""
 
@@ -170,12 +364,15 @@ class MenuItemCreateView(View):
         return render(request, 'cafe/menu_item_form.html', {'form': form})
 
 
+@method_decorator(write_transaction, name='dispatch')
+@method_decorator(idempotent, name='post')
 class AddOrderItemView(View):
     """Класс добавления блюда в заказ"""
 
     def post(self, request, pk) -> redirect:
         """
         Функция обработки POST-запроса.
+        Повтор отправки формы с тем же ключом (поле idempotency_key) не добавляет блюдо повторно.
         :param request:
         :param pk: id - текущего заказа
         :return: html-страница отображения деталей текущего заказа.
@@ -192,6 +389,7 @@ class AddOrderItemView(View):
         return redirect('order_detail', pk=order.pk)
 
 
+@method_decorator(write_transaction, name='dispatch')
 class DeleteOrderItemView(View):
     """Класс удаления блюда из заказа"""
 
@@ -203,7 +401,44 @@ class DeleteOrderItemView(View):
         :return: html-страница отображения деталей текущего заказа.
         """
         item = get_object_or_404(OrderItem, pk=pk)
-        order_pk = item.order.pk
+        order_pk = item.order_id
+        # удаление позиции уменьшает итоговую сумму заказа (см. OrderItem.delete)
         item.delete()
         messages.success(request, 'Блюдо удалено из заказа')
         return redirect('order_detail', pk=order_pk)
+
+
+class MetricsView(View):
+    """Класс выдачи метрик запросов в текстовом формате Prometheus"""
+
+    def get(self, request) -> HttpResponse:
+        """
+        Функция обработки Get-запроса.
+        :param request:
+        :return: гистограммы показателей запросов по представлениям (текущего процесса).
+        """
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class OrderEventsView(View):
+    """Класс потока событий заказов (server-sent events) для экранов кухни и зала"""
+
+    async def get(self, request) -> StreamingHttpResponse:
+        """
+        Функция обработки Get-запроса.
+        Параметры: 'status' - статус заказа, 'table' - номер стола;
+        заголовок Last-Event-ID (или параметр 'last_event_id') - продолжение потока после переподключения.
+        :param request:
+        :return: бесконечный поток событий создания, изменения и удаления заказов и их позиций.
+        """
+        stream = event_stream(*stream_params(request.GET, request.headers.get('Last-Event-ID')))
+        # под ASGI поток отдает events.EventStreamHandler (coms/asgi.py): запрос проходит все промежуточные
+        # слои (проверка Host, сессия и пользователь, метрики), а ожидание событий не занимает поток.
+        # Под WSGI (runserver) подключение занимает поток сервера.
+        response = StreamingHttpResponse(
+            stream if isinstance(request, ASGIRequest) else iterate_sync(stream),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
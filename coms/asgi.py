@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coms.settings')
+# под ASGI чтение API обслуживается асинхронными обработчиками (см. api.async_views)
+os.environ.setdefault('ASYNC_API_VIEWS', '1')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# поток событий заказов (/events/) проходит стек Django, но ожидает события без занятого потока
+from app.events import with_event_stream  # noqa: E402
+
+application = with_event_stream(django_application)
@@ -30,6 +30,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.metrics.MetricsMiddleware',
+    'app.routers.ReadYourWritesMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -43,7 +45,8 @@ ROOT_URLCONF = 'coms.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # шаблонизатор Django с учетом времени отрисовки для метрик запросов (app.metrics)
+        'BACKEND': 'app.metrics.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -59,12 +62,66 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'coms.wsgi.application'
 
+# SQLite для нескольких рабочих процессов: журнал WAL (чтение не ждет записи),
+# synchronous=NORMAL (без fsync на каждую фиксацию, в WAL это безопасно), ожидание
+# занятой блокировки (мс), кэш страниц (КиБ) и отображение файла в память (байт)
+SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', '5000'))
+SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', '65536'))
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # постоянные подключения рабочих процессов (сек.; 0 - новое подключение на каждый запрос)
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT};'
+                f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB};'
+                f'PRAGMA mmap_size={SQLITE_MMAP_SIZE};'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+            # транзакции берут блокировку записи сразу (BEGIN IMMEDIATE), см. app.transactions
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': SQLITE_BUSY_TIMEOUT / 1000,
+        },
+        # тесты используют файловую БД (как в работе): в памяти WAL и ожидание блокировок не действуют
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    }
+}
+
+# БД отчетов (реплика для чтения): отчеты, выгрузки и списки заказов читаются из нее (см. app.routers).
+# На SQLite реплика - копия основной БД, обновляемая командой syncreporting (например, раз в минуту);
+# без REPORTING_DB_NAME чтения идут в основную БД
+REPORTING_DB_ALIAS = 'reporting'
+REPORTING_DB_NAME = os.environ.get('REPORTING_DB_NAME')
+REPORTING_READS = bool(REPORTING_DB_NAME)
+# закрепление чтений клиента за основной БД после записи (сек.; не меньше интервала обновления реплики)
+REPORTING_PIN_SECONDS = int(os.environ.get('REPORTING_PIN_SECONDS', '90'))
+DATABASES[REPORTING_DB_ALIAS] = {
+    **DATABASES['default'],
+    'NAME': REPORTING_DB_NAME or DATABASES['default']['NAME'],
+    'TEST': {'NAME': BASE_DIR / 'test_reporting.sqlite3'},
+}
+DATABASE_ROUTERS = ['app.routers.ReportingRouter']
+
+# Кэш (версия и содержимое меню, фрагменты страниц заказов и т.п.). Для нескольких рабочих процессов нужен общий
+# кэш (например, django.core.cache.backends.redis.RedisCache), иначе каждый процесс
+# хранит и сбрасывает свою копию
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'coms'),
     }
 }
+if CACHES['default']['BACKEND'].endswith('.LocMemCache'):
+    # фрагменты страниц заказов (ORDER_FRAGMENT_CACHE_TIMEOUT) не должны вытеснять друг друга
+    # уже на одной странице (по умолчанию - 300 записей)
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 20000))}
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -111,3 +168,67 @@ SPECTACULAR_SETTINGS = {
     'VERSION': '1.0.0',
     'SERVE_INCLUDE_SCHEMA': False,
 }
+
+# Cafe OMS settings
+# размер страницы списка заказов (постраничная выдача по курсору)
+ORDER_LIST_PAGE_SIZE = 50
+# максимальное количество заказов в одном запросе пакетного создания (POST /api/orders/bulk/)
+ORDERS_BULK_MAX_SIZE = 500
+# количество строк, читаемых из БД за один раз при потоковой выгрузке
+EXPORT_CHUNK_SIZE = 2000
+# максимальный размер страницы заказов API, доступный клиенту через параметр page_size
+ORDERS_API_MAX_PAGE_SIZE = 100
+# время хранения содержимого меню в кэше (сек.); кэш сбрасывается сменой версии при изменении блюд
+MENU_CACHE_TIMEOUT = 24 * 60 * 60
+# количество блюд в ответе поиска по меню (/api/menu-items/search/) по умолчанию и максимальное
+MENU_SEARCH_LIMIT = 10
+MENU_SEARCH_MAX_LIMIT = 50
+# время хранения фрагментов страниц заказов (строк списка, состава заказа) в кэше (сек.);
+# ключ фрагмента включает updated_at заказа и версию меню, поэтому явный сброс не нужен
+ORDER_FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+# время хранения JSON-представлений заказов API в кэше (сек.); ключ включает updated_at заказа
+ORDER_JSON_CACHE_TIMEOUT = 24 * 60 * 60
+# время хранения ключей идемпотентности (Idempotency-Key) и ответов для повторов (сек.)
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+# количество просроченных ключей идемпотентности, удаляемых за одну транзакцию (purgeidempotency)
+IDEMPOTENCY_PURGE_BATCH_SIZE = 1000
+# замер запросов (SQL, отрисовка, полное время): заголовок Server-Timing и метрики Prometheus на /metrics
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+# доля замеряемых запросов (1.0 - все, 0.1 - каждый десятый в среднем)
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', '1.0'))
+# события заказов (server-sent events, /events/): количество последних событий для продолжения
+# потока по Last-Event-ID, размер очереди одного подписчика и интервал keep-alive (сек.)
+EVENTS_BUFFER_SIZE = 1000
+EVENTS_QUEUE_SIZE = 1000
+EVENTS_KEEPALIVE = 15
+# пауза перед переподключением клиента (мс, поле retry потока событий)
+EVENTS_RETRY_MS = 3000
+# асинхронные GET-обработчики API (список и детали заказов, меню, отчет о выручке) - для запуска под ASGI
+ASYNC_API_VIEWS = os.environ.get('ASYNC_API_VIEWS', '0') == '1'
+# повторы транзакции записи при занятой блокировке SQLite и начальная пауза между ними (сек.)
+DB_WRITE_RETRIES = 5
+DB_WRITE_RETRY_DELAY = 0.05
+# архивирование оплаченных заказов (команда archiveorders): возраст заказа (дней),
+# количество заказов, переносимых одной транзакцией, и пауза между транзакциями (сек.)
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '90'))
+ARCHIVE_BATCH_SIZE = 500
+ARCHIVE_BATCH_PAUSE = 0.1
+# фоновые задачи (команда runjobs): количество одновременно выполняемых задач, пул выполнения
+# ('thread' - потоки, 'process' - процессы) и пауза опроса пустой очереди (сек.)
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+JOB_POOL = os.environ.get('JOB_POOL', 'thread')
+JOB_POLL_INTERVAL = 1.0
+# интервал отметки выполнения задач рабочим процессом (сек.); задача без отметки дольше JOB_STALE_SECONDS
+# возвращается в очередь (не более JOB_MAX_ATTEMPTS попыток)
+JOB_HEARTBEAT_SECONDS = 15
+JOB_STALE_SECONDS = 120
+JOB_MAX_ATTEMPTS = 3
+# каталог файлов результатов задач, время хранения завершенных задач (сек.) и количество задач,
+# удаляемых за один проход
+JOB_RESULTS_DIR = os.environ.get('JOB_RESULTS_DIR', str(BASE_DIR / 'job_results'))
+JOB_RESULT_TTL = 7 * 24 * 60 * 60
+JOB_PURGE_BATCH_SIZE = 100
+# максимальная длина сохраняемого текста ошибки задачи
+JOB_ERROR_MAX_LENGTH = 10000
+# отчет о выручке за больший период (дней) строится фоновой задачей, а не в запросе
+REVENUE_REPORT_SYNC_MAX_DAYS = int(os.environ.get('REVENUE_REPORT_SYNC_MAX_DAYS', '366'))